@@ -1,21 +1,50 @@
 from __future__ import annotations
 
+import asyncio
 import datetime
 import glob
 import json
 import os
 import zipfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import BytesIO
+from typing import Optional
 from xml.etree import ElementTree
 
 import aiohttp
 import pandas as pd
-import requests
 from tqdm import tqdm
 
-from api.http_client import get_json_data
+from api.http_client import get_json_data, get_session, post_json_data
 from constants.logger import logger
+from util.single_flight import single_flight
+
+# The cookies of binance.com, shared by all clients
+binance_cookies: Optional[dict] = None
+
+
+@single_flight
+async def get_binance_cookies(headers: dict) -> dict:
+    """
+    Fetches the cookies of binance.com once, later calls return the cached cookies.
+
+    Parameters
+    ----------
+    headers : dict
+        The headers send with the request.
+
+    Returns
+    -------
+    dict
+        The cookies, mapped from name to value.
+    """
+    global binance_cookies
+
+    if binance_cookies is None:
+        session = await get_session()
+        async with session.get("https://www.binance.com/", headers=headers) as r:
+            binance_cookies = {name: morsel.value for name, morsel in r.cookies.items()}
+
+    return binance_cookies
 
 
 # Use in loop: fudning_heatmap
@@ -43,28 +72,23 @@ class BinanceClient(object):
             "sec-fetch-dest": "empty",
             "accept-language": "en",
         }
-        main_page_response = requests.get(
-            "https://www.binance.com/", headers=self.headers
-        )
-        self.cookies = main_page_response.cookies
 
     async def get_funding_rate_history(self, symbol: str, rows: int = 100) -> dict:
         # https://www.binance.com/en/futures/funding-history/perpetual/funding-fee-history
         data = {"symbol": symbol, "page": 1, "rows": rows}  # can do 10_000 max
         url = "https://www.binance.com/bapi/futures/v1/public/future/common/get-funding-rate-history"
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                url, headers=self.headers, cookies=self.cookies, data=json.dumps(data)
-            ) as response:
-                response_data = (
-                    await response.json()
-                )  # or use response.text() if you expect a non-JSON response
-                return response_data
+        return await post_json_data(
+            url,
+            headers=self.headers,
+            cookies=await get_binance_cookies(self.headers),
+            data=json.dumps(data),
+            idempotent=True,
+        )
 
     async def fund_rating(self, symbol: str, rows: int = 100) -> pd.DataFrame:
         response = await self.get_funding_rate_history(symbol, rows)
-        df = pd.DataFrame(response["data"])
+        df = pd.DataFrame(response.get("data") or [])
 
         if df.empty:
             logger.warn(f"No data found for {symbol}")
@@ -76,6 +100,9 @@ class BinanceClient(object):
         return df
 
 
+binance_client = BinanceClient()
+
+
 # Use in loop: funding
 async def get_funding_rate() -> tuple[pd.DataFrame, datetime.timedelta]:
     # Get the JSON data from the Binance API
@@ -189,12 +216,15 @@ async def get_gainers_losers():
 # For loop: liquidations
 
 
-def get_existing_files() -> list[str]:
-    # TODO: make this async
-    response = requests.get(
-        "https://s3-ap-northeast-1.amazonaws.com/data.binance.vision?delimiter=/&prefix=data/futures/um/daily/liquidationSnapshot/BTCUSDT/"
+async def get_existing_files() -> list[str]:
+    response = await get_json_data(
+        "https://s3-ap-northeast-1.amazonaws.com/data.binance.vision?delimiter=/&prefix=data/futures/um/daily/liquidationSnapshot/BTCUSDT/",
+        text=True,
     )
-    tree = ElementTree.fromstring(response.content)
+    if not response:
+        return []
+
+    tree = ElementTree.fromstring(response)
 
     files = []
     for content in tree.findall("{http://s3.amazonaws.com/doc/2006-03-01/}Contents"):
@@ -218,8 +248,16 @@ def get_local_dates(base_path: str, symbol: str, market: str):
     return local_dates
 
 
-def download_and_extract_zip(
-    symbol: str, date: datetime, market: str = "cm", base_extract_to="./data"
+def extract_zip(content: bytes, extract_to: str) -> None:
+    with zipfile.ZipFile(BytesIO(content)) as zip_ref:
+        zip_ref.extractall(extract_to)
+
+
+async def download_and_extract_zip(
+    symbol: str,
+    date: datetime.datetime,
+    market: str = "cm",
+    base_extract_to="./data",
 ):
     """
     Downloads a ZIP file from the given URL and extracts its contents to a subdirectory named after the symbol.
@@ -249,46 +287,48 @@ def download_and_extract_zip(
 
     try:
         # Step 1: Download the ZIP file
-        response = requests.get(url)
-        response.raise_for_status()  # Ensure the request was successful
-
-        # Step 2: Extract the contents of the ZIP file
-        with zipfile.ZipFile(BytesIO(response.content)) as zip_ref:
-            zip_ref.extractall(extract_to)
-    except requests.RequestException as e:
+        session = await get_session()
+        async with session.get(url) as response:
+            response.raise_for_status()  # Ensure the request was successful
+            content = await response.read()
+
+        # Step 2: Extract the contents of the ZIP file, in a thread as it is blocking
+        await asyncio.to_thread(extract_zip, content, extract_to)
+    except aiohttp.ClientError as e:
         logger.error(f"Failed to download {url}: {e}")
     except zipfile.BadZipFile as e:
         logger.error(f"Failed to extract {url}: {e}")
 
 
-def get_new_data(
+async def get_new_data(
     symbol: str, market: str = "cm", base_extract_to: str = "./data"
 ) -> set[str]:
-    existing_files = get_existing_files()
+    existing_files = await get_existing_files()
     existing_dates = {extract_date_from_filename(file) for file in existing_files}
 
     local_dates = get_local_dates(base_extract_to, symbol, market)
     missing_dates = existing_dates - local_dates
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [
-            executor.submit(
-                download_and_extract_zip,
+    # Download max 10 files at the same time
+    semaphore = asyncio.Semaphore(10)
+
+    async def download(date: str) -> None:
+        async with semaphore:
+            await download_and_extract_zip(
                 symbol,
-                datetime.strptime(date, "%Y-%m-%d"),
+                datetime.datetime.strptime(date, "%Y-%m-%d"),
                 market,
                 base_extract_to,
             )
-            for date in missing_dates
-        ]
-        if futures:
-            for future in tqdm(
-                as_completed(futures), total=len(futures), desc="Downloading files"
-            ):
-                try:
-                    future.result()
-                except Exception as e:
-                    logger.error(f"Error occurred: {e}")
+
+    tasks = [download(date) for date in missing_dates]
+    for task in tqdm(
+        asyncio.as_completed(tasks), total=len(tasks), desc="Downloading files"
+    ):
+        try:
+            await task
+        except Exception as e:
+            logger.error(f"Error occurred: {e}")
 
     return missing_dates
 
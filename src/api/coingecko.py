@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import numbers
 import os
 import pickle
@@ -11,11 +12,12 @@ import pandas as pd
 from bs4 import BeautifulSoup
 
 import util.vars
-from api.http_client import get_json_data, session
+from api.http_client import get_json_data, get_tls_text
 from api.tradingview import tv
 from constants.logger import logger
 from constants.stable_coins import stables
 from util.formatting import format_change
+from util.single_flight import single_flight
 
 
 async def get_query_result(query: str) -> dict:
@@ -53,7 +55,10 @@ async def get_search_trending() -> dict:
 
 
 async def get_coins_list() -> list:
-    data = await get_json_data("https://api.coingecko.com/api/v3/coins/list")
+    # The list of coins changes slowly, but is very large
+    data = await get_json_data(
+        "https://api.coingecko.com/api/v3/coins/list", cache_ttl=6 * 60 * 60
+    )
     return data
 
 
@@ -185,6 +190,7 @@ def sanitize_currency_value(value: Union[str, float]) -> float:
     return value
 
 
+@single_flight
 async def get_coin_info(
     ticker: str,
 ) -> Tuple[float, str, List[str], float, str, str]:
@@ -361,11 +367,19 @@ async def get_trending_coins() -> pd.DataFrame:
             The volumes of the trending coins.
     """
 
-    html = session.get(
+    html = await get_tls_text(
         "https://www.coingecko.com/en/highlights/trending-crypto",
     )
 
-    soup = BeautifulSoup(html.text, "html.parser")
+    # Parsing the page is slow, so it is done in a thread
+    return await asyncio.to_thread(parse_trending_coins, html)
+
+
+def parse_trending_coins(html: str) -> pd.DataFrame:
+    """
+    Parses the table of the CoinGecko trending coins page.
+    """
+    soup = BeautifulSoup(html, "html.parser")
 
     try:
         table = soup.find("table")
@@ -419,11 +433,18 @@ async def get_trending_coins() -> pd.DataFrame:
 
 async def get_top_categories() -> pd.DataFrame | None:
     try:
-        html = session.get("https://www.coingecko.com/en/categories").text
+        html = await get_tls_text("https://www.coingecko.com/en/categories")
     except Exception as e:
         logger.error(f"Error getting top categories from CoinGecko: {e}")
         return
 
+    return await asyncio.to_thread(parse_top_categories, html)
+
+
+def parse_top_categories(html: str) -> pd.DataFrame | None:
+    """
+    Parses the table of the CoinGecko categories page.
+    """
     soup = BeautifulSoup(html, "html.parser")
 
     table = soup.find("table")
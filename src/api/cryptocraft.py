@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import re
 from io import StringIO
@@ -24,8 +25,17 @@ async def get_crypto_calendar() -> pd.DataFrame:
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4240.193 Safari/537.36"
         },
         text=True,
+        cache_ttl=60 * 60,
     )
 
+    # Parsing the page is slow, so it is done in a thread
+    return await asyncio.to_thread(parse_crypto_calendar, html)
+
+
+def parse_crypto_calendar(html: str) -> pd.DataFrame:
+    """
+    Parses the table of the CryptoCraft calendar page.
+    """
     soup = BeautifulSoup(html, "html.parser")
 
     # Get the first table
@@ -1,3 +1,4 @@
+import asyncio
 from io import StringIO
 
 import pandas as pd
@@ -6,7 +7,14 @@ from api.http_client import get_json_data
 
 
 async def get_etf_inflow(coin: str = "btc") -> float:
-    data = await get_json_data(f"https://farside.co.uk/{coin}/", text=True)
+    data = await get_json_data(
+        f"https://farside.co.uk/{coin}/", text=True, cache_ttl=30 * 60
+    )
+    # Parsing the page is slow, so it is done in a thread
+    return await asyncio.to_thread(parse_etf_inflow, data)
+
+
+def parse_etf_inflow(data: str) -> float:
     df = pd.read_html(StringIO(data))[1]
 
     # Use only top row for columns
@@ -15,7 +15,10 @@ async def get_feargread() -> tuple[int, str] | None:
         The percentual change compared to yesterday's Fear and Greed index.
     """
 
-    response = await get_json_data("https://api.alternative.me/fng/?limit=2")
+    # The index is updated once a day
+    response = await get_json_data(
+        "https://api.alternative.me/fng/?limit=2", cache_ttl=60 * 60
+    )
 
     if "data" in response.keys():
         today = int(response["data"][0]["value"])
@@ -1,19 +1,437 @@
 from __future__ import annotations
 
+import asyncio
+import datetime
+import functools
 import json
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional, Union
+from urllib.parse import urlparse
 
 import aiohttp
 import tls_client
+from multidict import CIMultiDictProxy
 
+from api.json_decoder import decode_json
+from api.resilience import (
+    CircuitOpenError,
+    circuit_breakers,
+    last_good,
+    mark_stale,
+    retry_policy,
+)
+from api.response_cache import CachedResponse, response_cache
+from constants.config import config
 from constants.logger import logger
+from util.single_flight import get_single_flight_metrics, single_flight
+
+
+class SessionManager:
+    """
+    Keeps one aiohttp.ClientSession for the whole bot, so connections are reused
+    (keep-alive) and DNS lookups are cached, instead of a new TCP and TLS handshake per request.
+    The limits can be set in the config under ["HTTP_CLIENT"].
+    """
+
+    def __init__(self) -> None:
+        http_config = config.get("HTTP_CLIENT", {})
+        self.limit = http_config.get("LIMIT", 100)
+        self.limit_per_host = http_config.get("LIMIT_PER_HOST", 10)
+        self.dns_cache_ttl = http_config.get("DNS_CACHE_TTL", 300)
+        self.host_limits = http_config.get("HOST_LIMITS") or {}
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.host_semaphores: dict[str, asyncio.Semaphore] = {}
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Returns the shared session, creating it on first use.
+        """
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                enable_cleanup_closed=True,
+            )
+            # Cookies are passed per request, the responses should not share cookies
+            self.session = aiohttp.ClientSession(
+                connector=connector, cookie_jar=aiohttp.DummyCookieJar()
+            )
+        return self.session
+
+    @asynccontextmanager
+    async def host_slot(self, url: str):
+        """
+        Limits the number of concurrent requests to hosts listed in HOST_LIMITS.
+        """
+        host = urlparse(url).hostname
+        if host not in self.host_limits:
+            yield
+            return
+
+        if host not in self.host_semaphores:
+            self.host_semaphores[host] = asyncio.Semaphore(self.host_limits[host])
+
+        async with self.host_semaphores[host]:
+            yield
+
+    async def close(self) -> None:
+        """
+        Closes the shared session, used on shutdown.
+        """
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+
+session_manager = SessionManager()
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """
+    Returns the shared aiohttp.ClientSession of the bot.
+    """
+    return await session_manager.get_session()
 
 
+class TokenBucket:
+    """
+    Token bucket of a single host, the requests wait for a token instead of failing.
+    The rate is halved every time the host responds with 429 and recovers slowly
+    with every successful request, until it is back at the configured rate.
+    """
+
+    def __init__(self, per_minute: float, burst: int, min_per_minute: float) -> None:
+        self.base_rate = per_minute / 60
+        self.min_rate = min(min_per_minute, per_minute) / 60
+        self.rate = self.base_rate
+        self.burst = max(1, burst)
+
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        # The lock makes the waiting requests take turns in FIFO order
+        self.lock = asyncio.Lock()
+
+        # Metrics
+        self.waiting = 0
+        self.requests = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """
+        Waits until a token is available and returns the number of seconds waited.
+        """
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self.lock:
+                while True:
+                    now = time.monotonic()
+                    if now < self.blocked_until:
+                        await asyncio.sleep(self.blocked_until - now)
+                        continue
+
+                    self.refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - start
+        self.requests += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def throttle(self, retry_after: Optional[float] = None) -> None:
+        """
+        Shrinks the budget after a 429 response and pauses the host for retry_after seconds.
+        """
+        self.throttled += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0
+
+        # Without a Retry-After header wait for one token at the new rate
+        pause = retry_after if retry_after is not None else 1 / self.rate
+        self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+
+    def recover(self) -> None:
+        """
+        Slowly restores the budget after a successful response.
+        """
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * 0.05)
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": self.waiting,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "avg_wait": self.total_wait / self.requests if self.requests else 0.0,
+            "max_wait": self.max_wait,
+            "per_minute": self.rate * 60,
+        }
+
+
+class RateLimiter:
+    """
+    Keeps a token bucket per host listed in the config under ["HTTP_CLIENT"]["RATE_LIMITS"].
+    Requests to other hosts are not limited.
+    """
+
+    def __init__(self) -> None:
+        http_config = config.get("HTTP_CLIENT", {})
+        self.max_retries = http_config.get("MAX_RATE_LIMIT_RETRIES", 3)
+        self.buckets: dict[str, TokenBucket] = {}
+
+        for host, budget in (http_config.get("RATE_LIMITS") or {}).items():
+            per_minute = budget.get("PER_MINUTE", 60)
+            self.buckets[host] = TokenBucket(
+                per_minute,
+                budget.get("BURST", 1),
+                budget.get("MIN_PER_MINUTE", per_minute / 8),
+            )
+
+    def get_bucket(self, url: str) -> Optional[TokenBucket]:
+        return self.buckets.get(urlparse(url).hostname)
+
+    async def acquire(self, url: str) -> None:
+        """
+        Waits until the host of the URL may be requested again.
+        """
+        bucket = self.get_bucket(url)
+        if bucket is None:
+            return
+
+        waited = await bucket.acquire()
+        if waited > 5:
+            logger.debug(f"Waited {waited:.1f}s for the rate limit of {url}")
+
+    def throttle(self, url: str, retry_after: Optional[str] = None) -> None:
+        bucket = self.get_bucket(url)
+        if bucket is None:
+            return
+
+        delay = parse_retry_after(retry_after)
+        bucket.throttle(delay)
+        logger.warning(
+            f"Rate limited by {urlparse(url).hostname}, "
+            f"lowered the budget to {bucket.rate * 60:.1f} requests per minute"
+        )
+
+    def recover(self, url: str) -> None:
+        bucket = self.get_bucket(url)
+        if bucket is not None:
+            bucket.recover()
+
+    def metrics(self) -> dict[str, dict]:
+        """
+        Returns the queue depth, wait times and current budget per host.
+        """
+        return {host: bucket.metrics() for host, bucket in self.buckets.items()}
+
+
+def parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+    """
+    Parses the Retry-After header, which is either a number of seconds or a HTTP date.
+
+    Parameters
+    ----------
+    retry_after : Optional[str]
+        The value of the header.
+
+    Returns
+    -------
+    Optional[float]
+        The number of seconds to wait, or None if the header is missing or invalid.
+    """
+    if not retry_after:
+        return None
+
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+
+    try:
+        date = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(
+        0.0, (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+    )
+
+
+rate_limiter = RateLimiter()
+
+
+def get_rate_limit_metrics() -> dict[str, dict]:
+    """
+    Returns the rate limit metrics per host, see RateLimiter.metrics().
+    """
+    return rate_limiter.metrics()
+
+
+async def decode(body: str, text: bool) -> Union[dict, str]:
+    if text:
+        return body
+    # Like aiohttp, an empty body is decoded as None
+    if not body.strip():
+        return None
+    return await decode_json(body)
+
+
+async def send(
+    method: str, url: str, headers: Optional[dict], **kwargs
+) -> tuple[int, str, CIMultiDictProxy]:
+    """
+    Sends the request once, after waiting for the rate limit of the host.
+    A 429 response is retried after the backoff of the rate limiter,
+    a 5xx response raises an aiohttp.ClientResponseError.
+
+    Returns
+    -------
+    tuple[int, str, CIMultiDictProxy]
+        The status, body and headers of the response.
+    """
+    session = await get_session()
+    for attempt in range(rate_limiter.max_retries + 1):
+        await rate_limiter.acquire(url)
+        async with session_manager.host_slot(url):
+            async with session.request(method, url, headers=headers, **kwargs) as r:
+                if r.status == 429 and attempt < rate_limiter.max_retries:
+                    rate_limiter.throttle(url, r.headers.get("Retry-After"))
+                    continue
+                rate_limiter.recover(url)
+
+                # Server errors mean that the source is (temporarily) unavailable
+                if r.status >= 500:
+                    r.raise_for_status()
+
+                return r.status, await r.text(), r.headers
+
+
+async def get_stale(
+    key: str, url: str, text: bool, cached: Optional[CachedResponse], error: Exception
+) -> Union[dict, str]:
+    """
+    Returns the last good response of the request, marked as stale, or raises the error.
+    """
+    fallback = last_good.get(key)
+    if fallback is None and cached is not None:
+        fallback = (cached.stored, cached.body)
+    if fallback is None:
+        raise error
+
+    stored, body = fallback
+    circuit_breakers.get(url).stale_served += 1
+    logger.debug(f"Serving the last good response of {url}, because of: {error}")
+    return mark_stale(await decode(body, text), time.time() - stored)
+
+
+async def request(
+    method: str,
+    url: str,
+    text: bool = False,
+    cache_ttl: Optional[float] = None,
+    idempotent: Optional[bool] = None,
+    headers: dict = None,
+    **kwargs,
+) -> Union[dict, str]:
+    """
+    Sends a request with the shared session. The request waits for the rate limit of the host,
+    is retried after a 429 response and uses the response cache if cache_ttl is set.
+    Failed requests are retried with a jittered exponential backoff if they are idempotent.
+    If the source keeps failing its circuit breaker opens, then the last good response
+    is returned instead, marked as stale (see api.resilience.is_stale()).
+
+    Parameters
+    ----------
+    method : str
+        The HTTP method, e.g. "GET".
+    url : str
+        The URL to send the request to.
+    text : bool, optional
+        Whether to return the response as text instead of JSON, by default False.
+    cache_ttl : Optional[float], optional
+        How many seconds the response may be reused, by default None (not cached).
+    idempotent : Optional[bool], optional
+        Whether the request may be sent more than once, by default based on the method.
+    headers : dict, optional
+        The headers send with the request, by default None.
+    **kwargs
+        The other arguments of aiohttp.ClientSession.request().
+
+    Returns
+    -------
+    Union[dict, str]
+        The response as a dict, or as text.
+    """
+
+    key = response_cache.key(method, url, kwargs.get("json") or kwargs.get("data"))
+    cached = None
+    if cache_ttl is not None:
+        cached = await response_cache.get(key)
+        if cached is not None:
+            if cached.is_fresh(cache_ttl):
+                response_cache.hit(url)
+                return await decode(cached.body, text)
+            headers = {**(headers or {}), **cached.conditional_headers()}
+
+    breaker = circuit_breakers.get(url)
+    if not breaker.allow():
+        error = CircuitOpenError(f"The circuit breaker of {url} is open")
+        return await get_stale(key, url, text, cached, error)
+
+    attempts = retry_policy.attempts(method, idempotent)
+    for attempt in range(attempts):
+        try:
+            status, body, response_headers = await send(method, url, headers, **kwargs)
+            break
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if attempt + 1 < attempts:
+                await asyncio.sleep(retry_policy.backoff(attempt))
+                continue
+            circuit_breakers.record_failure(url)
+            return await get_stale(key, url, text, cached, e)
+    breaker.record_success()
+
+    if cached is not None and status == 304:
+        await response_cache.refresh(key, cached)
+        return await decode(cached.body, text)
+
+    data = await decode(body, text)
+    if cache_ttl is not None:
+        response_cache.miss(url)
+    if status == 200:
+        last_good.put(key, body)
+        if cache_ttl is not None:
+            await response_cache.store(key, url, body, response_headers)
+    return data
+
+
+@single_flight(copy_result=True)
 async def get_json_data(
     url: str,
     headers: dict = None,
     cookies: dict = None,
     json_data: dict = None,
     text: bool = False,
+    cache_ttl: Optional[float] = None,
 ) -> dict:
     """
     Asynchronous function to get JSON data from a website.
@@ -24,6 +442,8 @@ async def get_json_data(
         The URL to get the data from.
     headers : dict, optional
         The headers send with the get request, by default None.
+    cache_ttl : Optional[float], optional
+        How many seconds the response may be reused, by default None (not cached).
 
     Returns
     -------
@@ -32,17 +452,22 @@ async def get_json_data(
     """
 
     try:
-        async with aiohttp.ClientSession(headers=headers, cookies=cookies) as session:
-            async with session.get(url, json=json_data) as r:
-                if text:
-                    return await r.text()
-                else:
-                    return await r.json()
+        return await request(
+            "GET",
+            url,
+            text=text,
+            cache_ttl=cache_ttl,
+            headers=headers,
+            cookies=cookies,
+            json=json_data,
+        )
+    except CircuitOpenError as e:
+        logger.debug(e)
     except aiohttp.ClientError as e:
         logger.error(f"Error with get request for {url}.\nError: {e}")
     except json.JSONDecodeError as e:
         logger.error(f"Error decoding JSON from {url}.\nError: {e}")
-        logger.error(f"Response: {await r.text()}")
+        logger.error(f"Response: {getattr(e, 'doc', '')}")
     return {}
 
 
@@ -51,6 +476,9 @@ async def post_json_data(
     headers: dict = None,
     data: dict = None,
     json: dict = None,
+    cookies: dict = None,
+    cache_ttl: Optional[float] = None,
+    idempotent: bool = False,
 ) -> dict:
     """
     Asynchronous function to post JSON data from a website.
@@ -61,6 +489,10 @@ async def post_json_data(
         The URL to get the data from.
     headers : dict, optional
         The headers send with the post request, by default None.
+    cache_ttl : Optional[float], optional
+        How many seconds the response may be reused, by default None (not cached).
+    idempotent : bool, optional
+        Whether the request only reads data, so it can be retried, by default False.
 
     Returns
     -------
@@ -69,15 +501,110 @@ async def post_json_data(
     """
 
     try:
-        async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.post(url, data=data, json=json) as r:
-                return await r.json(content_type=None)
+        return await request(
+            "POST",
+            url,
+            cache_ttl=cache_ttl,
+            idempotent=idempotent,
+            headers=headers,
+            cookies=cookies,
+            data=data,
+            json=json,
+        )
     except Exception as e:
         logger.error(f"Error with POST request for {url}.\nError: {e}")
 
     return {}
 
 
-session = tls_client.Session(
-    client_identifier="chrome112", random_tls_extension_order=True
-)
+def get_http_metrics() -> dict[str, dict]:
+    """
+    Returns the state of the HTTP client: the rate limits, circuit breakers,
+    response cache and coalesced calls.
+    """
+    return {
+        "rate_limits": get_rate_limit_metrics(),
+        "circuit_breakers": get_circuit_breaker_metrics(),
+        "response_cache": get_response_cache_metrics(),
+        "single_flight": get_single_flight_metrics(),
+    }
+
+
+def get_circuit_breaker_metrics() -> dict[str, dict]:
+    """
+    Returns the state, failures and number of stale responses served per host.
+    """
+    return circuit_breakers.metrics()
+
+
+def get_response_cache_metrics() -> dict[str, dict]:
+    """
+    Returns the response cache hits, misses and revalidations per host.
+    """
+    return response_cache.metrics()
+
+
+class TLSSessionPool:
+    """
+    Async facade over tls_client, which is used for websites that block regular HTTP clients.
+    tls_client is blocking, so the requests run on a bounded thread pool and every thread
+    borrows its own session from the pool, instead of blocking the event loop.
+    The size of the pool can be set in the config under ["HTTP_CLIENT"]["TLS_POOL_SIZE"].
+    """
+
+    def __init__(self) -> None:
+        self.size = config.get("HTTP_CLIENT", {}).get("TLS_POOL_SIZE", 4)
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.size, thread_name_prefix="tls_client"
+        )
+        self.sessions: queue.SimpleQueue[tls_client.Session] = queue.SimpleQueue()
+        for _ in range(self.size):
+            self.sessions.put(
+                tls_client.Session(
+                    client_identifier="chrome112", random_tls_extension_order=True
+                )
+            )
+
+    def send(self, method: str, url: str, **kwargs):
+        # There are as many sessions as threads, so a session is always available
+        session = self.sessions.get()
+        try:
+            return session.execute_request(method, url, **kwargs)
+        finally:
+            self.sessions.put(session)
+
+    async def request(self, method: str, url: str, **kwargs):
+        """
+        Sends the request on the thread pool and returns the tls_client.response.Response.
+        """
+        await rate_limiter.acquire(url)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(self.send, method, url, **kwargs)
+        )
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+tls_pool = TLSSessionPool()
+
+
+async def get_tls_text(url: str, headers: dict = None) -> str:
+    """
+    Gets the text of a website with tls_client, without blocking the event loop.
+
+    Parameters
+    ----------
+    url : str
+        The URL to get the text from.
+    headers : dict, optional
+        The headers send with the get request, by default None.
+
+    Returns
+    -------
+    str
+        The response as text.
+    """
+    response = await tls_pool.request("GET", url, headers=headers)
+    return response.text
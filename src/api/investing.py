@@ -34,7 +34,9 @@ async def get_events() -> pd.DataFrame:
 
     url = "https://www.investing.com/economic-calendar/Service/getCalendarFilteredData"
 
-    req = await post_json_data(url, headers=headers, data=data)
+    req = await post_json_data(
+        url, headers=headers, data=data, cache_ttl=60 * 60, idempotent=True
+    )
     root = fromstring(req["data"])
     table = root.xpath(".//tr")
 
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, Union
+
+from api.json_split import split_json
+from constants.config import config
+from constants.logger import logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+json_config = config.get("HTTP_CLIENT", {}).get("JSON") or {}
+
+# Bodies larger than this (in characters) are decoded in another process
+OFFLOAD_SIZE = json_config.get("OFFLOAD_SIZE", 256 * 1024)
+
+
+def orjson_loads(body: Union[str, bytes]) -> Any:
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError:
+        # orjson is stricter than json, e.g. it does not accept NaN
+        return json.loads(body)
+
+
+# The processes that decode the large bodies, started on first use
+executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global executor
+
+    if executor is None:
+        # Forked processes do not run main.py again, like spawned processes would
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+        else:
+            context = multiprocessing.get_context()
+        executor = ProcessPoolExecutor(
+            max_workers=json_config.get("WORKERS", 1), mp_context=context
+        )
+    return executor
+
+
+def find(root: Any, path: tuple) -> Any:
+    for key in path:
+        root = root[key]
+    return root
+
+
+async def assemble(strict: bool, pieces: list[tuple]) -> Any:
+    """
+    Puts the pieces of split_json() back together, the event loop gets a turn after every piece.
+    """
+    piece_loads = orjson.loads if strict else json.loads
+    root = None
+
+    for kind, path, data in pieces:
+        if kind == "items":
+            container = find(root, path)
+            if isinstance(container, list):
+                container.extend(piece_loads(data))
+            else:
+                container.update(piece_loads(data))
+        else:
+            value = (
+                ([] if data == "list" else {}) if kind == "new" else piece_loads(data)
+            )
+            if not path:
+                root = value
+            else:
+                parent = find(root, path[:-1])
+                if isinstance(parent, list):
+                    parent.append(value)
+                else:
+                    parent[path[-1]] = value
+
+        await asyncio.sleep(0)
+
+    return root
+
+
+def get_default_decoder() -> Callable[[Union[str, bytes]], Any]:
+    """
+    Returns orjson if it is installed and not disabled in the config, otherwise json.
+    """
+    if orjson is not None and json_config.get("DECODER", "orjson") == "orjson":
+        return orjson_loads
+    return json.loads
+
+
+loads = get_default_decoder()
+
+
+def set_decoder(decoder: Callable[[Union[str, bytes]], Any]) -> None:
+    """
+    Replaces the function used to decode JSON responses.
+
+    Parameters
+    ----------
+    decoder : Callable[[Union[str, bytes]], Any]
+        A function like json.loads, it should raise a json.JSONDecodeError for invalid JSON.
+    """
+    global loads
+    loads = decoder
+    logger.debug(f"Using {getattr(decoder, '__module__', decoder)} to decode JSON")
+
+
+async def decode_json(body: Union[str, bytes]) -> Any:
+    """
+    Decodes the JSON body. Large bodies are decoded with orjson in another process,
+    which sends them back in small pieces that are put together without blocking the event loop.
+    The decoder set with set_decoder() is used for the bodies that are decoded on the event loop.
+
+    Parameters
+    ----------
+    body : Union[str, bytes]
+        The JSON to decode.
+
+    Returns
+    -------
+    Any
+        The decoded JSON.
+    """
+    global executor
+
+    if len(body) > OFFLOAD_SIZE:
+        loop = asyncio.get_running_loop()
+        try:
+            strict, pieces = await loop.run_in_executor(
+                get_executor(), split_json, body
+            )
+        except BrokenProcessPool as e:
+            # E.g. the process ran out of memory, a new one is started next time
+            logger.error(f"The JSON decoding process stopped: {e}")
+            executor = None
+            return await asyncio.to_thread(loads, body)
+        return await assemble(strict, pieces)
+    return loads(body)
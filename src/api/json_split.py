@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Large JSON bodies are decoded in the processes of api.json_decoder and split in small pieces,
+# so the event loop can put them back together a piece at a time.
+# This module only imports what those processes need.
+
+# Decoding a piece of this size (in bytes) takes about a millisecond with orjson
+PIECE_SIZE = 64 * 1024
+
+
+def decode(body: Union[str, bytes]) -> tuple[Any, bool]:
+    """
+    Decodes the body with orjson, or with json if orjson is not installed or the body has NaN.
+    Returns the decoded body and whether it can be encoded and decoded with orjson.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(body), True
+        except orjson.JSONDecodeError:
+            # orjson is stricter than json, e.g. it does not accept NaN
+            pass
+    return json.loads(body), False
+
+
+def dumps(value: Any, strict: bool) -> bytes:
+    if strict:
+        return orjson.dumps(value)
+    return json.dumps(value).encode()
+
+
+def add_pieces(
+    value: Any,
+    path: tuple,
+    pieces: list[tuple],
+    strict: bool,
+    piece_size: int,
+    data: bytes = None,
+) -> None:
+    """
+    Adds the pieces that make up the value. A list or dict that is larger than piece_size
+    is added as an empty container followed by its items, in chunks of about piece_size.
+    Items that are too large themselves are split in the same way.
+    """
+    if not isinstance(value, (list, dict)) or (
+        data is not None and len(data) <= piece_size
+    ):
+        pieces.append(
+            ("value", path, data if data is not None else dumps(value, strict))
+        )
+        return
+
+    is_list = isinstance(value, list)
+    pieces.append(("new", path, "list" if is_list else "dict"))
+
+    chunk: list[bytes] = []
+    size = 0
+
+    def flush() -> None:
+        nonlocal chunk, size
+        if chunk:
+            start, end = (b"[", b"]") if is_list else (b"{", b"}")
+            pieces.append(("items", path, start + b",".join(chunk) + end))
+            chunk, size = [], 0
+
+    for key, item in enumerate(value) if is_list else value.items():
+        item_data = dumps(item, strict)
+        if len(item_data) > piece_size and isinstance(item, (list, dict)):
+            # The items before it are added first, so the order is kept
+            flush()
+            add_pieces(item, path + (key,), pieces, strict, piece_size, item_data)
+            continue
+
+        chunk.append(item_data if is_list else dumps(key, strict) + b":" + item_data)
+        size += len(chunk[-1])
+        if size >= piece_size:
+            flush()
+    flush()
+
+
+def split_json(
+    body: Union[str, bytes], piece_size: int = PIECE_SIZE
+) -> tuple[bool, list[tuple]]:
+    """
+    Decodes the body and splits it in pieces of about piece_size bytes.
+
+    Returns
+    -------
+    tuple[bool, list[tuple]]
+        bool
+            Whether the pieces are decoded with orjson, otherwise with json.
+        list[tuple]
+            The (kind, path, data) of every piece, in the order they are put together.
+            The kind is "new" for an empty list or dict, "items" for the items of a list
+            or dict and "value" for any other value. The path is the keys and indexes from
+            the root to the list, dict or value.
+    """
+    value, strict = decode(body)
+    pieces: list[tuple] = []
+    add_pieces(value, (), pieces, strict, piece_size)
+    return strict, pieces
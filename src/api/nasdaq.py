@@ -52,7 +52,7 @@ async def get_earnings_for_date(date: datetime.datetime) -> pd.DataFrame:
         "Accept-Encoding": "gzip, deflate, br, zstd",
         "Sec-Ch-Ua": '"Google Chrome";v="125", "Chromium";v="125", "Not.A/Brand";v="24"',
     }
-    json = await get_json_data(url, headers=headers)
+    json = await get_json_data(url, headers=headers, cache_ttl=6 * 60 * 60)
     # Automatically ordered from highest to lowest market cap
     if "data" not in json:
         return pd.DataFrame()
@@ -142,6 +142,7 @@ async def fetch_halt_data() -> dict:
         "https://www.nasdaqtrader.com/RPCHandler.axd",
         headers=headers,
         json=req_data,
+        idempotent=True,
     )
 
     # Convert to DataFrame
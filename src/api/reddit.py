@@ -9,44 +9,43 @@ import pandas as pd
 
 import util.vars
 from constants.logger import logger
-from util.db import update_db
+from util.db import append_rows, delete_older_than
 
 URL_REGEX = r"(?P<url>https?://[^\s]+)"
 MARKDOWN_LINK_REGEX = r"\[(?P<text>[^\]]+)\]\((?P<url>https?://[^\s]+)\)"
 
 
-def add_id_to_db(id: str) -> None:
+def add_id_to_db(id: str) -> pd.DataFrame:
     """
-    Adds the given id to the database.
+    Adds the given id to the database and returns the new row.
     """
 
-    util.vars.reddit_ids = pd.concat(
+    new_row = pd.DataFrame(
         [
-            util.vars.reddit_ids,
-            pd.DataFrame(
-                [
-                    {
-                        "id": id,
-                        "timestamp": datetime.now(),
-                    }
-                ]
-            ),
-        ],
+            {
+                "id": id,
+                "timestamp": datetime.now(),
+            }
+        ]
+    )
+
+    util.vars.reddit_ids = pd.concat(
+        [util.vars.reddit_ids, new_row],
         ignore_index=True,
     )
 
+    return new_row
+
 
 def update_reddit_ids():
     """
     Update the list of reddit IDs, removing those older than 72 hours.
     """
     if not util.vars.reddit_ids.empty:
-        util.vars.reddit_ids = util.vars.reddit_ids.astype(
-            {"id": str, "timestamp": "datetime64[ns]"}
-        )
         util.vars.reddit_ids = util.vars.reddit_ids[
             util.vars.reddit_ids["timestamp"] > datetime.now() - timedelta(hours=72)
         ]
+    delete_older_than("reddit_ids", days=3)
 
 
 async def reddit_scraper(
@@ -74,12 +73,13 @@ async def reddit_scraper(
     subreddit = await reddit_client.subreddit(subreddit_name)
 
     posts = []
+    new_ids = []
     try:
         async for submission in subreddit.hot(limit=limit):
             if submission.stickied or is_submission_processed(submission.id):
                 continue
 
-            add_id_to_db(submission.id)
+            new_ids.append(add_id_to_db(submission.id))
 
             descr = truncate_text(html.unescape(submission.selftext), 4000)
             descr = process_description(descr)  # Process the description for URLs
@@ -88,7 +88,8 @@ async def reddit_scraper(
             img_urls, title = process_submission_media(submission, title)
 
             posts.append((submission, title, descr, img_urls))
-        update_db(util.vars.reddit_ids, "reddit_ids")
+        if new_ids:
+            append_rows(pd.concat(new_ids, ignore_index=True), "reddit_ids")
     except Exception as e:
         logger.error(f"Error scraping Reddit: {e}")
 
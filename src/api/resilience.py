@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import random
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+from constants.config import config
+from constants.logger import logger
+
+resilience_config = config.get("HTTP_CLIENT", {}).get("RESILIENCE") or {}
+
+
+class CircuitOpenError(aiohttp.ClientError):
+    """
+    Raised when a request is not sent because the circuit breaker of the host is open.
+    """
+
+
+class RetryPolicy(NamedTuple):
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 10.0
+    # Methods that can safely be sent twice, POST requests have to be marked as idempotent
+    idempotent_methods: frozenset = frozenset(
+        {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+    )
+
+    def attempts(self, method: str, idempotent: Optional[bool] = None) -> int:
+        """
+        Returns how often the request may be sent.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in self.idempotent_methods
+        return self.max_attempts if idempotent else 1
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Returns the delay before the next attempt, exponential with full jitter.
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+retry_policy = RetryPolicy(
+    max_attempts=resilience_config.get("MAX_ATTEMPTS", 3),
+    base_delay=resilience_config.get("BASE_DELAY", 0.5),
+    max_delay=resilience_config.get("MAX_DELAY", 10.0),
+)
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a host after a number of failed requests in a row.
+    After reset_timeout seconds one trial request is let through (half-open),
+    if it succeeds the breaker closes again, otherwise it stays open for another period.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+
+        # Metrics
+        self.times_opened = 0
+        self.rejected = 0
+        self.stale_served = 0
+
+    def allow(self) -> bool:
+        """
+        Returns whether a request may be sent.
+        """
+        if self.state == "closed":
+            return True
+
+        # Let one trial request through per period, also if the last trial never finished
+        now = time.monotonic()
+        if now - self.opened_at >= self.reset_timeout:
+            self.state = "half-open"
+            self.opened_at = now
+            return True
+
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half-open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def metrics(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "stale_served": self.stale_served,
+        }
+
+
+class CircuitBreakers:
+    """
+    Keeps a circuit breaker per host, created on first use.
+    """
+
+    def __init__(self) -> None:
+        self.failure_threshold = resilience_config.get("FAILURE_THRESHOLD", 5)
+        self.reset_timeout = resilience_config.get("RESET_TIMEOUT", 60)
+        self.breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, url: str) -> CircuitBreaker:
+        host = urlparse(url).hostname
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(
+                self.failure_threshold, self.reset_timeout
+            )
+        return self.breakers[host]
+
+    def record_failure(self, url: str) -> None:
+        breaker = self.get(url)
+        was_open = breaker.state == "open"
+        breaker.record_failure()
+        if breaker.state == "open" and not was_open:
+            logger.warning(
+                f"Circuit breaker opened for {urlparse(url).hostname} "
+                f"after {breaker.failures} failed requests"
+            )
+
+    def metrics(self) -> dict[str, dict]:
+        return {host: breaker.metrics() for host, breaker in self.breakers.items()}
+
+
+circuit_breakers = CircuitBreakers()
+
+
+class StaleDict(dict):
+    stale = True
+
+
+class StaleList(list):
+    stale = True
+
+
+class StaleStr(str):
+    stale = True
+
+
+def mark_stale(data: Any, age: float) -> Any:
+    """
+    Wraps the last good value of a request, so callers can see that it is not up to date.
+    The age of the value in seconds is set as the age attribute.
+    """
+    if isinstance(data, dict):
+        data = StaleDict(data)
+    elif isinstance(data, list):
+        data = StaleList(data)
+    elif isinstance(data, str):
+        data = StaleStr(data)
+    else:
+        return data
+
+    data.age = age
+    return data
+
+
+def is_stale(data: Any) -> bool:
+    """
+    Returns whether the data is an old value, served because the source is unavailable.
+    """
+    return getattr(data, "stale", False)
+
+
+class LastGoodStore:
+    """
+    Keeps the body of the last successful response per request in memory, up to max_bytes.
+    The least recently stored responses are removed first.
+    """
+
+    def __init__(self) -> None:
+        self.max_bytes = resilience_config.get("LAST_GOOD_MEMORY_MB", 32) * 1024 * 1024
+        self.bodies: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.size = 0
+
+    def put(self, key: str, body: str) -> None:
+        old = self.bodies.pop(key, None)
+        if old is not None:
+            self.size -= len(old[1])
+
+        if len(body) > self.max_bytes:
+            return
+
+        self.bodies[key] = (time.time(), body)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self.bodies.popitem(last=False)
+            self.size -= len(evicted)
+
+    def get(self, key: str) -> Optional[tuple[float, str]]:
+        """
+        Returns the time the body was stored and the body, or None.
+        """
+        return self.bodies.get(key)
+
+
+last_good = LastGoodStore()
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import NamedTuple, Optional
+from urllib.parse import urlparse
+
+from constants.config import config
+from constants.logger import logger
+
+cache_dir = os.path.join(os.path.dirname(__file__), "..", "..", "data", "http_cache")
+
+
+class CachedResponse(NamedTuple):
+    url: str
+    body: str
+    stored: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.stored < ttl
+
+    def conditional_headers(self) -> dict:
+        """
+        Returns the headers to revalidate the response with the server.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    Caches the bodies of slow-changing endpoints, the time to live is set per request.
+    Responses are kept in memory (least recently used first out, up to MAX_MEMORY_MB)
+    and on disk under data/http_cache, so they survive a restart.
+    The files on disk are removed when they were not used for MAX_DISK_DAYS,
+    or least recently used first when they take up more than MAX_DISK_MB.
+    Expired responses with an ETag or Last-Modified header are revalidated instead of downloaded again.
+    """
+
+    def __init__(self) -> None:
+        cache_config = config.get("HTTP_CLIENT", {}).get("CACHE") or {}
+        self.max_bytes = cache_config.get("MAX_MEMORY_MB", 64) * 1024 * 1024
+        self.use_disk = cache_config.get("DISK", True)
+        self.max_disk_bytes = cache_config.get("MAX_DISK_MB", 256) * 1024 * 1024
+        self.max_disk_age = cache_config.get("MAX_DISK_DAYS", 7) * 24 * 60 * 60
+
+        self.memory: OrderedDict[str, CachedResponse] = OrderedDict()
+        self.size = 0
+
+        # The size and last use of the files on disk, least recently used first
+        # Loaded on first use, the files are read and written in threads
+        self.disk: Optional[OrderedDict[str, tuple[int, float]]] = None
+        self.disk_size = 0
+        self.disk_lock = threading.Lock()
+
+        # Metrics per host
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.revalidated: Counter = Counter()
+
+    @staticmethod
+    def key(method: str, url: str, body: Optional[dict] = None) -> str:
+        raw = json.dumps([method, url, body], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(cache_dir, f"{key}.json")
+
+    def remember(self, key: str, entry: CachedResponse) -> None:
+        """
+        Adds the entry to the memory tier and evicts the least recently used entries.
+        """
+        old = self.memory.pop(key, None)
+        if old is not None:
+            self.size -= len(old.body)
+
+        if len(entry.body) > self.max_bytes:
+            return
+
+        self.memory[key] = entry
+        self.size += len(entry.body)
+        while self.size > self.max_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.size -= len(evicted.body)
+
+    def load_disk_index(self) -> None:
+        """
+        Fills the index of the disk tier with the cached files, by their last use.
+        """
+        files = []
+        if os.path.isdir(cache_dir):
+            for name in os.listdir(cache_dir):
+                if name.endswith(".json"):
+                    stat = os.stat(os.path.join(cache_dir, name))
+                    files.append((stat.st_mtime, name[: -len(".json")], stat.st_size))
+
+        self.disk = OrderedDict(
+            (key, (size, used)) for used, key, size in sorted(files)
+        )
+        self.disk_size = sum(size for size, _ in self.disk.values())
+
+    def use_file(self, key: str, size: Optional[int]) -> None:
+        """
+        Marks the file as most recently used, or removes it from the index if size is None.
+        """
+        if self.disk is None:
+            self.load_disk_index()
+
+        old = self.disk.pop(key, None)
+        if old is not None:
+            self.disk_size -= old[0]
+        if size is not None:
+            self.disk[key] = (size, time.time())
+            self.disk_size += size
+
+    def prune_disk(self) -> None:
+        """
+        Removes the files that were not used for max_disk_age seconds
+        and the least recently used files while the disk tier is too large.
+        """
+        expired = time.time() - self.max_disk_age
+        while self.disk and (
+            self.disk_size > self.max_disk_bytes
+            or next(iter(self.disk.values()))[1] < expired
+        ):
+            key, (size, _) = self.disk.popitem(last=False)
+            self.disk_size -= size
+            try:
+                os.remove(self.get_path(key))
+            except FileNotFoundError:
+                pass
+
+    def read_disk(self, key: str) -> Optional[CachedResponse]:
+        with self.disk_lock:
+            try:
+                with open(self.get_path(key), "r", encoding="utf-8") as f:
+                    entry = CachedResponse(**json.load(f))
+            except FileNotFoundError:
+                self.use_file(key, None)
+                return None
+            except (json.JSONDecodeError, TypeError) as e:
+                logger.warning(f"Removing invalid HTTP cache file {key}: {e}")
+                os.remove(self.get_path(key))
+                self.use_file(key, None)
+                return None
+
+            # The modification time is the last use, also after a restart
+            os.utime(self.get_path(key))
+            self.use_file(key, os.path.getsize(self.get_path(key)))
+            return entry
+
+    def write_disk(self, key: str, entry: CachedResponse) -> None:
+        with self.disk_lock:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_file = self.get_path(key) + ".tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(entry._asdict(), f)
+            os.replace(tmp_file, self.get_path(key))
+
+            self.use_file(key, os.path.getsize(self.get_path(key)))
+            self.prune_disk()
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        """
+        Returns the cached response, fresh or not, or None if nothing is cached.
+        """
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.memory.move_to_end(key)
+            return entry
+
+        if not self.use_disk:
+            return None
+
+        entry = await asyncio.to_thread(self.read_disk, key)
+        if entry is not None:
+            self.remember(key, entry)
+        return entry
+
+    async def put(self, key: str, entry: CachedResponse) -> None:
+        self.remember(key, entry)
+        if self.use_disk:
+            try:
+                await asyncio.to_thread(self.write_disk, key, entry)
+            except OSError as e:
+                logger.error(f"Could not write the HTTP cache for {entry.url}: {e}")
+
+    async def store(self, key: str, url: str, body: str, headers) -> None:
+        """
+        Caches a new response together with its validators.
+        """
+        await self.put(
+            key,
+            CachedResponse(
+                url,
+                body,
+                time.time(),
+                headers.get("ETag"),
+                headers.get("Last-Modified"),
+            ),
+        )
+
+    async def refresh(self, key: str, entry: CachedResponse) -> None:
+        """
+        Marks a revalidated response (304 Not Modified) as fresh again.
+        """
+        self.revalidated[urlparse(entry.url).hostname] += 1
+        await self.put(key, entry._replace(stored=time.time()))
+
+    def hit(self, url: str) -> None:
+        self.hits[urlparse(url).hostname] += 1
+
+    def miss(self, url: str) -> None:
+        self.misses[urlparse(url).hostname] += 1
+
+    def metrics(self) -> dict[str, dict]:
+        """
+        Returns the hits, misses and revalidations per host.
+        """
+        hosts = set(self.hits) | set(self.misses) | set(self.revalidated)
+        return {
+            host: {
+                "hits": self.hits[host],
+                "misses": self.misses[host],
+                "revalidated": self.revalidated[host],
+            }
+            for host in hosts
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import time
+from collections import defaultdict
+from typing import Optional
+
+from tradingview_ta import get_multiple_analysis
+
+from constants.logger import logger
+
+# The length of the candles, in seconds
+INTERVAL_SECONDS = {
+    "1m": 60,
+    "5m": 5 * 60,
+    "15m": 15 * 60,
+    "30m": 30 * 60,
+    "1h": 60 * 60,
+    "2h": 2 * 60 * 60,
+    "4h": 4 * 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+
+# How long it is remembered that a symbol has no analysis
+MISSING_TTL = 5 * 60
+
+
+def next_candle(interval: str, now: Optional[float] = None) -> float:
+    """
+    Returns the unix time of the start of the next candle of the interval, in UTC.
+
+    Parameters
+    ----------
+    interval : str
+        The interval of the candles, e.g. "4h" or "1d".
+    now : Optional[float]
+        The current unix time, by default time.time().
+
+    Returns
+    -------
+    float
+        The unix time of the next candle.
+    """
+    if now is None:
+        now = time.time()
+
+    if interval in INTERVAL_SECONDS:
+        seconds = INTERVAL_SECONDS[interval]
+        return (now // seconds + 1) * seconds
+
+    today = datetime.datetime.fromtimestamp(now, datetime.timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    if interval == "1W":
+        # Weekly candles start on Monday
+        return (today + datetime.timedelta(days=7 - today.weekday())).timestamp()
+
+    # Monthly candles
+    if today.month == 12:
+        return today.replace(year=today.year + 1, month=1, day=1).timestamp()
+    return today.replace(month=today.month + 1, day=1).timestamp()
+
+
+class TAService:
+    """
+    Gets the TradingView technical analysis of many symbols with few requests.
+    Requests that arrive within a short window are batched into one get_multiple_analysis call
+    per (screener, interval), which runs in a thread because it is blocking.
+    The summaries are cached until the next candle of their interval starts.
+    """
+
+    def __init__(self, window: float = 0.25, timeout: float = 5) -> None:
+        self.window = window
+        self.timeout = timeout
+
+        # (screener, interval) -> symbol -> futures waiting for the analysis
+        self.pending: defaultdict[tuple[str, str], dict[str, list[asyncio.Future]]] = (
+            defaultdict(dict)
+        )
+        self.batches: dict[tuple[str, str], asyncio.Task] = {}
+
+        # (symbol, interval) -> (expires, summary)
+        self.cache: dict[tuple[str, str], tuple[float, Optional[dict]]] = {}
+
+        # Metrics
+        self.hits = 0
+        self.requests = 0
+
+    def get_cached(self, symbol: str, interval: str) -> tuple[bool, Optional[dict]]:
+        entry = self.cache.get((symbol, interval))
+        if entry is None:
+            return False, None
+        expires, summary = entry
+        if time.time() >= expires:
+            del self.cache[(symbol, interval)]
+            return False, None
+        return True, summary
+
+    async def get_analysis(
+        self, symbol: str, screener: str, interval: str
+    ) -> Optional[dict]:
+        """
+        Returns the summary of the technical analysis of the symbol.
+
+        Parameters
+        ----------
+        symbol : str
+            The symbol including the exchange, e.g. "BINANCE:BTCUSDT".
+        screener : str
+            The screener of the symbol, e.g. "crypto" or "america".
+        interval : str
+            The interval of the analysis, e.g. "4h" or "1d".
+
+        Returns
+        -------
+        Optional[dict]
+            The summary with the RECOMMENDATION and the BUY, NEUTRAL and SELL counts,
+            or None if TradingView has no analysis for the symbol.
+        """
+        symbol = symbol.upper()
+        found, summary = self.get_cached(symbol, interval)
+        if found:
+            self.hits += 1
+            return summary
+
+        key = (screener, interval)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key].setdefault(symbol, []).append(future)
+
+        if key not in self.batches:
+            self.batches[key] = asyncio.create_task(self.run_batch(key))
+
+        return await future
+
+    async def run_batch(self, key: tuple[str, str]) -> None:
+        # Wait for other requests of the same screener and interval
+        await asyncio.sleep(self.window)
+
+        batch = self.pending.pop(key, {})
+        del self.batches[key]
+        if not batch:
+            return
+
+        screener, interval = key
+        symbols = list(batch)
+        self.requests += 1
+
+        try:
+            analyses = await asyncio.to_thread(
+                get_multiple_analysis,
+                screener=screener,
+                interval=interval,
+                symbols=symbols,
+                timeout=self.timeout,
+            )
+        except Exception as e:
+            logger.error(
+                f"TradingView TA error for {len(symbols)} {screener} symbols: {e}"
+            )
+            # Errors are not cached, the next request tries again
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_result(None)
+            return
+
+        expires = next_candle(interval)
+        for symbol, futures in batch.items():
+            analysis = analyses.get(symbol)
+            summary = analysis.summary if analysis is not None else None
+            self.cache[(symbol, interval)] = (
+                expires if summary is not None else time.time() + MISSING_TTL,
+                summary,
+            )
+
+            for future in futures:
+                if not future.done():
+                    future.set_result(summary)
+
+
+ta_service = TAService()
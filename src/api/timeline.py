@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 import json
+import time
+from collections import deque
+from typing import Optional
 
 import uncurl
 
 from api.http_client import get_json_data
+from constants.config import config
 from constants.logger import logger
 
 # Read curl.txt
@@ -16,16 +20,33 @@ except Exception as e:
     logger.critical(f"Error: Could not read curl.txt: {e}")
 
 
-async def get_tweet():
+async def get_tweet(cursor: Optional[str] = None) -> list:
+    """
+    Gets the entries of the home timeline.
+
+    Parameters
+    ----------
+    cursor : Optional[str]
+        The top cursor of a previous request, to only get the entries that are newer.
+
+    Returns
+    -------
+    list
+        The timeline entries, including the cursor entries.
+    """
     if cURL is None:
         logger.critical("Error: no curl.txt file found. Timelines will not be updated.")
         return []
 
+    json_data = json.loads(cURL.data)
+    if cursor is not None and "variables" in json_data:
+        json_data["variables"]["cursor"] = cursor
+
     result = await get_json_data(
         cURL.url,
         headers=dict(cURL.headers),
         cookies=dict(cURL.cookies),
-        json_data=json.loads(cURL.data),
+        json_data=json_data,
         text=False,
     )
 
@@ -33,25 +54,113 @@ async def get_tweet():
         return []
 
     # TODO: Ignore x-premium alerts
-    if "data" in result:
-        if "home" in result["data"]:
-            if "home_timeline_urt" in result["data"]["home"]:
-                if "instructions" in result["data"]["home"]["home_timeline_urt"]:
-                    if (
-                        "entries"
-                        in result["data"]["home"]["home_timeline_urt"]["instructions"][
-                            0
-                        ]
-                    ):
-                        return result["data"]["home"]["home_timeline_urt"][
-                            "instructions"
-                        ][0]["entries"]
-
-    try:
-        result["data"]["home"]["home_timeline_urt"]["instructions"][0]["entries"]
-    except Exception as e:
-        logger.error(f"Error in get_tweet(): {e}")
-        with open("logs/get_tweet_error.json", "w") as f:
-            json.dump(result, f, indent=4)
+    instructions = (
+        result.get("data", {})
+        .get("home", {})
+        .get("home_timeline_urt", {})
+        .get("instructions", [])
+    )
+    for instruction in instructions:
+        if "entries" in instruction:
+            return instruction["entries"]
+
+    # Requests with a cursor return no entries if nothing is new
+    if cursor is not None and instructions:
+        return []
+
+    logger.error("Error in get_tweet(): no timeline entries found")
+    with open("logs/get_tweet_error.json", "w") as f:
+        json.dump(result, f, indent=4)
 
     return []
+
+
+def get_top_cursor(entries: list) -> Optional[str]:
+    """
+    Returns the cursor that can be used to get the entries that are newer than these entries.
+    """
+    for entry in entries:
+        content = entry.get("content", {})
+        if (
+            content.get("entryType") == "TimelineTimelineCursor"
+            and content.get("cursorType") == "Top"
+        ):
+            return content.get("value")
+    return None
+
+
+class TimelinePoller:
+    """
+    Polls the home timeline. After the first request only the entries that are newer than the
+    previous request are fetched, using the top cursor of the timeline.
+    The time between requests adapts to the timeline: it is halved when a request has many
+    new tweets and grows when there are none, between MIN_INTERVAL and MAX_INTERVAL seconds.
+    Requests are never made more often than the hourly budget allows.
+    """
+
+    def __init__(self) -> None:
+        polling_config = config["LOOPS"]["TIMELINE"].get("POLLING", {})
+        self.min_interval = polling_config.get("MIN_INTERVAL", 60)
+        self.max_interval = polling_config.get("MAX_INTERVAL", 600)
+        self.busy_tweets = polling_config.get("BUSY_TWEETS", 5)
+        self.requests_per_hour = polling_config.get("REQUESTS_PER_HOUR", 30)
+
+        # Start at the old fixed interval of 5 minutes
+        self.interval = min(max(5 * 60, self.min_interval), self.max_interval)
+        self.cursor: Optional[str] = None
+        self.requests: deque[float] = deque()
+
+    async def poll(self) -> list:
+        """
+        Gets the new timeline entries and updates the interval until the next request.
+
+        Returns
+        -------
+        list
+            The timeline entries, including the cursor entries.
+        """
+        self.requests.append(time.time())
+        entries = await get_tweet(self.cursor)
+
+        top_cursor = get_top_cursor(entries)
+        if top_cursor is None:
+            # The cursor is missing or no longer valid, the next request gets the full page
+            if self.cursor is not None and entries:
+                logger.debug("No top cursor in the timeline, getting the full page")
+            self.cursor = None
+            return entries
+
+        incremental = self.cursor is not None
+        self.cursor = top_cursor
+
+        # A full page is always "busy", so only incremental requests adapt the interval
+        if incremental:
+            tweets = sum(
+                entry.get("content", {}).get("entryType") == "TimelineTimelineItem"
+                for entry in entries
+            )
+            self.update_interval(tweets)
+
+        return entries
+
+    def update_interval(self, new_tweets: int) -> None:
+        if new_tweets >= self.busy_tweets:
+            self.interval /= 2
+        elif new_tweets == 0:
+            self.interval *= 1.5
+        self.interval = min(max(self.interval, self.min_interval), self.max_interval)
+
+    def next_delay(self) -> float:
+        """
+        Returns the seconds until the next request, waits longer if the hourly budget is used.
+        """
+        now = time.time()
+        while self.requests and now - self.requests[0] >= 60 * 60:
+            self.requests.popleft()
+
+        if len(self.requests) >= self.requests_per_hour:
+            return max(self.interval, self.requests[0] + 60 * 60 - now)
+        return self.interval
+
+
+timeline_poller = TimelinePoller()
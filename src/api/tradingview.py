@@ -1,20 +1,21 @@
 from __future__ import annotations
 
-import json
-import random
-import re
-import string
+import asyncio
 import traceback
-from typing import List, Optional
+from collections import defaultdict
+from typing import Optional
 
 import aiohttp
 import pandas as pd
-from tradingview_ta import Interval, TA_Handler
+from tradingview_ta import Interval
 
 import util.vars
-from api.http_client import get_json_data
+from api.http_client import get_json_data, post_json_data
+from api.ta_service import ta_service
+from api.tradingview_quotes import quote_client
 from constants.logger import logger
 from constants.tradingview import all_forex_indices, crypto_indices, stock_indices
+from util.single_flight import single_flight
 
 
 async def get_tv_ticker_data(url, append_to=None):
@@ -36,6 +37,69 @@ async def get_tv_ticker_data(url, append_to=None):
     return tv_data
 
 
+class SymbolIndex:
+    """
+    Maps the symbols of the TradingView reference tables to their (exchange, market, symbol).
+    It is built once per refresh of the tables, so looking up a symbol is a dict lookup
+    instead of a scan over the whole table.
+    """
+
+    # Suffixes that are tried for crypto symbols, in this order
+    crypto_suffixes = ["USD", "USDT", "USDTPERP"]
+
+    # The scanner markets of the indices, also known before the tables are loaded
+    index_markets = {
+        **{ticker: "america" for ticker in stock_indices},
+        **{ticker: "crypto" for ticker in crypto_indices},
+        **{ticker: "forex" for ticker in all_forex_indices},
+    }
+
+    def __init__(
+        self,
+        stocks: Optional[pd.DataFrame],
+        crypto: Optional[pd.DataFrame],
+        forex: Optional[pd.DataFrame],
+    ) -> None:
+        # Maps "exchange:symbol" to the scanner market
+        self.markets: dict[str, str] = dict(self.index_markets)
+        self.stocks = self.build(stocks, "america")
+        self.forex = self.build(forex, "forex")
+        self.crypto = self.build(crypto, "crypto")
+
+    def build(
+        self, tv_data: Optional[pd.DataFrame], market: str
+    ) -> dict[str, tuple[str, str, str]]:
+        index = {}
+        if tv_data is None or tv_data.empty:
+            return index
+
+        for exchange, symbol in zip(tv_data["exchange"], tv_data["stock"]):
+            # The first row of a symbol is used, same as the table lookups did
+            if isinstance(symbol, str) and symbol not in index:
+                index[symbol] = (exchange, market, symbol)
+                self.markets.setdefault(f"{exchange}:{symbol}", market)
+        return index
+
+    def lookup(self, symbol: str, asset: str) -> Optional[tuple[str, str, str]]:
+        """
+        Returns the (exchange, market, symbol) of the symbol, or None if it is unknown.
+        Crypto symbols are also looked up with a USD, USDT or USDTPERP suffix.
+        """
+        if asset == "stock":
+            return self.stocks.get(symbol) or self.forex.get(symbol)
+
+        if asset == "crypto":
+            if data := self.crypto.get(symbol):
+                return data
+
+            for suffix in self.crypto_suffixes:
+                if not symbol.endswith(suffix):
+                    if data := self.crypto.get(symbol + suffix):
+                        return data
+
+        return None
+
+
 class TV_data:
     """
     This class is used to get the current price, 24h change, and volume of a stock.
@@ -48,90 +112,16 @@ class TV_data:
         self.forex_indices_without_exch = [
             sym.split(":")[1] for sym in all_forex_indices
         ]
+        self.symbol_index: Optional[SymbolIndex] = None
 
-    async def on_msg(
-        self, ws: aiohttp.ClientWebSocketResponse, msg
-    ) -> Optional[tuple[float, float, float]]:
-        """
-        Parses the message from the TradingView API.
-
-        Returns
-        -------
-        Optional[tuple[float, float, float, str]]
-            float
-                The current price.
-            float
-                The current 24h change.
-            float
-                The current volume.
-        """
-
-        try:
-            # Try again
-            if '"m":' not in msg:
-                return None
-            elif Res := re.findall("^.*?({.*)$", msg):
-                jsonRes = json.loads(Res[0].split("~m~")[0])
-                if "m" in jsonRes.keys():
-                    if jsonRes["m"] == "qsd":
-                        try:
-                            price = float(jsonRes["p"][1]["v"]["lp"])
-                            change = float(jsonRes["p"][1]["v"]["ch"])
-                            volume = float(jsonRes["p"][1]["v"]["volume"])
-                        except KeyError:
-                            logger.error("KeyError in TradingView ws_data")
-                            return None
-
-                        if price != 0:
-                            perc_change = round((change / price) * 100, 2)
-                        else:
-                            logger.warn("TradingView returns price=0")
-                            return None
-
-                        return price, perc_change, volume
-            else:
-                # ping packet
-                pingStr = re.findall(".......(.*)", msg)
-                if len(pingStr) != 0:
-                    pingStr = pingStr[0]
-                    ws.send_str("~m~" + str(len(pingStr)) + "~m~" + pingStr)
-
-                return None
-        except Exception:
-            logger.error(traceback.format_exc())
-
-    async def sendMessage(
-        self, ws: aiohttp.ClientWebSocketResponse, func: str, args: List[str]
-    ) -> None:
+    def build_symbol_index(self) -> None:
         """
-        Sends a message to the TradingView API.
-        This needs to be done before any data can be retrieved.
-
-        Parameters
-        ----------
-        ws : aiohttp.ClientWebSocketResponse
-            The websocket object to send the message from.
-        func : str
-            The function to call, all start with ``quote_`` followed by the function name.
-        args : List[str]
-            The list of arguments to send in the message.
+        Builds the symbol index from the current TradingView tables and swaps it in.
+        Should be called after the tables in util.vars are refreshed.
         """
-
-        as_json = json.dumps({"m": func, "p": args}, separators=(",", ":"))
-        prepended = "~m~" + str(len(as_json)) + "~m~" + as_json
-        await ws.send_str(prepended)
-
-    def get_usd_info(self, tv_crypto, symbol: str, suffix: str):
-        if not symbol.endswith(suffix):
-            # If it crypto try adding USD or USDT
-            crypto_USD = tv_crypto.loc[tv_crypto["stock"] == symbol + suffix]
-
-            if not crypto_USD.empty:
-                return (
-                    crypto_USD["exchange"].values[0],
-                    "crypto",
-                    crypto_USD["stock"].values[0],
-                )
+        self.symbol_index = SymbolIndex(
+            util.vars.stocks, util.vars.crypto, util.vars.forex
+        )
 
     def get_symbol_data(
         self, symbol: str, asset: str
@@ -158,29 +148,22 @@ class TV_data:
                 The symbol itself.
         """
 
-        tv_stocks = util.vars.stocks
-        tv_crypto = util.vars.crypto
-        tv_forex = util.vars.forex
+        if self.symbol_index is None:
+            self.build_symbol_index()
 
-        if asset == "stock":
-            stock = tv_stocks.loc[tv_stocks["stock"] == symbol]
-            if not stock.empty:
-                return stock["exchange"].values[0], "america", symbol
+        return self.symbol_index.lookup(symbol, asset)
 
-            forex = tv_forex.loc[tv_forex["stock"] == symbol]
-            if not forex.empty:
-                return forex["exchange"].values[0], "forex", symbol
+    def get_market(self, ticker: str) -> str:
+        """
+        Returns the scanner market of the ticker, e.g. "america" for "NASDAQ:AAPL".
+        Unknown tickers are assumed to be American stocks.
+        """
+        if self.symbol_index is None:
+            self.build_symbol_index()
 
-        elif asset == "crypto":
-            crypto = tv_crypto.loc[tv_crypto["stock"] == symbol]
-            if not crypto.empty:
-                return crypto["exchange"].values[0], "crypto", symbol
-            else:
-                # Iterate over some USD suffixes
-                for s in ["USD", "USDT", "USDTPERP"]:
-                    if data := self.get_usd_info(tv_crypto, symbol, s):
-                        return data
+        return self.symbol_index.markets.get(ticker, "america")
 
+    @single_flight
     async def get_tv_data(
         self, symbol: str, asset: str
     ) -> Optional[tuple[float, float, float, str, str]]:
@@ -230,55 +213,24 @@ class TV_data:
             else:
                 return (0, None, 0, None, website)
 
-            # Create a session
-            session = aiohttp.ClientSession()
-
-            async with session.ws_connect(
-                url="wss://data.tradingview.com/socket.io/websocket",
-                headers={"Origin": "https://data.tradingview.com"},
-            ) as ws:
-                # This is mandatory to get the data
-                auth_str = "qs_" + "".join(
-                    random.choice(string.ascii_lowercase) for i in range(12)
-                )
-
-                # Send messages via websocket
-                await self.sendMessage(ws, "quote_create_session", [auth_str])
-                await self.sendMessage(
-                    ws, "quote_set_fields", [auth_str, "ch", "lp", "volume"]
-                )
-                await self.sendMessage(ws, "quote_add_symbols", [auth_str, symbol])
-
-                counter = 0
-
-                # Check for response
-                async for msg in ws:
-                    counter += 1
-
-                    if msg.type == aiohttp.WSMsgType.TEXT:
-                        resp = await self.on_msg(ws, msg.data)
-
-                        if resp is not None:
-                            await ws.close()
-                            await session.close()
-                            # Convert to USD volume if asset is crypto
-                            return (
-                                float(resp[0]),
-                                float(resp[1]),
-                                resp[0] * resp[2] if asset == "crypto" else resp[2],
-                                exchange.lower(),
-                                website,
-                            )
-
-                        elif counter == 3:
-                            await session.close()
-                            return (0, None, 0, None, website)
-
-                    elif msg.type == aiohttp.WSMsgType.ERROR:
-                        # self.restart_sockets()
-                        logger.error("TradingView websocket Error")
-                        await session.close()
-                        return (0, None, 0, None, website)
+            quote = await quote_client.get_quote(symbol)
+            if quote is None:
+                return (0, None, 0, None, website)
+
+            if quote.price == 0:
+                logger.warn("TradingView returns price=0")
+                return (0, None, 0, None, website)
+
+            perc_change = round((quote.change / quote.price) * 100, 2)
+
+            # Convert to USD volume if asset is crypto
+            return (
+                quote.price,
+                perc_change,
+                quote.price * quote.volume if asset == "crypto" else quote.volume,
+                exchange.lower(),
+                website,
+            )
 
         except aiohttp.ClientConnectionError:
             logger.error("Temporary TradingView websocket error")
@@ -305,7 +257,8 @@ class TV_data:
 
         return f"{analysis['RECOMMENDATION']}\n{analysis['BUY']}📈 {analysis['NEUTRAL']}⌛️ {analysis['SELL']}📉"
 
-    def get_tv_TA(self, symbol: str, asset: str) -> Optional[tuple[str, str]]:
+    @single_flight
+    async def get_tv_TA(self, symbol: str, asset: str) -> Optional[tuple[str, str]]:
         """
         Gets the current TA (technical analysis) data from the TradingView API.
 
@@ -338,33 +291,21 @@ class TV_data:
         if symbol_data is not None:
             exchange, market, symbol = symbol_data
 
-            # Wait max 5 sec
-            try:
-                four_h_analysis = TA_Handler(
-                    symbol=symbol,
-                    screener=market,
-                    exchange=exchange,
-                    interval=Interval.INTERVAL_4_HOURS,
-                    timeout=5,
-                ).get_analysis()
-
-                one_d_analysis = TA_Handler(
-                    symbol=symbol,
-                    screener=market,
-                    exchange=exchange,
-                    interval=Interval.INTERVAL_1_DAY,
-                    timeout=5,
-                ).get_analysis()
-
-            except Exception as e:
-                logger.error(f"TradingView TA error for ticker: {symbol}, error: {e}")
-                return None, None
+            # Batched with the other TA requests and cached until the next candle
+            four_h_analysis, one_d_analysis = await asyncio.gather(
+                ta_service.get_analysis(
+                    f"{exchange}:{symbol}", market, Interval.INTERVAL_4_HOURS
+                ),
+                ta_service.get_analysis(
+                    f"{exchange}:{symbol}", market, Interval.INTERVAL_1_DAY
+                ),
+            )
 
             if four_h_analysis:
-                four_h_analysis = self.format_analysis(four_h_analysis.summary)
+                four_h_analysis = self.format_analysis(four_h_analysis)
 
             if one_d_analysis:
-                one_d_analysis = self.format_analysis(one_d_analysis.summary)
+                one_d_analysis = self.format_analysis(one_d_analysis)
 
             # Format the analysis
             return four_h_analysis, one_d_analysis
@@ -373,3 +314,56 @@ class TV_data:
 
 
 tv = TV_data()
+
+
+async def bulk_quotes(
+    symbols: list[str], columns: Optional[list[str]] = None
+) -> pd.DataFrame:
+    """
+    Gets the quotes of many symbols with one TradingView scanner request per market.
+
+    Parameters
+    ----------
+    symbols : list[str]
+        The symbols including the exchange, e.g. ["TVC:DXY", "CRYPTOCAP:TOTAL"].
+    columns : Optional[list[str]]
+        The scanner columns to get, by default ["close", "change", "volume"].
+        The change is the percentual change since the previous close.
+
+    Returns
+    -------
+    pd.DataFrame
+        The float values of the columns, indexed by the symbols in the given order.
+        Symbols without a quote have NaN values.
+    """
+    if columns is None:
+        columns = ["close", "change", "volume"]
+
+    by_market = defaultdict(list)
+    for symbol in symbols:
+        by_market[tv.get_market(symbol)].append(symbol)
+
+    responses = await asyncio.gather(
+        *[
+            post_json_data(
+                f"https://scanner.tradingview.com/{market}/scan",
+                json={
+                    "symbols": {"tickers": tickers, "query": {"types": []}},
+                    "columns": columns,
+                },
+                idempotent=True,
+            )
+            for market, tickers in by_market.items()
+        ]
+    )
+
+    rows = {}
+    for response in responses:
+        for row in (response or {}).get("data", []):
+            rows[row["s"]] = row["d"]
+
+    quotes = pd.DataFrame.from_dict(rows, orient="index", columns=columns)
+    quotes = quotes.apply(pd.to_numeric, errors="coerce").astype("float64")
+
+    # Keep the order of the symbols, including the symbols without a quote
+    return quotes.reindex(symbols)
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import string
+import time
+from typing import NamedTuple, Optional
+
+import aiohttp
+
+from api.http_client import get_session
+from constants.logger import logger
+
+WS_URL = "wss://data.tradingview.com/socket.io/websocket"
+FIELDS = ["lp", "ch", "volume"]
+
+
+class Quote(NamedTuple):
+    price: float
+    change: float
+    volume: float
+    timestamp: float
+
+
+def parse_frames(data: str) -> list[str]:
+    """
+    Splits a websocket message in its frames, every frame is formatted as ~m~<length>~m~<payload>.
+    """
+    frames = []
+    i = 0
+    while data.startswith("~m~", i):
+        j = data.index("~m~", i + 3)
+        length = int(data[i + 3 : j])
+        frames.append(data[j + 3 : j + 3 + length])
+        i = j + 3 + length
+    return frames
+
+
+def format_frame(payload: str) -> str:
+    return f"~m~{len(payload)}~m~{payload}"
+
+
+class QuoteClient:
+    """
+    Keeps one websocket to TradingView open for all quotes. Symbols are added to the quote session
+    the first time they are requested and removed after they have not been requested for a while.
+    The latest values of every symbol are kept in memory, TradingView pushes the changes.
+    If the connection drops it is reopened and all symbols are added again.
+    """
+
+    def __init__(
+        self, freshness: float = 60, idle_timeout: float = 60 * 60, timeout: float = 5
+    ) -> None:
+        # How long a quote is used without a live subscription
+        self.freshness = freshness
+        # How long a symbol stays subscribed after it was last requested
+        self.idle_timeout = idle_timeout
+        # How long to wait for the first quote of a symbol
+        self.timeout = timeout
+
+        self.ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self.session_id: Optional[str] = None
+        self.reader_task: Optional[asyncio.Task] = None
+        self.connect_lock = asyncio.Lock()
+        self.closing = False
+
+        self.symbols: set[str] = set()
+        self.last_used: dict[str, float] = {}
+        self.values: dict[str, dict] = {}
+        self.quotes: dict[str, Quote] = {}
+        self.invalid: dict[str, float] = {}
+        self.waiters: dict[str, list[asyncio.Future]] = {}
+
+    @property
+    def connected(self) -> bool:
+        return self.ws is not None and not self.ws.closed
+
+    async def send(self, func: str, args: list) -> None:
+        payload = json.dumps({"m": func, "p": args}, separators=(",", ":"))
+        await self.ws.send_str(format_frame(payload))
+
+    async def connect(self) -> None:
+        """
+        Opens the websocket, creates the quote session and adds the subscribed symbols again.
+        """
+        session = await get_session()
+        self.ws = await session.ws_connect(
+            url=WS_URL,
+            headers={"Origin": "https://data.tradingview.com"},
+        )
+        self.session_id = "qs_" + "".join(
+            random.choice(string.ascii_lowercase) for _ in range(12)
+        )
+
+        await self.send("quote_create_session", [self.session_id])
+        await self.send("quote_set_fields", [self.session_id, *FIELDS])
+        if self.symbols:
+            await self.send("quote_add_symbols", [self.session_id, *self.symbols])
+
+        self.reader_task = asyncio.create_task(self.read(self.ws))
+        logger.debug(
+            f"Connected to TradingView quotes with {len(self.symbols)} symbols"
+        )
+
+    async def ensure_connected(self) -> None:
+        async with self.connect_lock:
+            if not self.connected:
+                await self.connect()
+
+    async def read(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        """
+        Reads the messages of the websocket until it is closed, then reconnects.
+        """
+        try:
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    for frame in parse_frames(msg.data):
+                        await self.on_frame(frame)
+                elif msg.type == aiohttp.WSMsgType.ERROR:
+                    logger.error(f"TradingView websocket error: {ws.exception()}")
+                    break
+        except Exception as e:
+            logger.error(f"Error reading the TradingView websocket: {e}")
+        finally:
+            if not ws.closed:
+                await ws.close()
+
+        if not self.closing and self.symbols:
+            asyncio.create_task(self.reconnect())
+
+    async def reconnect(self) -> None:
+        delay = 1
+        while not self.closing and not self.connected:
+            await asyncio.sleep(delay)
+            try:
+                await self.ensure_connected()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Could not reconnect to TradingView quotes: {e}")
+                delay = min(delay * 2, 60)
+
+    async def on_frame(self, frame: str) -> None:
+        # Heartbeats have to be sent back, otherwise TradingView closes the connection
+        if frame.startswith("~h~"):
+            await self.ws.send_str(format_frame(frame))
+            return
+
+        try:
+            message = json.loads(frame)
+        except json.JSONDecodeError:
+            return
+
+        if not isinstance(message, dict):
+            return
+
+        if message.get("m") == "qsd":
+            self.on_quote(message["p"][1])
+        elif message.get("m") == "quote_completed":
+            self.resolve(message["p"][1])
+
+    def on_quote(self, data: dict) -> None:
+        symbol = data.get("n")
+        if data.get("s") == "error":
+            self.invalid[symbol] = time.time()
+            self.resolve(symbol)
+            return
+
+        # Only the changed values are sent, so they are merged with the previous values
+        values = self.values.setdefault(symbol, {})
+        values.update(data.get("v", {}))
+
+        if values.get("lp") is not None:
+            self.invalid.pop(symbol, None)
+            self.quotes[symbol] = Quote(
+                float(values["lp"]),
+                float(values.get("ch") or 0),
+                float(values.get("volume") or 0),
+                time.time(),
+            )
+            if values.get("ch") is not None:
+                self.resolve(symbol)
+
+    def resolve(self, symbol: str) -> None:
+        """
+        Passes the current quote (or None) to the callers waiting for the symbol.
+        """
+        for future in self.waiters.pop(symbol, []):
+            if not future.done():
+                future.set_result(self.quotes.get(symbol))
+
+    def is_fresh(self, symbol: str, quote: Quote) -> bool:
+        # Subscribed symbols are pushed when they change, so their quote is up to date
+        if self.connected and symbol in self.symbols:
+            return True
+        return time.time() - quote.timestamp < self.freshness
+
+    async def subscribe(self, symbol: str) -> None:
+        await self.ensure_connected()
+        if symbol not in self.symbols:
+            self.symbols.add(symbol)
+            await self.send("quote_add_symbols", [self.session_id, symbol])
+
+    async def remove_idle_symbols(self) -> None:
+        now = time.time()
+        idle = [
+            symbol
+            for symbol in self.symbols
+            if now - self.last_used.get(symbol, 0) > self.idle_timeout
+        ]
+        if not idle:
+            return
+
+        self.symbols.difference_update(idle)
+        for symbol in idle:
+            self.last_used.pop(symbol, None)
+            self.values.pop(symbol, None)
+        if self.connected:
+            await self.send("quote_remove_symbols", [self.session_id, *idle])
+
+    async def get_quote(self, symbol: str) -> Optional[Quote]:
+        """
+        Returns the quote of the symbol, waiting for TradingView if there is no fresh quote yet.
+
+        Parameters
+        ----------
+        symbol : str
+            The symbol including the exchange, e.g. "BINANCE:BTCUSDT".
+
+        Returns
+        -------
+        Optional[Quote]
+            The price, change, volume and time of the quote, or None if there is no quote.
+        """
+        self.last_used[symbol] = time.time()
+
+        quote = self.quotes.get(symbol)
+        if quote is not None and self.is_fresh(symbol, quote):
+            return quote
+
+        if time.time() - self.invalid.get(symbol, 0) < self.freshness:
+            return None
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(symbol, []).append(future)
+
+        try:
+            await self.remove_idle_symbols()
+            await self.subscribe(symbol)
+            return await asyncio.wait_for(future, self.timeout)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug(f"No TradingView quote for {symbol}: {e!r}")
+            return self.quotes.get(symbol)
+        finally:
+            waiters = self.waiters.get(symbol, [])
+            if future in waiters:
+                waiters.remove(future)
+
+    async def close(self) -> None:
+        """
+        Closes the websocket, used on shutdown.
+        """
+        self.closing = True
+        if self.ws is not None and not self.ws.closed:
+            await self.ws.close()
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+
+
+quote_client = QuoteClient()
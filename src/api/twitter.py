@@ -7,6 +7,7 @@ from typing import List
 
 import util.vars
 from constants.logger import logger
+from util.tweet_ids import tweet_ids
 
 
 def remove_twitter_url_at_end(text: str) -> str:
@@ -123,10 +124,9 @@ def parse_tweet(tweet: dict, update_tweet_id: bool = False):
 
     # So we can use this function recursively
     if update_tweet_id:
-        # Skip this tweet
-        if tweet_id <= util.vars.latest_tweet_id:
+        # Skip tweets that were posted or are being processed
+        if not tweet_ids.claim(int(tweet_id)):
             return
-        util.vars.latest_tweet_id = tweet_id
 
     # Get user info
     user_name = get_user_info(tweet, "name")  # The name of the account (not @username)
@@ -197,6 +197,7 @@ def parse_tweet(tweet: dict, update_tweet_id: bool = False):
                 r_hashtags,
                 _,
                 r_media_types,
+                _,
             ) = replied_tweet
 
             media += r_media
@@ -257,4 +258,5 @@ def parse_tweet(tweet: dict, update_tweet_id: bool = False):
         hashtags,
         e_title,
         media_types,
+        int(tweet_id),
     )
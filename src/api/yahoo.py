@@ -9,34 +9,46 @@ from api.tradingview import tv
 from constants.logger import logger
 from util.afterhours import afterHours
 from util.formatting import format_change
+from util.single_flight import single_flight
 
 headers = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36 Edg/110.0.1587.57"
 }
 
 
+def get_quotes(data: dict) -> list[dict]:
+    """
+    Returns the quotes of a Yahoo Finance response, or an empty list if the request failed.
+    """
+    try:
+        return data["finance"]["result"][0]["quotes"]
+    except (KeyError, IndexError, TypeError):
+        logger.warning("Yahoo Finance response did not contain any quotes")
+        return []
+
+
 async def get_gainers(count: int = 10) -> list[dict]:
     url = f"https://query1.finance.yahoo.com/v1/finance/screener/predefined/saved?formatted=false&lang=en-US&region=US&scrIds=day_gainers&count={count}&corsDomain=finance.yahoo.com"
     data = await get_json_data(url, headers=headers)
-    return data["finance"]["result"][0]["quotes"]
+    return get_quotes(data)
 
 
 async def get_losers(count: int = 10) -> list[dict]:
     url = f"https://query1.finance.yahoo.com/v1/finance/screener/predefined/saved?formatted=false&lang=en-US&region=US&scrIds=day_losers&count={count}&corsDomain=finance.yahoo.com"
     data = await get_json_data(url, headers=headers)
-    return data["finance"]["result"][0]["quotes"]
+    return get_quotes(data)
 
 
 async def get_most_active(count: int = 10) -> list[dict]:
     url = f"https://query1.finance.yahoo.com/v1/finance/screener/predefined/saved?formatted=false&lang=en-US&region=US&scrIds=most_actives&count={count}&corsDomain=finance.yahoo.com"
     data = await get_json_data(url, headers=headers)
-    return data["finance"]["result"][0]["quotes"]
+    return get_quotes(data)
 
 
 async def get_trending(count: int = 10) -> list:
     url = f"https://query1.finance.yahoo.com/v1/finance/trending/US?count={count}"
     data = await get_json_data(url, headers=headers)
-    return [stock["symbol"] for stock in data["finance"]["result"][0]["quotes"]]
+    return [stock["symbol"] for stock in get_quotes(data)]
 
 
 async def get_ohlcv(ticker: str) -> dict:
@@ -172,6 +184,7 @@ async def yf_info(ticker: str, do_format_change: bool = True):
     return volume, url, [], prices, changes if changes else ["N/A"], ticker
 
 
+@single_flight
 async def get_stock_info(
     ticker: str, asset_type: str = "stock", do_format_change: bool = True
 ) -> Optional[tuple[float, str, List[str], float, str, str]]:
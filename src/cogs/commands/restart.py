@@ -4,8 +4,12 @@ import sys
 from discord.commands.context import ApplicationContext
 from discord.ext import commands
 
+from api.http_client import session_manager, tls_pool
+from api.tradingview_quotes import quote_client
 from constants.config import config
+from util.db import db_manager
 from util.disc import conditional_role_decorator, log_command_usage
+from util.pipeline import close_pipelines
 
 
 class Restart(commands.Cog):
@@ -28,6 +32,12 @@ class Restart(commands.Cog):
         ctx: ApplicationContext,
     ) -> None:
         await ctx.respond("Restarting bot...")
+        # Make sure the queued database writes are saved
+        await close_pipelines()
+        await db_manager.close()
+        await quote_client.close()
+        await session_manager.close()
+        tls_pool.close()
         self.restart_bot()
 
 
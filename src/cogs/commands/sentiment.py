@@ -3,15 +3,14 @@ import traceback
 from io import StringIO
 
 import discord
-import nltk
 import pandas as pd
 from discord.commands.context import ApplicationContext
 from discord.ext import commands
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
 
 from api.http_client import get_json_data
 from constants.logger import logger
 from constants.sources import data_sources
+from models.sentiment import sentiment_service
 from util.confirm_stock import confirm_stock
 from util.disc import log_command_usage
 
@@ -129,7 +128,7 @@ class Sentiment(commands.Cog):
 
         dates = last_5["Date"].dt.strftime("%d/%m/%y").tolist()
         headlines = last_5["Headline"].astype(str).tolist()
-        sentiments = last_5["Sentiment"].astype(str).tolist()
+        sentiments = [f"{score:.2f}" for score in last_5["Sentiment"]]
 
         for i in range(5):
             e.add_field(
@@ -199,7 +198,8 @@ class Sentiment(commands.Cog):
 
     async def get_sentiment(self, ticker: str) -> pd.DataFrame:
         """
-        Calculate the sentiment for a given stock ticker.
+        Calculate the sentiment for a given stock ticker, using FinTwitBERT.
+        The sentiment of a headline is between -1 (bearish) and 1 (bullish).
 
         Parameters
         ----------
@@ -213,25 +213,14 @@ class Sentiment(commands.Cog):
         """
 
         df = await self.get_finviz_data(ticker)
-        text = df["Headline"].tolist()
-        sentiment = []
-
-        # Calculate the sentiment for each headline
-        for text in text:
-            # Check if the NLTK packages are installed
-            try:
-                analyzer = SentimentIntensityAnalyzer()
-                sentiment.append(analyzer.polarity_scores(text)["compound"])
-            except LookupError:
-                # Download the NLTK packages
-                nltk.download("vader_lexicon")
-
-                # Try again
-                analyzer = SentimentIntensityAnalyzer()
-                sentiment.append(analyzer.polarity_scores(text)["compound"])
+
+        # The headlines are classified in batches, together with the timeline tweets
+        results = await sentiment_service.classify_many(
+            df["Headline"].astype(str).tolist()
+        )
 
         # Add the sentiment to the dataframe
-        df["Sentiment"] = sentiment
+        df["Sentiment"] = [result.score for result in results]
 
         return df
 
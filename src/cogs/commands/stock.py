@@ -8,6 +8,7 @@ import util.vars
 from api.yahoo import get_ohlcv
 from constants.config import config
 from constants.logger import logger
+from util.asset_index import asset_index
 from util.confirm_stock import confirm_stock
 from util.db import merge_and_update, update_db
 from util.disc import get_channel, log_command_usage
@@ -123,7 +124,7 @@ class Stock(commands.Cog):
                     "buying_price": buying_price,
                     "owned": amount,
                     "exchange": "stock",
-                    "id": str(ctx.author.id),
+                    "id": ctx.author.id,
                     "user": ctx.author.name,
                 }
             ]
@@ -133,23 +134,24 @@ class Stock(commands.Cog):
 
         # Check if the user has this asset already
         owned_in_db = old_db.loc[
-            (old_db["id"] == str(ctx.author.id)) & (old_db["asset"] == ticker.upper())
+            (old_db["id"] == ctx.author.id) & (old_db["asset"] == ticker.upper())
         ]
 
         # If the user does not yet own this stock
         if owned_in_db.empty:
             util.vars.assets_db = merge_and_update(old_db, new_data, "assets")
+            asset_index.add(ticker.upper(), ctx.author.id)
         else:
             # Increase the amount if everything is the same
             same_price = old_db.loc[
-                (old_db["id"] == str(ctx.author.id))
+                (old_db["id"] == ctx.author.id)
                 & (old_db["asset"] == ticker.upper())
                 & (old_db["buying_price"] == buying_price)
             ]
 
             if not same_price.empty:
                 old_db.loc[
-                    (old_db["id"] == str(ctx.author.id))
+                    (old_db["id"] == ctx.author.id)
                     & (old_db["asset"] == ticker.upper()),
                     "owned",
                 ] += amount
@@ -165,14 +167,14 @@ class Stock(commands.Cog):
 
                 # Update the buying price and amount owned
                 old_db.loc[
-                    (old_db["id"] == str(ctx.author.id))
+                    (old_db["id"] == ctx.author.id)
                     & (old_db["asset"] == ticker.upper()),
                     "buying_price",
                 ] = new_buying_price
 
                 # Update the amount owned
                 old_db.loc[
-                    (old_db["id"] == str(ctx.author.id))
+                    (old_db["id"] == ctx.author.id)
                     & (old_db["asset"] == ticker.upper()),
                     "owned",
                 ] += amount
@@ -231,12 +233,13 @@ class Stock(commands.Cog):
 
         if not amount:
             row = old_db.index[
-                (old_db["id"] == str(ctx.author.id)) & (old_db["asset"] == ticker)
+                (old_db["id"] == ctx.author.id) & (old_db["asset"] == ticker)
             ]
 
             # Update database
             if not row.empty:
                 amount = old_db.loc[row, "owned"].values[0]
+                asset_index.remove_rows(old_db.loc[row])
                 self.update_assets_db(old_db.drop(index=row))
                 await ctx.respond(
                     f"Succesfully removed all {ticker.upper()} from your owned stocks!"
@@ -253,7 +256,7 @@ class Stock(commands.Cog):
                 return
 
             row = old_db.loc[
-                (old_db["id"] == str(ctx.author.id)) & (old_db["asset"] == ticker)
+                (old_db["id"] == ctx.author.id) & (old_db["asset"] == ticker)
             ]
 
             # Update database
@@ -262,13 +265,14 @@ class Stock(commands.Cog):
                 owned_now = row["owned"].tolist()[0]
                 # if it is equal to or greater than the amount to remove, remove all
                 if float(amount) >= owned_now:
+                    asset_index.remove_rows(row)
                     self.update_assets_db(old_db.drop(index=row.index))
                     await ctx.respond(
                         f"Succesfully removed all {ticker.upper()} from your owned stocks!"
                     )
                 else:
                     old_db.loc[
-                        (old_db["id"] == str(ctx.author.id))
+                        (old_db["id"] == ctx.author.id)
                         & (old_db["asset"] == ticker.upper()),
                         "owned",
                     ] -= float(amount)
@@ -311,7 +315,7 @@ class Stock(commands.Cog):
         await ctx.response.defer(ephemeral=True)
 
         db = util.vars.assets_db
-        rows = db.loc[(db["id"] == str(ctx.author.id)) & (db["exchange"] == "stock")]
+        rows = db.loc[(db["id"] == ctx.author.id) & (db["exchange"] == "stock")]
         if not rows.empty:
             for _, row in rows.iterrows():
                 # TODO: send this as 1 embed
@@ -14,6 +14,7 @@ from api.coingecko import get_coin_info
 from api.yahoo import get_stock_info
 from constants.config import config
 from constants.logger import logger
+from util.asset_index import asset_index
 from util.db import update_db
 from util.disc import get_channel, get_guild, get_user, loop_error_catcher
 from util.exchange_data import get_data
@@ -96,10 +97,11 @@ class Assets(commands.Cog):
 
         # Drop all crypto assets, so we can update them
         if not util.vars.assets_db.empty:
-            crypto_rows = util.vars.assets_db.index[
+            crypto_rows = util.vars.assets_db[
                 util.vars.assets_db["exchange"] != "stock"
-            ].tolist()
-            assets_db = util.vars.assets_db.drop(index=crypto_rows)
+            ]
+            assets_db = util.vars.assets_db.drop(index=crypto_rows.index)
+            asset_index.remove_rows(crypto_rows)
         else:
             # Create a new database
             assets_db = pd.DataFrame(columns=list(assets_db_columns.keys()))
@@ -109,6 +111,7 @@ class Assets(commands.Cog):
             # Add this data to the assets db
             exch_data = await get_data(row)
             assets_db = pd.concat([assets_db, exch_data], ignore_index=True)
+            asset_index.add_rows(exch_data)
 
         # Ensure that the db knows the right types
         assets_db = assets_db.astype(assets_db_columns)
@@ -12,7 +12,7 @@ from discord.ext.tasks import loop
 from matplotlib.ticker import FuncFormatter
 from tqdm import tqdm
 
-from api.binance import BinanceClient
+from api.binance import binance_client
 from api.coingecko import get_top_vol_coins
 from constants.config import config
 from constants.sources import data_sources
@@ -88,14 +88,13 @@ class Funding_heatmap(commands.Cog):
 
 async def get_all_funding_rates(NUM_COINS: int = 30):
     # TODO: Check if there is new data and save it
-    b = BinanceClient()
     symbols = await get_top_vol_coins(NUM_COINS)
 
     os.makedirs("data/funding_rate", exist_ok=True)
 
     for symbol in tqdm(symbols, desc="Processing symbols"):
         # tqdm.write(f"Processing symbol: {symbol}")
-        df = await b.fund_rating(symbol, rows=10_000)
+        df = await binance_client.fund_rating(symbol, rows=10_000)
         # Save the df in data/funding_rate/symbol.csv
         if not df.empty:
             df.to_csv(f"data/funding_rate/{symbol}.csv", index=False)
@@ -121,8 +120,7 @@ async def load_funding_rate_data(directory):
             symbol = file.split("/")[-1].split(".")[0]
             # Also remove any backslashes from the symbol
             symbol = symbol.split("\\")[-1]
-            b = BinanceClient()
-            new_df = await b.fund_rating(symbol, rows=10_000)
+            new_df = await binance_client.fund_rating(symbol, rows=10_000)
             if not new_df.empty:
                 new_df.to_csv(file, index=False)
                 df = pd.read_csv(file, parse_dates=["calcTime"])
@@ -9,7 +9,7 @@ import util.vars
 from api.tradingview_ideas import scraper
 from constants.config import config
 from constants.sources import data_sources
-from util.db import update_db
+from util.db import append_rows, delete_older_than
 from util.disc import get_channel, get_tagged_users, loop_error_catcher
 
 
@@ -34,26 +34,27 @@ class TradingView_Ideas(commands.Cog):
         #     self.forex_channel = None
         #     self.forex_ideas.start()
 
-    def add_id_to_db(self, id: str) -> None:
+    def add_id_to_db(self, id: str) -> pd.DataFrame:
         """
-        Adds the given id to the database.
+        Adds the given id to the database and returns the new row.
         """
 
-        util.vars.ideas_ids = pd.concat(
+        new_row = pd.DataFrame(
             [
-                util.vars.ideas_ids,
-                pd.DataFrame(
-                    [
-                        {
-                            "id": id,
-                            "timestamp": datetime.datetime.now(),
-                        }
-                    ]
-                ),
-            ],
+                {
+                    "id": id,
+                    "timestamp": datetime.datetime.now(),
+                }
+            ]
+        )
+
+        util.vars.ideas_ids = pd.concat(
+            [util.vars.ideas_ids, new_row],
             ignore_index=True,
         )
 
+        return new_row
+
     async def send_embed(self, df: pd.DataFrame, type: str) -> None:
         """
         Creates an embed based on the given DataFrame and type.
@@ -73,20 +74,14 @@ class TradingView_Ideas(commands.Cog):
 
         # Get the database
         if not util.vars.ideas_ids.empty:
-            # Set the types
-            util.vars.ideas_ids = util.vars.ideas_ids.astype(
-                {
-                    "id": str,
-                    "timestamp": "datetime64[ns]",
-                }
-            )
-
             # Only keep ids that are less than 72 hours old
             util.vars.ideas_ids = util.vars.ideas_ids[
                 util.vars.ideas_ids["timestamp"]
                 > datetime.datetime.now() - datetime.timedelta(hours=72)
             ]
+        delete_older_than("ideas_ids", days=3)
 
+        new_ids = []
         counter = 1
         for _, row in df.iterrows():
             if not util.vars.ideas_ids.empty:
@@ -94,7 +89,7 @@ class TradingView_Ideas(commands.Cog):
                     counter += 1
                     continue
 
-            self.add_id_to_db(row["Url"])
+            new_ids.append(self.add_id_to_db(row["Url"]))
 
             if row["Label"] == "Long":
                 color = 0x3CC474
@@ -140,8 +135,9 @@ class TradingView_Ideas(commands.Cog):
             # Only show the top 10 ideas
             if counter == 11:
                 break
-        # Write to db
-        update_db(util.vars.ideas_ids, "ideas_ids")
+        # Only write the new ids to the db
+        if new_ids:
+            append_rows(pd.concat(new_ids, ignore_index=True), "ideas_ids")
 
     @loop(hours=24)
     @loop_error_catcher
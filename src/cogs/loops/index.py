@@ -3,12 +3,13 @@ from __future__ import annotations
 import datetime
 
 import discord
+import pandas as pd
 from discord.ext import commands
 from discord.ext.tasks import loop
 
 from api.farside import get_etf_inflow
 from api.fear_greed import get_feargread
-from api.tradingview import tv
+from api.tradingview import bulk_quotes
 from constants.config import config
 from constants.sources import data_sources
 from constants.tradingview import crypto_indices, forex_indices, stock_indices
@@ -18,6 +19,23 @@ from util.formatting import human_format
 
 
 async def create_embed(title: str, indices: list, data_type: str) -> discord.Embed:
+    """
+    Creates the embed with the current values of the indices.
+
+    Parameters
+    ----------
+    title : str
+        The title of the embed.
+    indices : list
+        The indices including the exchange, e.g. ["CRYPTOCAP:TOTAL"].
+    data_type : str
+        Either "crypto" or "stock".
+
+    Returns
+    -------
+    discord.Embed
+        The embed, or None if there is no data.
+    """
     e = discord.Embed(
         title=title,
         description="",
@@ -27,14 +45,20 @@ async def create_embed(title: str, indices: list, data_type: str) -> discord.Emb
 
     ticker, prices, changes = [], [], []
 
-    for index in indices:
-        price, change, _, exchange, _ = await tv.get_tv_data(index, data_type)
+    # One scanner request per market for all indices
+    quotes = await bulk_quotes(indices, ["close", "change"])
+
+    for symbol, (price, change) in zip(indices, quotes.itertuples(index=False)):
+        exchange, index = symbol.split(":")
 
-        if price == 0:
+        if pd.isna(price) or price == 0:
             continue
 
-        change = round(change, 2)
-        change = f"+{change}% 📈" if change > 0 else f"{change}% 📉"
+        if pd.isna(change):
+            change = "N/A"
+        else:
+            change = round(change, 2)
+            change = f"+{change}% 📈" if change > 0 else f"{change}% 📉"
 
         # Special price formatting for crypto
         if data_type == "crypto" and index in ["TOTAL", "TOTAL2", "TOTAL3"]:
@@ -45,7 +69,7 @@ async def create_embed(title: str, indices: list, data_type: str) -> discord.Emb
             price = f"{round(price, 2)}"
 
         ticker.append(
-            f"[{index}](https://www.tradingview.com/symbols/{exchange}-{index}/)"
+            f"[{index}](https://www.tradingview.com/symbols/{exchange.lower()}-{index}/)"
         )
         prices.append(price)
         changes.append(change)
@@ -90,15 +114,12 @@ class Index(commands.Cog):
 
         if config["LOOPS"]["INDEX"]["CRYPTO"]["ENABLED"]:
             self.crypto_channel = None
-            self.crypto_indices = [sym.split(":")[1] for sym in crypto_indices]
+            self.crypto_indices = crypto_indices
             self.crypto.start()
 
         if config["LOOPS"]["INDEX"]["STOCKS"]["ENABLED"]:
             self.stocks_channel = None
-            self.stock_indices = [sym.split(":")[1] for sym in stock_indices] + [
-                sym.split(":")[1] for sym in forex_indices
-            ]
-            self.forex_indices = [sym.split(":")[1] for sym in forex_indices]
+            self.stock_indices = stock_indices + forex_indices
             self.stocks.start()
 
     @loop(hours=1)
@@ -143,9 +164,9 @@ class Index(commands.Cog):
         if afterHours():
             return
 
-        indices = self.stock_indices + self.forex_indices
-
-        stock_e = await create_embed("Stock & Forex Indices", indices, "stock")
+        stock_e = await create_embed(
+            "Stock & Forex Indices", self.stock_indices, "stock"
+        )
 
         await self.stocks_channel.purge(limit=1)
         await self.stocks_channel.send(embed=stock_e)
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from datetime import datetime, timedelta, timezone
 
@@ -70,11 +71,11 @@ class Liquidations(commands.Cog):
 async def liquidations_chart(file_name: str = "liquidations.png"):
     coin = "BTCUSDT"
     market = "um"
-    new_data = get_new_data(coin, market=market)
+    new_data = await get_new_data(coin, market=market)
     if new_data:
         logger.info(f"Downloaded {len(new_data)} new files.")
-        # Recreate the summaryf
-        summarize_liquidations(coin=coin, market=market)
+        # Recreate the summary, in a thread as it reads all files
+        await asyncio.to_thread(summarize_liquidations, coin=coin, market=market)
     # Load the summary
     df = pd.read_csv(
         f"data/summary/{coin}/{market}/liquidation_summary.csv",
@@ -51,7 +51,8 @@ class Exchange_Listings(commands.Cog):
             key2 = "id"
 
         # Check if there have been new listings
-        response = await get_json_data(url)
+        # Cached shortly, so setting the old symbols and the first check share one request
+        response = await get_json_data(url, cache_ttl=5 * 60)
 
         # Get the symbols
         if exchange == "coinbase":
@@ -1,16 +1,16 @@
 import datetime
-from collections import Counter, defaultdict
+from collections import defaultdict
 
 import discord
 from discord.ext import commands
 from discord.ext.tasks import loop
 
-import util.vars
 from api.http_client import get_json_data
 from constants.config import config
 from constants.logger import logger
 from util.disc import get_channel, get_guild, loop_error_catcher
 from util.formatting import format_change
+from util.mentions import mentions
 
 text_to_emoji = defaultdict(lambda: "🦆", {"bear": "🐻", "bull": "🐂", "neutral": "🦆"})
 
@@ -46,7 +46,7 @@ class Overview(commands.Cog):
     @loop(minutes=5)
     @loop_error_catcher
     async def global_overview(self):
-        if util.vars.tweets_db.empty:
+        if mentions.is_empty():
             return
 
         categories = []
@@ -56,15 +56,13 @@ class Overview(commands.Cog):
             categories.append("crypto")
 
         for category in categories:
-            db = util.vars.tweets_db.loc[util.vars.tweets_db["category"] == category]
+            # Get the top 50 mentions
+            top50 = mentions.top(category, 50)
 
-            if db.empty:
+            if not top50:
                 return
 
-            # Get the top 50 mentions
-            top50 = db["ticker"].value_counts()[:50]
-
-            for ticker, _ in top50.items():
+            for ticker, _ in top50:
                 # Get the global tweets about the ticker using the API
                 if category == "stocks":
                     global_mentions = None  # await count_tweets(ticker)
@@ -98,43 +96,36 @@ class Overview(commands.Cog):
         await self.make_overview("stocks")
 
     async def make_overview(self, category: str):
-        # Post the overview for stocks and crypto
-        db = util.vars.tweets_db.loc[util.vars.tweets_db["category"] == category]
+        # Get the top 50 mentions of the last 24 hours
+        top50 = mentions.top(category, 50)
 
-        if db.empty:
+        if not top50:
             return
 
-        # Get the top 50 mentions
-        top50 = db["ticker"].value_counts()[:50]
-
         # Make the list for embeds
         count_list = []
         ticker_list = []
         sentiment_list = []
 
         # Add overview of sentiment for each ticker
-        for ticker, count in top50.items():
-            # Get the sentiment for the ticker
-            sentiment = db.loc[db["ticker"] == ticker]["sentiment"].tolist()
+        for ticker, count in top50:
+            # Get the number of mentions per sentiment for the ticker
+            sentiment = mentions.sentiment(category, ticker)
 
-            change = db.loc[db["ticker"] == ticker]["change"].tolist()[0]
-            change = change.replace("%", "").replace("+", "")
+            change = mentions.change(category, ticker)
 
-            try:
-                change = format_change(float(change))
-            except ValueError:
+            if change is not None:
+                change = format_change(change)
+            else:
                 change = ""  # Do not specify it
 
             # Convert sentiment into a single str, i.e. "6🐂 2🦆 2🐻"
-            sentiment = [text_to_emoji[sent] for sent in sentiment]
-            sentiment = dict(Counter(sentiment))
-
             formatted_sentiment = ""
 
             # Use this method to sort the dict
-            for emoji in ["🐂", "🦆", "🐻"]:
-                if emoji in sentiment.keys():
-                    formatted_sentiment += f"{sentiment[emoji]}{emoji} "
+            for sent in ["bull", "neutral", "bear"]:
+                if sent in sentiment.keys():
+                    formatted_sentiment += f"{sentiment[sent]}{text_to_emoji[sent]} "
 
             if category == "stocks":
                 if ticker in self.global_stocks.keys():
@@ -10,13 +10,70 @@ import discord
 from discord.ext import commands
 from discord.ext.tasks import loop
 
-from api.timeline import get_tweet
+from api.timeline import timeline_poller
 from api.twitter import parse_tweet
 from constants.config import config
 from constants.logger import logger
-from models.chart import classify_img
-from util.disc import get_channel, get_tagged_users, get_webhook, loop_error_catcher
-from util.tweet_embed import make_tweet_embed
+from models.chart import chart_classifier
+from models.sentiment import color_table, get_tweet_sentiment
+from util.db import update_tweet_db, update_tweet_ids
+from util.disc import (
+    channel_registry,
+    get_channel,
+    get_tagged_users,
+    get_webhook,
+    loop_error_catcher,
+)
+from util.pipeline import Pipeline, Stage
+from util.tweet_embed import (
+    SymbolInfo,
+    add_financials,
+    enrich_symbols,
+    get_symbols,
+    make_embed,
+    resolve_symbols,
+)
+from util.tweet_ids import tweet_ids
+
+
+class TweetJob:
+    """
+    A tweet on its way through the timeline pipeline, every stage adds to it.
+    """
+
+    def __init__(self, formatted_tweet: tuple) -> None:
+        (
+            self.text,
+            self.user_name,
+            self.user_screen_name,
+            self.user_img,
+            self.tweet_url,
+            self.media,
+            tickers,
+            hashtags,
+            self.e_title,
+            self.media_types,
+            self.tweet_id,
+        ) = formatted_tweet
+        self.symbols, self.tickers = get_symbols(tickers, hashtags)
+
+        self.is_news = (
+            self.user_screen_name in config["LOOPS"]["TIMELINE"]["NEWS"]["FOLLOWING"]
+            or self.user_screen_name
+            in config["LOOPS"]["TIMELINE"]["NEWS"]["CRYPTO"]["FOLLOWING"]
+        )
+
+        self.infos: List[SymbolInfo] = []
+        self.sentiment: Optional[str] = None
+        self.is_chart = False
+
+        self.embed: Optional[discord.Embed] = None
+        self.category: Optional[str] = None
+        self.base_symbols: List[str] = []
+        self.categories: List[str] = []
+        self.changes: List[str] = []
+        self.channel: Optional[discord.abc.GuildChannel] = None
+        self.user_channel: Optional[discord.abc.GuildChannel] = None
 
 
 class Timeline(commands.Cog):
@@ -36,10 +93,40 @@ class Timeline(commands.Cog):
         self.bot = bot
         self.channels_set = False
 
-        # Get all text channels
-        self.all_txt_channels.start()
+        pipeline_config = config["LOOPS"]["TIMELINE"].get("PIPELINE", {})
+        queue_size = pipeline_config.get("QUEUE_SIZE", 20)
+        workers = pipeline_config.get("WORKERS", {})
+
+        # Tweets are parsed one at a time, in order, because parse_tweet() keeps track of the latest tweet
+        self.pipeline = Pipeline(
+            "timeline",
+            [
+                Stage("parse", self.parse, 1, queue_size),
+                Stage("symbols", self.resolve, workers.get("SYMBOLS", 4), queue_size),
+                Stage("enrich", self.enrich, workers.get("ENRICH", 4), queue_size),
+                Stage("inference", self.infer, workers.get("INFERENCE", 2), queue_size),
+                Stage("render", self.render, workers.get("RENDER", 1), queue_size),
+                Stage("post", self.post, workers.get("POST", 2), queue_size),
+            ],
+        )
+        self.channel_locks: dict[discord.abc.GuildChannel, asyncio.Lock] = {}
+
+        # The raw tweets that are in the pipeline, by tweet id, until they are posted
+        self.unfinished: dict[int, dict] = {}
+        # The tweets that were not posted, with the number of attempts, put in the pipeline again
+        self.retries: dict[int, tuple[dict, int]] = {}
+        self.max_attempts = pipeline_config.get("MAX_ATTEMPTS", 3)
+
         self.get_latest_tweet.start()
 
+    def cog_unload(self) -> None:
+        """Stops the loop and the workers of the pipeline when the cog is unloaded."""
+        self.get_latest_tweet.cancel()
+        asyncio.create_task(self.pipeline.close())
+        # The tweets in the pipeline were not posted
+        tweet_ids.release_claims()
+        self.unfinished.clear()
+
     async def set_channels(
         self,
         name: str,
@@ -88,57 +175,42 @@ class Timeline(commands.Cog):
             self.bot, config["LOOPS"]["TIMELINE"]["UNKNOWN_CHARTS"]
         )
 
-    @loop(hours=1)
-    @loop_error_catcher
-    async def all_txt_channels(self) -> None:
-        """Gets all the text channels as Discord object and the names of the channels."""
-
-        if not self.channels_set:
-            charts_channel = config["LOOPS"]["TIMELINE"]["CHARTS_CHANNEL"]
-            text_channel = config["LOOPS"]["TIMELINE"]["TEXT_CHANNEL"]
-
-            # Set the channels
-            await self.set_channels("STOCKS", charts_channel, text_channel)
-            await self.set_channels("CRYPTO", charts_channel, text_channel)
-            await self.set_channels("FOREX", charts_channel, text_channel)
-
-            # These channels are not crypto or stocks
-            await self.set_channels("IMAGES")
-            await self.set_channels("OTHER")
-            await self.set_channels("NEWS")
-
-        self.following_ids = []
-
-        text_channel_list = []
-        text_channel_names = []
+    async def set_all_channels(self) -> None:
+        """Sets the channels that the tweets are posted in."""
+        charts_channel = config["LOOPS"]["TIMELINE"]["CHARTS_CHANNEL"]
+        text_channel = config["LOOPS"]["TIMELINE"]["TEXT_CHANNEL"]
 
-        # The symbol that separates the emoji and channel name
-        separator = config["CHANNEL_SEPARATOR"]
+        # Set the channels
+        await self.set_channels("STOCKS", charts_channel, text_channel)
+        await self.set_channels("CRYPTO", charts_channel, text_channel)
+        await self.set_channels("FOREX", charts_channel, text_channel)
 
-        # Loop over all the text channels
-        for server in self.bot.guilds:
-            for channel in server.channels:
-                if str(channel.type) == "text":
-                    text_channel_list.append(channel)
-                    if separator in channel.name:
-                        text_channel_names.append(channel.name.split(separator)[1])
-                    else:
-                        text_channel_names.append(channel.name)
+        # These channels are not crypto or stocks
+        await self.set_channels("IMAGES")
+        await self.set_channels("OTHER")
+        await self.set_channels("NEWS")
 
-        # Set the class variables
-        self.text_channels = text_channel_list
-        self.text_channel_names = text_channel_names
+        self.channels_set = True
 
     @loop(minutes=5)
     @loop_error_catcher
     async def get_latest_tweet(self) -> None:
         """Fetches the latest tweets."""
+        if not self.channels_set:
+            await self.set_all_channels()
+
+        if not self.pipeline.started:
+            self.pipeline.start()
+
         logger.debug(f"Getting tweets at {datetime.datetime.now()}...")
-        tweets = await get_tweet()
+        tweets = await timeline_poller.poll()
         logger.debug(f"Got {len(tweets)} tweets.")
 
-        # Process tweets concurrently
-        tasks = []
+        # The cursor of the poller is past the tweets that were not posted, so they are put in first
+        retries = self.retries
+        self.retries = {}
+        for tweet, _ in retries.values():
+            await self.pipeline.put(tweet)
 
         # Loop from oldest to newest tweet
         for tweet_data in reversed(tweets):
@@ -152,141 +224,179 @@ class Timeline(commands.Cog):
             ):
                 continue
 
-            # Collect tasks for concurrent processing
-            tasks.append(self.on_data(tweet, update_tweet_id=True))
+            # Waits if the pipeline is full
+            await self.pipeline.put(tweet)
+
+        await self.pipeline.join()
+
+        # Tweets that were not posted, e.g. because of an error, are tried again next time
+        tweet_ids.release_claims()
+        self.retry_unfinished(retries)
 
-        # Run tasks concurrently for faster processing
-        if tasks:
-            await asyncio.gather(*tasks)
+        delay = timeline_poller.next_delay()
+        self.get_latest_tweet.change_interval(seconds=delay)
+        logger.debug(f"Next timeline request in {delay:.0f} seconds")
+        logger.debug(f"Timeline pipeline metrics: {self.pipeline.metrics()}")
 
-    async def on_data(self, tweet: dict, update_tweet_id: bool = False) -> None:
-        """This method is called whenever data is received from the stream.
+    def retry_unfinished(self, retries: dict[int, tuple[dict, int]]) -> None:
+        """Keeps the tweets that were not posted for the next poll, until max_attempts is reached.
 
         Parameters
         ----------
-        tweet : dict
-            The raw tweet data.
-        update_tweet_id : bool, optional
-            Whether or not to update the tweet ID, by default False
+        retries : dict[int, tuple[dict, int]]
+            The tweets that were tried again in this poll, with their number of attempts.
         """
-        formatted_tweet = parse_tweet(tweet, update_tweet_id=update_tweet_id)
-
-        if formatted_tweet is not None:
-            (
-                text,
-                user_name,
-                user_screen_name,
-                user_img,
-                tweet_url,
-                media,
-                tickers,
-                hashtags,
-                e_title,
-                media_types,
-            ) = formatted_tweet
-
-            e, category, base_symbols = await make_tweet_embed(
-                text,
-                user_name,
-                user_img,
-                tweet_url,
-                media,
-                tickers,
-                hashtags,
-                e_title,
-                media_types,
-                self.bot,
-            )
-
-            # Upload the tweet to the Discord..
-            logger.debug(f"Uploading {user_screen_name}'s tweet to {category}")
-            await self.upload_tweet(e, category, media, user_screen_name, base_symbols)
+        for tweet_id, tweet in self.unfinished.items():
+            attempts = retries.get(tweet_id, (tweet, 0))[1] + 1
+            if attempts < self.max_attempts:
+                self.retries[tweet_id] = (tweet, attempts)
+            else:
+                logger.warning(
+                    f"Could not post tweet {tweet_id} in {attempts} attempts"
+                )
+        self.unfinished.clear()
 
-    async def upload_tweet(
-        self,
-        e: discord.Embed,
-        category: Optional[str],
-        media: List[str],
-        user_screen_name: str,
-        tickers: List[str],
-    ) -> None:
-        """Uploads tweet in the dedicated Discord channel.
+    async def parse(self, tweet: dict) -> Optional[TweetJob]:
+        """Parses the raw tweet data, returns None if the tweet was already posted or invalid.
 
         Parameters
         ----------
-        e : discord.Embed
-            The Tweet as a Discord embed object.
-        category : str, optional
-            The category of the tweet, used to decide which Discord channel it should be uploaded to.
-        media : list
-            The images contained in this tweet.
-        user_screen_name : str
-            The user that posted this tweet.
-        tickers : list
-            The list of tickers contained in this tweet.
+        tweet : dict
+            The raw tweet data.
         """
-        user_channel = None
+        formatted_tweet = parse_tweet(tweet, update_tweet_id=True)
+
+        if formatted_tweet is None:
+            return None
+
+        job = TweetJob(formatted_tweet)
+        self.unfinished[job.tweet_id] = tweet
+        return job
+
+    async def resolve(self, job: TweetJob) -> TweetJob:
+        """Finds the assets of the symbols in the tweet."""
+        if job.symbols:
+            job.infos = await resolve_symbols(job.symbols, job.user_name)
+        return job
+
+    async def enrich(self, job: TweetJob) -> TweetJob:
+        """Adds the price, change and TA of the symbols that were not just classified."""
+        if job.infos:
+            job.infos = await enrich_symbols(job.infos)
+        return job
+
+    async def infer(self, job: TweetJob) -> TweetJob:
+        """Classifies the sentiment of the tweet and whether its images are charts."""
+
+        async def classify_sentiment() -> None:
+            # Only tweets about known assets get a sentiment
+            if any(info.majority is None for info in job.infos):
+                # Batched with the other tweets that are being classified
+                job.sentiment = await get_tweet_sentiment(job.text)
+
+        async def classify_charts() -> None:
+            # News is always posted in the news channels
+            if job.is_news or not job.media:
+                return
+            # All images are classified at once, in the same batch
+            job.is_chart = "chart" in await chart_classifier.classify_many(job.media)
+
+        await asyncio.gather(classify_sentiment(), classify_charts())
+        return job
+
+    async def render(self, job: TweetJob) -> TweetJob:
+        """Creates the embed of the tweet and decides the channel to post it in."""
+        job.embed = make_embed(
+            symbols=job.symbols,
+            url=job.tweet_url,
+            text=job.text,
+            profile_pic=job.user_img,
+            images=job.media,
+            e_title=job.e_title,
+            media_types=job.media_types,
+        )
 
-        # Default channel
-        channel = self.other_channel
+        # Max 25 fields
+        if job.symbols:
+            logger.debug(f"Adding financials for symbols: {job.symbols}")
+            job.embed, job.category, job.base_symbols, job.categories, job.changes = (
+                add_financials(job.embed, job.infos, job.tickers)
+            )
 
-        # Check if there is a user specific channel
-        if user_screen_name.lower() in self.text_channel_names:
-            user_channel = self.text_channels[
-                self.text_channel_names.index(user_screen_name.lower())
-            ]
+            if job.base_symbols:
+                job.embed.colour = color_table[job.sentiment]
 
-        # News posters (Do not post news in other channels)
-        if user_screen_name in config["LOOPS"]["TIMELINE"]["NEWS"]["FOLLOWING"]:
-            channel = self.news_channel
-        elif (
-            user_screen_name
-            in config["LOOPS"]["TIMELINE"]["NEWS"]["CRYPTO"]["FOLLOWING"]
-        ):
-            channel = self.crypto_news_channel
-        else:
-            channel = self.get_channel_based_on_category(category, media)
+        job.channel = self.get_channel(job)
+
+        # Check if there is a user specific channel
+        job.user_channel = channel_registry.get_user_channel(
+            job.user_screen_name.lower()
+        )
+        return job
+
+    async def post(self, job: TweetJob) -> None:
+        """Uploads the tweet in the dedicated Discord channel."""
+        # Tweets reach this stage in order, the lock keeps them in order per channel
+        lock = self.channel_locks.setdefault(job.channel, asyncio.Lock())
+        async with lock:
+            logger.debug(f"Uploading {job.user_screen_name}'s tweet to {job.category}")
+            posted = await self.post_tweet(
+                job.channel,
+                job.embed,
+                job.media,
+                job.base_symbols,
+                job.user_channel,
+                job.category,
+            )
 
-        await self.post_tweet(channel, e, media, tickers, user_channel, category)
+        # Tweets that could not be posted are not saved, so they are tried again
+        if not posted:
+            return
+        self.unfinished.pop(job.tweet_id, None)
+
+        # If there are base symbols, add them to the database
+        if job.base_symbols:
+            update_tweet_db(
+                job.base_symbols,
+                job.user_name,
+                job.sentiment,
+                job.categories,
+                job.changes,
+            )
+        update_tweet_ids(job.tweet_id)
 
-    def get_channel_based_on_category(
-        self, category: Optional[str], media: List[str]
-    ) -> discord.abc.GuildChannel:
+    def get_channel(self, job: TweetJob) -> discord.abc.GuildChannel:
         """Get the Discord channel based on the category of the tweet.
 
         Parameters
         ----------
-        category : str, optional
-            The category of the tweet.
-        media : list
-            The images contained in this tweet.
+        job : TweetJob
+            The tweet with its category, media and chart classification.
 
         Returns
         -------
         discord.abc.GuildChannel
             The Discord channel.
         """
-        if category is None:
-            channel = self.other_channel
+        # News posters (Do not post news in other channels)
+        if job.user_screen_name in config["LOOPS"]["TIMELINE"]["NEWS"]["FOLLOWING"]:
+            return self.news_channel
+        if (
+            job.user_screen_name
+            in config["LOOPS"]["TIMELINE"]["NEWS"]["CRYPTO"]["FOLLOWING"]
+        ):
+            return self.crypto_news_channel
 
+        if job.category is None:
             # Default to images channel if there are images
-            if media:
-                channel = self.images_channel
-
-                # Check if the tweet is a chart
-                for m in media:
-                    if classify_img(m) == "chart":
-                        channel = self.unknown_charts
-                        break
-        else:
-            channel_type = "text"
-            for m in media:
-                if classify_img(m) == "chart":
-                    channel_type = "charts"
-                    break
-            channel = self.__dict__[f"{category}_{channel_type}_channel"]
-
-        return channel
+            if job.is_chart:
+                return self.unknown_charts
+            if job.media:
+                return self.images_channel
+            return self.other_channel
+
+        channel_type = "charts" if job.is_chart else "text"
+        return self.__dict__[f"{job.category}_{channel_type}_channel"]
 
     async def post_tweet(
         self,
@@ -296,7 +406,7 @@ class Timeline(commands.Cog):
         tickers: List[str],
         user_channel: Optional[discord.abc.GuildChannel],
         category: Optional[str],
-    ) -> None:
+    ) -> bool:
         """Formats the tweet and passes it to upload_tweet().
 
         Parameters
@@ -313,8 +423,14 @@ class Timeline(commands.Cog):
             The user-specific Discord channel.
         category : str, optional
             The category of the tweet.
+
+        Returns
+        -------
+        bool
+            Whether the tweet was posted in the channel.
         """
         msgs = []
+        posted = False
 
         try:
             # Create a list of image embeds, max 10 images per post
@@ -326,6 +442,7 @@ class Timeline(commands.Cog):
             if len(image_e) > 1:
                 msg = await self.make_and_send_webhook(channel, tickers, image_e)
                 msgs.append(msg)
+                posted = True
 
                 if user_channel:
                     msg = await self.make_and_send_webhook(
@@ -338,6 +455,7 @@ class Timeline(commands.Cog):
                 try:
                     msg = await channel.send(content=get_tagged_users(tickers), embed=e)
                     msgs.append(msg)
+                    posted = True
                 except discord.HTTPException:
                     logger.error(
                         f"Could not post tweet on timeline, with the following info. Embed: {e.to_dict()}. Media: {media}, Tickers: {tickers}"
@@ -372,6 +490,8 @@ class Timeline(commands.Cog):
             logger.error(f"Error posting tweet on timeline, error: {error}")
             logger.error(traceback.format_exc())
 
+        return posted
+
     async def make_and_send_webhook(
         self,
         channel: discord.abc.GuildChannel,
@@ -9,7 +9,7 @@ from discord.ext import commands
 from discord.ext.tasks import loop
 from scipy.interpolate import make_interp_spline
 
-from api.tradingview import tv
+from api.tradingview import bulk_quotes
 from constants.config import config
 from constants.tradingview import EU_bonds, US_bonds
 from util.disc import get_channel, loop_error_catcher
@@ -118,26 +118,20 @@ class Yield(commands.Cog):
 
     async def get_yield(self, bonds: list) -> list:
         """
-        For each bond in the given list, it gets the yield from TradingView.
+        Gets the yield of all bonds in the given list from TradingView, with one request.
 
         Parameters
         ----------
         bonds : list
-            The names of the bonds to get the yield from.
+            The names of the bonds to get the yield from, including the exchange.
 
         Returns
         -------
         list
-            The percentages of the yield for each bond.
+            The percentages of the yield for each bond, 0 if it is not available.
         """
-
-        yield_percentage = []
-        for bond in bonds:
-            no_exch = bond.split(":")[1]
-            tv_data = await tv.get_tv_data(no_exch, "stock")
-            yield_percentage.append(tv_data[0])
-
-        return yield_percentage
+        quotes = await bulk_quotes(bonds, ["close"])
+        return quotes["close"].fillna(0).tolist()
 
     def make_plot(
         self, years: list, yield_percentage: list, color: str, label: str
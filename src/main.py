@@ -8,17 +8,37 @@ from dotenv import load_dotenv
 # Load the .env file before importing the rest of the bot
 load_dotenv()
 
+from api.http_client import session_manager, tls_pool
+from api.tradingview_quotes import quote_client
 from constants.config import config
 from constants.logger import logger
-from util.disc import get_guild, set_emoji
+from util.db import db_manager
+from util.disc import channel_registry, get_guild, set_emoji
+from util.pipeline import close_pipelines
 
-bot = commands.Bot(intents=discord.Intents.all())
+
+class FintwitBot(commands.Bot):
+    async def close(self) -> None:
+        """Saves the queued database writes before shutting down."""
+        # Stop the pipelines first, so they do not queue new writes
+        await close_pipelines()
+        await db_manager.close()
+        await quote_client.close()
+        await session_manager.close()
+        tls_pool.close()
+        await super().close()
+
+
+bot = FintwitBot(intents=discord.Intents.all())
 
 
 @bot.event
 async def on_ready() -> None:
     """This gets logger.infoed on boot up"""
 
+    # Store the channels before the loops start looking them up
+    channel_registry.populate(bot)
+
     # Load the loops and listeners
     load_folder("loops")
     load_folder("listeners")
@@ -29,6 +49,23 @@ async def on_ready() -> None:
     await set_emoji(guild)
 
 
+@bot.listen()
+async def on_guild_channel_create(channel: discord.abc.GuildChannel) -> None:
+    channel_registry.add(channel)
+
+
+@bot.listen()
+async def on_guild_channel_delete(channel: discord.abc.GuildChannel) -> None:
+    channel_registry.remove(channel)
+
+
+@bot.listen()
+async def on_guild_channel_update(
+    before: discord.abc.GuildChannel, after: discord.abc.GuildChannel
+) -> None:
+    channel_registry.update(before, after)
+
+
 def is_cog_enabled(config_section, file):
     """
     Checks if a cog is enabled in the configuration.
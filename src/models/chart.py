@@ -1,11 +1,21 @@
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from typing import Optional
 
-import requests
+import aiohttp
 import timm
 import torch
 from PIL import Image
 from timm.data import create_transform, resolve_data_config
 
+from api.http_client import get_session
+from constants.logger import logger
+from util.batcher import MicroBatcher
+
 
 class CustomImagePipeline:
     def __init__(self, model, transform, labels):
@@ -13,43 +23,210 @@ class CustomImagePipeline:
         self.transform = transform
         self.labels = labels
 
-    def __call__(self, image):
-        # Preprocess
-        if isinstance(image, str):
-            if image.startswith("http://") or image.startswith("https://"):
-                response = requests.get(image)
-                image = Image.open(BytesIO(response.content)).convert("RGB")
-            else:
-                image = Image.open(image).convert("RGB")
+    def preprocess(self, image) -> torch.Tensor:
+        """
+        Decodes and transforms the image, returns the input tensor of the model.
+        """
+        if isinstance(image, bytes):
+            image = Image.open(BytesIO(image)).convert("RGB")
+        elif isinstance(image, str):
+            image = Image.open(image).convert("RGB")
         elif isinstance(image, Image.Image):
             image = image.convert("RGB")
         else:
             raise ValueError("Unsupported image format")
 
-        inputs = self.transform(image).unsqueeze(0)
+        return self.transform(image)
 
-        # Forward pass
-        with torch.no_grad():
-            outputs = self.model(inputs)
+    def predict(self, inputs: list[torch.Tensor]) -> list[dict]:
+        """
+        Runs one forward pass for a batch of preprocessed images.
+        """
+        with torch.inference_mode():
+            outputs = self.model(torch.stack(inputs))
 
         # Postprocess
-        probabilities = torch.nn.functional.softmax(outputs[0], dim=0)
-        return {label: prob.item() for label, prob in zip(self.labels, probabilities)}
+        probabilities = torch.nn.functional.softmax(outputs, dim=1)
+        return [
+            {label: prob.item() for label, prob in zip(self.labels, probs)}
+            for probs in probabilities
+        ]
+
+    def __call__(self, image):
+        return self.predict([self.preprocess(image)])[0]
+
+
+# Loaded on first use, so importing this module does not download the model
+image_pipeline: Optional[CustomImagePipeline] = None
+pipeline_lock = threading.Lock()
+
+
+def load_pipeline() -> CustomImagePipeline:
+    """
+    Returns the pipeline of the pretrained chart recognizer, loads it the first time.
+    """
+    global image_pipeline
+
+    with pipeline_lock:
+        if image_pipeline is None:
+            model = timm.create_model(
+                "hf_hub:StephanAkkerman/chart-recognizer", pretrained=True
+            )
+            model.eval()
+
+            # Create transform and get labels
+            transform = create_transform(
+                **resolve_data_config(model.pretrained_cfg, model=model)
+            )
+            labels = model.pretrained_cfg["label_names"]
+
+            image_pipeline = CustomImagePipeline(
+                model=model, transform=transform, labels=labels
+            )
+    return image_pipeline
+
+
+class ChartClassifier:
+    """
+    Classifies images as chart or not, for many images at once.
+    Images are downloaded concurrently on the shared session, decoded and transformed
+    in a pool of threads, and the forward passes are batched on a single model thread.
+    A batch starts when max_batch_size images are waiting or max_wait_ms after the first image.
+    The labels are cached by URL and by a hash of the image, so the same chart in
+    a retweet or quote tweet is not classified again.
+    The pretrained chart recognizer is used, unless another pipeline is given.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 25,
+        decode_workers: int = 4,
+        cache_size: int = 10_000,
+        pipeline: Optional[CustomImagePipeline] = None,
+    ) -> None:
+        self.cache_size = cache_size
+        self.pipeline = pipeline
+
+        self.decode_executor = ThreadPoolExecutor(
+            max_workers=decode_workers, thread_name_prefix="chart-decode"
+        )
+        self.batcher = MicroBatcher(
+            "chart-model", self.predict, max_batch_size, max_wait_ms
+        )
+
+        self.url_cache: OrderedDict[str, str] = OrderedDict()
+        self.hash_cache: OrderedDict[str, str] = OrderedDict()
+
+        # Metrics
+        self.url_hits = 0
+        self.hash_hits = 0
+
+    def get_pipeline(self) -> CustomImagePipeline:
+        if self.pipeline is None:
+            self.pipeline = load_pipeline()
+        return self.pipeline
+
+    def preprocess(self, image) -> torch.Tensor:
+        return self.get_pipeline().preprocess(image)
+
+    def predict(self, inputs: list[torch.Tensor]) -> list[dict]:
+        return self.get_pipeline().predict(inputs)
+
+    def remember(self, cache: OrderedDict, key: str, label: str) -> None:
+        cache[key] = label
+        cache.move_to_end(key)
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    async def download(self, url: str) -> Optional[bytes]:
+        try:
+            session = await get_session()
+            async with session.get(url) as response:
+                response.raise_for_status()
+                return await response.read()
+        except aiohttp.ClientError as e:
+            logger.error(f"Could not download image {url}: {e}")
+            return None
+
+    async def classify(self, image) -> str:
+        """
+        Returns the label of the image, e.g. "chart".
+
+        Parameters
+        ----------
+        image : str | bytes | PIL.Image.Image
+            The URL or path of the image, the image file or the image itself.
+
+        Returns
+        -------
+        str
+            The label with the highest probability, or "" if the image could not be downloaded.
+        """
+        url = None
+        if isinstance(image, str) and image.startswith(("http://", "https://")):
+            url = image
+            if url in self.url_cache:
+                self.url_hits += 1
+                self.url_cache.move_to_end(url)
+                return self.url_cache[url]
+
+            image = await self.download(url)
+            if image is None:
+                return ""
+
+        digest = None
+        if isinstance(image, bytes):
+            digest = hashlib.sha1(image).hexdigest()
+            if digest in self.hash_cache:
+                self.hash_hits += 1
+                label = self.hash_cache[digest]
+                if url is not None:
+                    self.remember(self.url_cache, url, label)
+                return label
+
+        # Decoding and transforming the image is blocking, so it runs in a thread
+        loop = asyncio.get_running_loop()
+        inputs = await loop.run_in_executor(
+            self.decode_executor, self.preprocess, image
+        )
+        probabilities = await self.batcher.submit(inputs)
+        label = max(probabilities, key=probabilities.get)
+
+        if digest is not None:
+            self.remember(self.hash_cache, digest, label)
+        if url is not None:
+            self.remember(self.url_cache, url, label)
+        return label
+
+    async def classify_many(self, images: list) -> list[str]:
+        """
+        Returns the labels of all images, the images are classified concurrently.
+        An image that could not be classified, e.g. because it could not be decoded,
+        gets the label "" without failing the other images.
+        """
+        labels = await asyncio.gather(
+            *[self.classify(image) for image in images], return_exceptions=True
+        )
 
+        for image, label in zip(images, labels):
+            if isinstance(label, Exception):
+                logger.error(f"Could not classify image {str(image)[:100]}: {label}")
+        return ["" if isinstance(label, Exception) else label for label in labels]
 
-# Load the pretrained model
-model = timm.create_model("hf_hub:StephanAkkerman/chart-recognizer", pretrained=True)
-model.eval()
+    def metrics(self) -> dict:
+        return {
+            "url_hits": self.url_hits,
+            "hash_hits": self.hash_hits,
+            **self.batcher.metrics(),
+        }
 
-# Create transform and get labels
-transform = create_transform(**resolve_data_config(model.pretrained_cfg, model=model))
-labels = model.pretrained_cfg["label_names"]
 
-# Create the custom pipeline
-image_pipeline = CustomImagePipeline(model=model, transform=transform, labels=labels)
+chart_classifier = ChartClassifier()
 
 
-def classify_img(image) -> str:
-    probabilities = image_pipeline(image)
-    # Return the max probability label
-    return max(probabilities, key=probabilities.get)
+async def classify_img(image) -> str:
+    """
+    Returns the label of the image, e.g. "chart". See ChartClassifier.classify().
+    """
+    return await chart_classifier.classify(image)
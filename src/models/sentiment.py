@@ -2,28 +2,49 @@
 # > Standard libaries
 from __future__ import annotations
 
+import asyncio
 import re
+import threading
+from typing import Callable, NamedTuple, Optional
 
 # > Third party libraries
 import discord
-from transformers import AutoTokenizer, BertForSequenceClassification, pipeline
-
-# Load model
-model = BertForSequenceClassification.from_pretrained(
-    "StephanAkkerman/FinTwitBERT-sentiment",
-    num_labels=3,
-    id2label={0: "NEUTRAL", 1: "BULLISH", 2: "BEARISH"},
-    label2id={"NEUTRAL": 0, "BULLISH": 1, "BEARISH": 2},
-    cache_dir="models/",
-)
-model.config.problem_type = "single_label_classification"
-tokenizer = AutoTokenizer.from_pretrained(
-    "StephanAkkerman/FinTwitBERT-sentiment",
-    cache_dir="models/",
-    add_special_tokens=True,
-)
-model.eval()
-pipe = pipeline("text-classification", model=model, tokenizer=tokenizer)
+import torch
+from transformers import AutoTokenizer, BertForSequenceClassification
+
+from util.batcher import MicroBatcher
+
+MODEL_NAME = "StephanAkkerman/FinTwitBERT-sentiment"
+
+# Loaded on first use, so importing this module does not download the model
+model: Optional[BertForSequenceClassification] = None
+tokenizer = None
+model_lock = threading.Lock()
+
+
+def load_model() -> None:
+    global model, tokenizer
+
+    with model_lock:
+        if model is not None:
+            return
+
+        bert = BertForSequenceClassification.from_pretrained(
+            MODEL_NAME,
+            num_labels=3,
+            id2label={0: "NEUTRAL", 1: "BULLISH", 2: "BEARISH"},
+            label2id={"NEUTRAL": 0, "BULLISH": 1, "BEARISH": 2},
+            cache_dir="models/",
+        )
+        bert.config.problem_type = "single_label_classification"
+        bert.eval()
+        tokenizer = AutoTokenizer.from_pretrained(
+            MODEL_NAME,
+            cache_dir="models/",
+            add_special_tokens=True,
+        )
+        model = bert
+
 
 label_to_emoji = {
     "NEUTRAL": "🦆",
@@ -48,51 +69,97 @@ def preprocess_text(tweet: str) -> str:
     return tweet
 
 
-def classify_sentiment(text: str) -> str:
+class SentimentResult(NamedTuple):
+    label: str
+    probabilities: dict[str, float]
+
+    @property
+    def emoji(self) -> str:
+        return label_to_emoji[self.label]
+
+    @property
+    def score(self) -> float:
+        """
+        The sentiment between -1 (bearish) and 1 (bullish).
+        """
+        return self.probabilities["BULLISH"] - self.probabilities["BEARISH"]
+
+
+def predict(texts: list[str]) -> list[SentimentResult]:
     """
-    Uses the text of a tweet to classify the sentiment of the tweet.
+    Classifies the sentiment of a batch of preprocessed texts, this is blocking.
+    """
+    load_model()
+    inputs = tokenizer(
+        texts, padding=True, truncation=True, max_length=512, return_tensors="pt"
+    )
+    with torch.inference_mode():
+        probabilities = torch.softmax(model(**inputs).logits, dim=-1).tolist()
 
-    Parameters
-    ----------
-    text : str
-        The text of the tweet.
+    results = []
+    for probs in probabilities:
+        labelled = {model.config.id2label[i]: p for i, p in enumerate(probs)}
+        results.append(SentimentResult(max(labelled, key=labelled.get), labelled))
+    return results
 
-    Returns
-    -------
-    np.ndarray
-        The probability of the tweet being bullish, neutral, or bearish.
+
+class SentimentService:
     """
+    Classifies the sentiment of texts from concurrent callers in micro-batches,
+    on a dedicated worker thread. See MicroBatcher.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 25,
+        predict: Callable[[list[str]], list[SentimentResult]] = predict,
+    ) -> None:
+        self.batcher = MicroBatcher("sentiment", predict, max_batch_size, max_wait_ms)
+
+    async def classify(self, text: str) -> SentimentResult:
+        """
+        Classifies the sentiment of the text.
 
-    label = pipe(preprocess_text(text))[0].get("label")
-    emoji = label_to_emoji[label]
+        Parameters
+        ----------
+        text : str
+            The text to classify.
 
-    return emoji
+        Returns
+        -------
+        SentimentResult
+            The label (NEUTRAL, BULLISH or BEARISH) and the probability of every label.
+        """
+        return await self.batcher.submit(preprocess_text(text))
 
+    async def classify_many(self, texts: list[str]) -> list[SentimentResult]:
+        """
+        Classifies the sentiment of all texts, in as few batches as possible.
+        """
+        return list(await asyncio.gather(*[self.classify(text) for text in texts]))
 
-def add_sentiment(e: discord.Embed, text: str) -> tuple[discord.Embed, str]:
+    def metrics(self) -> dict:
+        return self.batcher.metrics()
+
+
+sentiment_service = SentimentService()
+
+
+async def get_tweet_sentiment(text: str) -> str:
     """
-    Adds sentiment to a discord embed, based on the given text.
+    Classifies the sentiment of a tweet, without the text of the quoted tweet.
 
     Parameters
     ----------
-    e : discord.Embed
-        The embed to add the sentiment to.
     text : str
-        The text to classify the sentiment of.
+        The text of the tweet, as formatted by parse_tweet().
 
     Returns
     -------
-    tuple[discord.Embed, str]
-        discord.Embed
-            The embed with the sentiment added.
-        str
-            The sentiment of the tweet.
+    str
+        The emoji of the sentiment.
     """
-
     # Remove quote tweet formatting
-    emoji = classify_sentiment(text.split("\n\n> [@")[0])
-
-    # Change color based on sentiment
-    e.colour = color_table[emoji]
-
-    return e, emoji
+    result = await sentiment_service.classify(text.split("\n\n> [@")[0])
+    return result.emoji
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+
+import pandas as pd
+
+
+class AssetIndex:
+    """
+    Maps each asset to the Discord ids of the users that own it.
+    A user can own the same asset on multiple exchanges, so the rows per user are counted
+    and the user is only removed from an asset once all of its rows are removed.
+    """
+
+    def __init__(self) -> None:
+        self.owners: defaultdict[str, Counter] = defaultdict(Counter)
+
+    def add(self, asset: str, user_id: int) -> None:
+        self.owners[asset][int(user_id)] += 1
+
+    def remove(self, asset: str, user_id: int) -> None:
+        owners = self.owners.get(asset)
+        if owners is None:
+            return
+
+        user_id = int(user_id)
+        owners[user_id] -= 1
+        if owners[user_id] <= 0:
+            del owners[user_id]
+        if not owners:
+            del self.owners[asset]
+
+    def add_rows(self, db: pd.DataFrame) -> None:
+        """
+        Adds the rows of an assets dataframe to the index.
+        """
+        if db.empty:
+            return
+        for asset, user_id in zip(db["asset"], db["id"]):
+            if pd.notna(asset) and pd.notna(user_id):
+                self.add(asset, user_id)
+
+    def remove_rows(self, db: pd.DataFrame) -> None:
+        """
+        Removes the rows of an assets dataframe from the index.
+        """
+        if db.empty:
+            return
+        for asset, user_id in zip(db["asset"], db["id"]):
+            if pd.notna(asset) and pd.notna(user_id):
+                self.remove(asset, user_id)
+
+    def rebuild(self, db: pd.DataFrame) -> None:
+        """
+        Replaces the index with the rows of the assets dataframe.
+        """
+        self.owners = defaultdict(Counter)
+        if db is not None:
+            self.add_rows(db)
+
+    def users(self, assets: list) -> set[int]:
+        """
+        Returns the ids of the users that own at least one of the assets.
+        """
+        users = set()
+        for asset in assets:
+            owners = self.owners.get(asset)
+            if owners:
+                users.update(owners)
+        return users
+
+
+asset_index = AssetIndex()
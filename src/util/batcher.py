@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from constants.logger import logger
+
+
+class MicroBatcher:
+    """
+    Runs a blocking function on batches of items that are submitted by concurrent callers.
+    A batch is started when max_batch_size items are waiting or max_wait_ms after the first item,
+    it runs on a dedicated worker thread so the event loop is not blocked.
+    Items that arrive while a batch is running are gathered for the next batch.
+    The function gets a list of items and returns a list with the result of every item.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[list], list],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 25,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        # The function, e.g. a model, is only used by this thread
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.pending: list[tuple[Any, asyncio.Future]] = []
+        self.batch_full = asyncio.Event()
+        self.batcher: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Adds the item to the next batch and returns its result.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((item, future))
+
+        if len(self.pending) >= self.max_batch_size:
+            self.batch_full.set()
+        if self.batcher is None or self.batcher.done():
+            self.batcher = asyncio.create_task(self.run_batches())
+
+        return await future
+
+    async def run_batches(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while self.pending:
+            # Wait a moment for other callers, unless the batch is already full
+            if len(self.pending) < self.max_batch_size:
+                self.batch_full.clear()
+                try:
+                    await asyncio.wait_for(self.batch_full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self.pending[: self.max_batch_size]
+            del self.pending[: len(batch)]
+            self.batches += 1
+            self.items += len(batch)
+
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.func, [item for item, _ in batch]
+                )
+            except Exception as e:
+                logger.error(f"Error in {self.name} batch of {len(batch)} items: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def metrics(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "waiting": len(self.pending),
+        }
@@ -1,8 +1,14 @@
 # > Standard library
+import asyncio
 import datetime
+import math
 import os
+import re
 import sqlite3
+import threading
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
 
 import numpy as np
 import pandas as pd
@@ -12,15 +18,91 @@ from discord.ext.tasks import loop
 import util.vars
 from api.coingecko import get_coins_list, rate_limit
 from api.nasdaq import tickers_nasdaq
-from api.tradingview import get_tv_ticker_data
+from api.tradingview import get_tv_ticker_data, tv
 from constants.logger import logger
 from constants.tradingview import all_forex_indices, crypto_indices, stock_indices
+from util.asset_index import asset_index
+from util.mentions import mentions
+from util.snapshot import load_snapshot, save_snapshot, snapshot_age
+from util.ticker_cache import ticker_cache
+from util.tweet_ids import tweet_ids
 
 # Convert emoji to text
 convert_emoji = defaultdict(
     lambda: "neutral", {"🐻": "bear", "🐂": "bull", "🦆": "neutral"}
 )
 
+# The column types of each table, timestamps are saved as "YYYY-MM-DD HH:MM:SS"
+tv_schema = {"s": "TEXT", "exchange": "TEXT", "stock": "TEXT"}
+ids_schema = {"id": "TEXT", "timestamp": "TIMESTAMP"}
+SCHEMAS = {
+    "tweets": {
+        "ticker": "TEXT",
+        "user": "TEXT",
+        "sentiment": "TEXT",
+        "category": "TEXT",
+        "change": "REAL",
+        "timestamp": "TIMESTAMP",
+    },
+    "assets": {
+        "asset": "TEXT",
+        "buying_price": "REAL",
+        "owned": "REAL",
+        "exchange": "TEXT",
+        "id": "INTEGER",
+        "user": "TEXT",
+        "worth": "REAL",
+        "price": "REAL",
+        "change": "REAL",
+    },
+    "portfolio": {
+        "id": "INTEGER",
+        "user": "TEXT",
+        "exchange": "TEXT",
+        "key": "TEXT",
+        "secret": "TEXT",
+        "passphrase": "TEXT",
+    },
+    "classified_tickers": {
+        "ticker": "TEXT",
+        "website": "TEXT",
+        "exchanges": "TEXT",
+        "base_symbol": "TEXT",
+        "timestamp": "TIMESTAMP",
+    },
+    "reddit_ids": ids_schema,
+    "ideas_ids": ids_schema,
+    "tv_stocks": tv_schema,
+    "tv_crypto": tv_schema,
+    "tv_forex": tv_schema,
+    "tv_cfd": tv_schema,
+    "cg_coins": {"id": "TEXT", "symbol": "TEXT", "name": "TEXT"},
+    "nasdaq_tickers": {"ticker": "TEXT"},
+    "tweet_ids": {"id": "INTEGER", "timestamp": "TIMESTAMP"},
+}
+
+# The columns that are used for filtering, each gets its own index
+INDEXES = {
+    "tweets": ["ticker", "timestamp", "category"],
+    "assets": ["id", "asset"],
+    "portfolio": ["id"],
+    "classified_tickers": ["ticker", "timestamp"],
+    "reddit_ids": ["id", "timestamp"],
+    "ideas_ids": ["id", "timestamp"],
+    "tv_stocks": ["stock"],
+    "tv_crypto": ["stock"],
+    "tv_forex": ["stock"],
+    "tv_cfd": ["stock"],
+    "cg_coins": ["id", "symbol", "name"],
+    "tweet_ids": ["id"],
+}
+
+# Columns that were renamed, used when migrating the old tables
+RENAMED_COLUMNS = {"nasdaq_tickers": {"0": "ticker"}}
+
+# The reference tables are refreshed every 24 hours and saved as snapshots
+REFRESH_INTERVAL = datetime.timedelta(hours=24)
+
 
 class DB(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
@@ -29,10 +111,16 @@ class DB(commands.Cog):
         # Check if the data folder exists
         os.makedirs("data", exist_ok=True)
 
+        # Convert the old tables that only contain text to the typed schemas
+        for database_name in SCHEMAS:
+            if os.path.exists(get_db_location(database_name)):
+                db_manager.submit(database_name, migrate_table, database_name)
+
         # Start loops
         self.set_tv_db.start()
         self.set_cg_db.start()
         self.set_nasdaq_tickers.start()
+        self.remove_expired_rows.start()
 
         # Set the portfolio and assets db
         self.set_portfolio_db()
@@ -41,20 +129,19 @@ class DB(commands.Cog):
         self.set_reddit_ids_db()
         self.set_ideas_ids_db()
         self.set_classified_tickers_db()
+        self.set_tweet_ids_db()
         self.set_options_db()
 
     def set_portfolio_db(self):
         util.vars.portfolio_db = get_db("portfolio")
-        if not util.vars.portfolio_db.empty:
-            util.vars.portfolio_db["id"] = util.vars.portfolio_db["id"].astype(np.int64)
 
     def set_assets_db(self):
         util.vars.assets_db = get_db("assets")
-        if not util.vars.assets_db.empty:
-            util.vars.assets_db["id"] = util.vars.assets_db["id"].astype(np.int64)
+        asset_index.rebuild(util.vars.assets_db)
 
     def set_tweets_db(self):
-        util.vars.tweets_db = get_db("tweets")
+        # The mentions of the last 24 hours are kept in memory
+        mentions.load(get_db("tweets"))
 
     def set_options_db(self):
         util.vars.options_db = get_db("options")
@@ -66,13 +153,30 @@ class DB(commands.Cog):
         util.vars.ideas_ids = get_db("ideas_ids")
 
     def set_classified_tickers_db(self):
-        util.vars.classified_tickers = get_db("classified_tickers")
+        # Remove the expired tickers before filling the cache
+        delete_older_than("classified_tickers", days=3)
+        ticker_cache.load(get_db("classified_tickers"))
+
+    def set_tweet_ids_db(self):
+        # The posted tweets, so they are not posted again after a restart
+        tweet_ids.load(get_db("tweet_ids"))
+
+    @loop(hours=1)
+    async def remove_expired_rows(self):
+        """
+        Removes the old mentions and classified tickers from their tables.
+        Retention is done in SQL, so the tables never have to be rewritten.
+        """
+        delete_older_than("tweets", days=1)
+        delete_older_than("classified_tickers", days=3)
 
     @loop(hours=24)
     async def set_nasdaq_tickers(self):
         try:
             util.vars.nasdaq_tickers = tickers_nasdaq()
-            update_db(pd.DataFrame(util.vars.nasdaq_tickers), "nasdaq_tickers")
+            update_db(
+                pd.DataFrame({"ticker": util.vars.nasdaq_tickers}), "nasdaq_tickers"
+            )
 
         except Exception as e:
             logger.error(f"Failed to get new nasdaq tickers, error: {e}")
@@ -83,6 +187,11 @@ class DB(commands.Cog):
     # Set the important database variables on startup and refresh every 24 hours
     @loop(hours=24)
     async def set_cg_db(self):
+        # On startup use the snapshot if it is recent enough
+        if util.vars.cg_db is None and is_snapshot_fresh("cg_coins"):
+            util.vars.cg_db = get_reference_db("cg_coins")
+            return
+
         # Saves all CoinGecko coins, maybe refresh this daily
         coin_list = await get_coins_list()
 
@@ -92,15 +201,19 @@ class DB(commands.Cog):
             )
 
             # Get the old data
-            cg_coins = get_db("cg_coins")
+            cg_coins = (
+                util.vars.cg_db
+                if util.vars.cg_db is not None
+                else get_reference_db("cg_coins")
+            )
         else:
             cg_coins = pd.DataFrame(coin_list)
 
             # Convert the symbol to uppercase
             cg_coins["symbol"] = cg_coins["symbol"].str.upper()
 
-            # Save cg_coins to database
-            update_db(cg_coins, "cg_coins")
+            # Save cg_coins as snapshot
+            await asyncio.to_thread(save_snapshot, cg_coins, "cg_coins")
 
         # Set cg_coins
         util.vars.cg_db = cg_coins
@@ -108,14 +221,23 @@ class DB(commands.Cog):
     @loop(hours=24)
     async def set_tv_db(self):
         """
-        Gets the data from TradingView and saves it to the database.
+        Gets the data from TradingView and saves it as snapshots.
         """
 
-        # In case the function below fails
-        util.vars.stocks = get_db("tv_stocks")
-        util.vars.crypto = get_db("tv_crypto")
-        util.vars.forex = get_db("tv_forex")
-        util.vars.cfd = get_db("tv_cfd")
+        # On startup load the snapshots, in case the function below fails
+        if util.vars.stocks is None:
+            util.vars.stocks = get_reference_db("tv_stocks")
+            util.vars.crypto = get_reference_db("tv_crypto")
+            util.vars.forex = get_reference_db("tv_forex")
+            util.vars.cfd = get_reference_db("tv_cfd")
+
+            # No need to download the data again if the snapshots are recent
+            if all(
+                is_snapshot_fresh(name)
+                for name in ["tv_stocks", "tv_crypto", "tv_forex"]
+            ):
+                tv.build_symbol_index()
+                return
 
         # Get the current symbols and exchanges on TradingView
         tv_stocks = await get_tv_ticker_data(
@@ -138,7 +260,7 @@ class DB(commands.Cog):
             # (tv_cfd, "tv_cfd"),
         ]:
             if not db.empty:
-                update_db(db, name)
+                await asyncio.to_thread(save_snapshot, db, name)
 
                 if name == "tv_stocks":
                     util.vars.stocks = db
@@ -149,18 +271,51 @@ class DB(commands.Cog):
                 # elif name == "tv_cfd":
                 #    util.vars.cfd = db
 
+        # Swap in the index of the new tables
+        tv.build_symbol_index()
+
 
 def setup(bot: commands.Bot) -> None:
     bot.add_cog(DB(bot))
 
 
+def is_snapshot_fresh(name: str) -> bool:
+    """
+    Checks if the snapshot exists and was made less than 24 hours ago.
+    """
+    age = snapshot_age(name)
+    return age is not None and age < REFRESH_INTERVAL
+
+
+def get_reference_db(name: str) -> pd.DataFrame:
+    """
+    Gets a reference table (TradingView or CoinGecko) from its snapshot.
+    Falls back to the old SQL table if there is no snapshot yet.
+
+    Parameters
+    ----------
+    name : str
+        The name of the table, e.g. "tv_stocks".
+
+    Returns
+    -------
+    pd.DataFrame
+        The reference table.
+    """
+    snapshot = load_snapshot(name)
+    if snapshot is not None:
+        return snapshot
+    return get_db(name)
+
+
 def remove_old_rows(db: pd.DataFrame, days: int) -> pd.DataFrame:
     """
     Removes the old rows from the database and return it.
     """
 
-    # Set timestamp column to datetime
-    db["timestamp"] = pd.to_datetime(db["timestamp"])
+    # The tables are loaded with parsed timestamps, only convert if needed
+    if not pd.api.types.is_datetime64_any_dtype(db["timestamp"]):
+        db["timestamp"] = pd.to_datetime(db["timestamp"])
 
     return db[db["timestamp"] > datetime.datetime.now() - datetime.timedelta(days=days)]
 
@@ -168,39 +323,34 @@ def remove_old_rows(db: pd.DataFrame, days: int) -> pd.DataFrame:
 def merge_and_update(
     main_db: pd.DataFrame, new_data: pd.DataFrame, db_name: str
 ) -> pd.DataFrame:
+    """
+    Adds the new data to the in-memory database and appends only the new rows
+    to the SQL table, instead of rewriting the whole table.
+    """
     merged = pd.concat([main_db, new_data], ignore_index=True)
-    update_db(merged, db_name)
+    append_rows(new_data, db_name)
     return merged
 
 
-def clean_old_db(db, days: int = 1) -> pd.DataFrame:
+def parse_change(change) -> Optional[float]:
     """
-    Cleans the tweets database and returns it.
-
-    Returns
-    -------
-    pd.Dataframe
-        The cleaned tweets database.
+    Converts a formatted change, such as "+1.23% 📈", to a float.
+    Returns None if there is no change.
     """
+    if not isinstance(change, str):
+        return None
 
-    # If the database is empty, do nothing and return
-    if db.empty:
-        return db
-
-    # Set the types
-    try:
-        db = remove_old_rows(db, days)
-        return db
-    except Exception as e:
-        logger.error(f"Error in clean_old_db: {e}")
-        logger.error(db.to_string())
+    match = re.search(r"[-+]?\d*\.?\d+", change)
+    if match:
+        return float(match.group())
+    return None
 
 
 def update_tweet_db(
     tickers: list, user: str, sentiment: str, categories: list, changes: list
 ) -> None:
     """
-    Updates thet tweet database variable using the info provided.
+    Adds the mentions to the mention store and appends them to the tweets table.
 
     Parameters
     ----------
@@ -216,41 +366,323 @@ def update_tweet_db(
 
     # Prepare new data
     dict_list = []
+    timestamp = datetime.datetime.now().replace(microsecond=0)
 
     for i in range(len(tickers)):
-        # Remove emoji at end
-        change = changes[i]
-        if change:
-            if "%" in change:
-                change = change[:-1]
-            else:
-                change = "None"
-        else:
-            change = "None"
-
         dict_list.append(
             {
                 "ticker": tickers[i],
                 "user": user,
                 "sentiment": convert_emoji[sentiment],
                 "category": categories[i],
-                "change": change,
+                "change": parse_change(changes[i]),
+                "timestamp": timestamp,
             }
         )
+        mentions.add(
+            tickers[i],
+            categories[i],
+            convert_emoji[sentiment],
+            dict_list[-1]["change"],
+            timestamp,
+        )
+
+    # The store is kept in memory, the table is only used to restore it on startup
+    # The old rows are removed by DB.remove_expired_rows()
+    append_rows(pd.DataFrame(dict_list), "tweets")
+
+
+def update_classified_tickers(
+    ticker: str, website: str, exchanges: list, base_symbol: str
+) -> None:
+    """
+    Adds the classified ticker to the ticker cache and saves it in the classified_tickers table,
+    replacing the row of the ticker if it was classified before.
+
+    Parameters
+    ----------
+    ticker : str
+        The ticker that was classified.
+    website : str
+        The website of the ticker, e.g. its CoinGecko or Yahoo page.
+    exchanges : list
+        The exchanges that list the ticker.
+    base_symbol : str
+        The base symbol of the ticker.
+    """
+
+    record = ticker_cache.add(ticker, website, exchanges, base_symbol)
+
+    # Several workers can classify the same ticker at the same time
+    upsert(
+        pd.DataFrame(
+            [
+                {
+                    "ticker": ticker,
+                    "website": website,
+                    # Db cannot handle lists, so we convert them to strings
+                    "exchanges": ";".join(exchanges),
+                    "base_symbol": base_symbol,
+                    "timestamp": record.timestamp,
+                }
+            ]
+        ),
+        "classified_tickers",
+        ["ticker"],
+    )
+
+
+def update_tweet_ids(tweet_id: int) -> None:
+    """
+    Marks the tweet as posted in the tweet id store and saves it in the tweet_ids table.
+
+    Parameters
+    ----------
+    tweet_id : int
+        The id of the posted tweet.
+    """
+
+    tweet_ids.add(tweet_id)
+
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    db_manager.submit(
+        "tweet_ids", save_tweet_id, tweet_id, timestamp, tweet_ids.max_size
+    )
+
+
+def get_db_location(database_name: str) -> str:
+    """
+    Returns the location of the SQLite file for the given database.
+
+    Parameters
+    ----------
+    database_name : str
+        Name of the database.
+
+    Returns
+    -------
+    str
+        The path to data/<database_name>.db.
+    """
+
+    script_dir = os.path.dirname(__file__)
+    return os.path.join(script_dir, "..", "..", "data", f"{database_name}.db")
+
+
+def quote_identifier(name: str) -> str:
+    """
+    Quotes a table or column name so it can be used in a SQL statement.
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def to_sql_value(value):
+    """
+    Converts a dataframe value to a type that SQLite can store.
+    """
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+
+def to_records(db: pd.DataFrame) -> tuple[list, list]:
+    """
+    Converts a dataframe to its column names and a list of row tuples with native values.
+    """
+    columns = [str(column) for column in db.columns]
+    rows = [
+        tuple(to_sql_value(value) for value in row)
+        for row in db.itertuples(index=False, name=None)
+    ]
+    return columns, rows
+
+
+class DBManager:
+    """
+    Keeps one SQLite connection per database file open in WAL mode and
+    commits the writes in batches on a background worker thread.
+    Writes that are submitted from the event loop are queued, so a slow fsync
+    never blocks the bot. Use flush() to wait until all queued writes are saved.
+    Reads use a separate connection per database, WAL lets them run while a batch
+    is being written, so a read never waits for the writer.
+    """
+
+    def __init__(self, max_batch: int = 500) -> None:
+        self.max_batch = max_batch
+
+        self.connections: dict[str, sqlite3.Connection] = {}
+        self.lock = threading.RLock()
+
+        # The read connections have their own lock, the writer holds self.lock for a whole batch
+        self.read_connections: dict[str, sqlite3.Connection] = {}
+        self.read_lock = threading.RLock()
+
+        # A single worker keeps the writes in the order they were submitted
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+        self.queue: Optional[asyncio.Queue] = None
+        self.flusher: Optional[asyncio.Task] = None
+
+    def connection(self, database_name: str) -> sqlite3.Connection:
+        """
+        Returns the pooled connection of the database, opening it on first use.
+        """
+        with self.lock:
+            cnx = self.connections.get(database_name)
+            if cnx is None:
+                # Autocommit mode, the transactions are started explicitly
+                cnx = sqlite3.connect(
+                    get_db_location(database_name),
+                    check_same_thread=False,
+                    isolation_level=None,
+                )
+                cnx.execute("PRAGMA journal_mode=WAL")
+                cnx.execute("PRAGMA synchronous=NORMAL")
+                self.connections[database_name] = cnx
+            return cnx
+
+    def read_connection(self, database_name: str) -> sqlite3.Connection:
+        """
+        Returns the connection that is used for reading the database, opening it on first use.
+        """
+        with self.read_lock:
+            cnx = self.read_connections.get(database_name)
+            if cnx is None:
+                cnx = sqlite3.connect(
+                    get_db_location(database_name),
+                    check_same_thread=False,
+                    isolation_level=None,
+                )
+                cnx.execute("PRAGMA journal_mode=WAL")
+                self.read_connections[database_name] = cnx
+            return cnx
+
+    def read(self, query: str, database_name: str, params: tuple = ()) -> pd.DataFrame:
+        """
+        Runs a SELECT query on the read connection of the database.
+        The timestamp columns of the schema are returned as datetimes.
+        """
+        parse_dates = {
+            column: {"format": "ISO8601"}
+            for column, column_type in SCHEMAS.get(database_name, {}).items()
+            if column_type == "TIMESTAMP"
+        }
+        with self.read_lock:
+            return pd.read_sql_query(
+                query,
+                self.read_connection(database_name),
+                params=params,
+                parse_dates=parse_dates,
+            )
+
+    def submit(self, database_name: str, func: Callable, *args) -> None:
+        """
+        Queues a write for the database. The write is a function that receives the
+        connection as first argument, followed by the given arguments.
+        If there is no running event loop the write is done immediately.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.run_batch([(database_name, func, args)])
+            return
+
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+        if self.flusher is None or self.flusher.done():
+            self.flusher = loop.create_task(self.flush_loop())
+
+        self.queue.put_nowait((database_name, func, args))
+
+    async def flush_loop(self) -> None:
+        """
+        Background task that collects the queued writes and commits them in batches.
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self.queue.get()]
+            while not self.queue.empty() and len(batch) < self.max_batch:
+                batch.append(self.queue.get_nowait())
+
+            try:
+                await loop.run_in_executor(self.executor, self.run_batch, batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def run_batch(self, batch: list) -> None:
+        """
+        Commits the writes, using one transaction per database.
+        A failing write is rolled back without losing the rest of the batch.
+        """
+        per_db = defaultdict(list)
+        for database_name, func, args in batch:
+            per_db[database_name].append((func, args))
+
+        with self.lock:
+            for database_name, writes in per_db.items():
+                cnx = self.connection(database_name)
+                try:
+                    cnx.execute("BEGIN")
+                    for func, args in writes:
+                        cnx.execute("SAVEPOINT write")
+                        try:
+                            func(cnx, *args)
+                            cnx.execute("RELEASE write")
+                        except Exception as e:
+                            cnx.execute("ROLLBACK TO write")
+                            cnx.execute("RELEASE write")
+                            logger.error(
+                                f"Error writing to {database_name}.db in {func.__name__}: {e}"
+                            )
+                    cnx.execute("COMMIT")
+                except Exception as e:
+                    logger.error(f"Error committing to {database_name}.db: {e}")
+                    if cnx.in_transaction:
+                        cnx.execute("ROLLBACK")
+
+    async def flush(self) -> None:
+        """
+        Waits until all queued writes are committed.
+        """
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def close(self) -> None:
+        """
+        Flushes the queued writes and closes all connections. Used on shutdown.
+        """
+        await self.flush()
+
+        if self.flusher is not None:
+            self.flusher.cancel()
+            self.flusher = None
 
-    # Convert it to a dataframe
-    tweet_db = pd.DataFrame(dict_list)
+        with self.lock:
+            for cnx in self.connections.values():
+                cnx.close()
+            self.connections.clear()
 
-    # Add current time
-    tweet_db["timestamp"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.read_lock:
+            for cnx in self.read_connections.values():
+                cnx.close()
+            self.read_connections.clear()
 
-    util.vars.tweets_db = clean_old_db(util.vars.tweets_db, 1)
-    util.vars.tweets_db = merge_and_update(util.vars.tweets_db, tweet_db, "tweets")
+
+db_manager = DBManager()
 
 
 def get_db(database_name: str) -> pd.DataFrame:
     """
-    Get the database saved under data/<database_name>.pkl.
+    Get the database saved under data/<database_name>.db.
     If it does not exist return an empty dataframe.
 
     Parameters
@@ -261,23 +693,208 @@ def get_db(database_name: str) -> pd.DataFrame:
     Returns
     -------
     pd.DataFrame
-        Database saved under data/<database_name>.pkl.
+        Database saved under data/<database_name>.db.
     """
 
-    script_dir = os.path.dirname(__file__)
-    db_loc = os.path.join(script_dir, "..", "..", "data", f"{database_name}.db")
-
     try:
-        cnx = sqlite3.connect(db_loc)
-        return pd.read_sql_query(f"SELECT * FROM {database_name}", cnx)
+        return db_manager.read(
+            f"SELECT * FROM {quote_identifier(database_name)}", database_name
+        )
     except Exception:
         logger.error(f"No {database_name}.db found, returning empty db")
         return pd.DataFrame()
 
 
+def create_indexes(cnx: sqlite3.Connection, database_name: str) -> None:
+    """
+    Creates the indexes of the table that are declared in INDEXES.
+    """
+    for column in INDEXES.get(database_name, []):
+        cnx.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote_identifier(f'idx_{database_name}_{column}')} "
+            f"ON {quote_identifier(database_name)} ({quote_identifier(column)})"
+        )
+
+
+def table_columns(cnx: sqlite3.Connection, database_name: str) -> dict:
+    """
+    Returns the columns of the stored table and their declared types.
+    The dict is empty if the table does not exist.
+    """
+    return {
+        row[1]: row[2]
+        for row in cnx.execute(f"PRAGMA table_info({quote_identifier(database_name)})")
+    }
+
+
+def create_table(cnx: sqlite3.Connection, database_name: str, columns: list) -> None:
+    """
+    Creates the table of the database using its schema if it does not exist yet.
+    Columns that are not part of the schema are stored as text.
+    """
+    schema = SCHEMAS.get(database_name, {})
+    existing = table_columns(cnx, database_name)
+
+    if not existing:
+        column_types = dict(schema)
+        for column in columns:
+            column_types.setdefault(column, "TEXT")
+
+        column_defs = ", ".join(
+            f"{quote_identifier(column)} {column_type}"
+            for column, column_type in column_types.items()
+        )
+        cnx.execute(f"CREATE TABLE {quote_identifier(database_name)} ({column_defs})")
+        create_indexes(cnx, database_name)
+        return
+
+    # Add new columns to the existing table
+    for column in columns:
+        if column not in existing:
+            cnx.execute(
+                f"ALTER TABLE {quote_identifier(database_name)} "
+                f"ADD COLUMN {quote_identifier(column)} {schema.get(column, 'TEXT')}"
+            )
+
+
+def migrate_table(cnx: sqlite3.Connection, database_name: str) -> None:
+    """
+    Converts a table that was stored with only text columns to its typed schema.
+    This only does something the first time, after that the column types match the schema.
+    """
+    schema = SCHEMAS[database_name]
+    existing = table_columns(cnx, database_name)
+
+    if not existing:
+        return
+
+    renamed = RENAMED_COLUMNS.get(database_name, {})
+    sources = {renamed.get(column, column): column for column in existing}
+
+    if all(existing.get(column) == t for column, t in schema.items()):
+        # Already migrated, only make sure the indexes exist
+        create_indexes(cnx, database_name)
+        return
+
+    logger.info(f"Migrating {database_name}.db to the typed schema")
+
+    old_table = quote_identifier(f"{database_name}_old")
+    cnx.execute(f"ALTER TABLE {quote_identifier(database_name)} RENAME TO {old_table}")
+
+    # Keep the columns that are not in the schema
+    columns = list(schema) + [c for c in sources if c not in schema]
+    create_table(cnx, database_name, columns)
+
+    select = []
+    for column in columns:
+        if column not in sources:
+            select.append("NULL")
+            continue
+
+        source = quote_identifier(sources[column])
+        # Missing values were saved as their string representation
+        is_null = f"{source} IS NULL OR {source} IN ('', 'None', 'nan', 'NaN', 'NaT')"
+        column_type = schema.get(column, "TEXT")
+
+        if column_type == "INTEGER":
+            value = f"CAST({source} AS INTEGER)"
+        elif column_type == "REAL":
+            value = f"CAST({source} AS REAL)"
+        elif column_type == "TIMESTAMP":
+            # Drop the microseconds, so all timestamps have the same format
+            value = f"substr({source}, 1, 19)"
+        else:
+            value = source
+        select.append(f"CASE WHEN {is_null} THEN NULL ELSE {value} END")
+
+    column_names = ", ".join(quote_identifier(column) for column in columns)
+    cnx.execute(
+        f"INSERT INTO {quote_identifier(database_name)} ({column_names}) "
+        f"SELECT {', '.join(select)} FROM {old_table}"
+    )
+    cnx.execute(f"DROP TABLE {old_table}")
+
+
+def insert_rows(
+    cnx: sqlite3.Connection, database_name: str, columns: list, rows: list
+) -> None:
+    """
+    Inserts the rows in the table, creating the table if needed.
+    """
+    create_table(cnx, database_name, columns)
+    column_names = ", ".join(quote_identifier(column) for column in columns)
+    placeholders = ", ".join("?" for _ in columns)
+    cnx.executemany(
+        f"INSERT INTO {quote_identifier(database_name)} ({column_names}) VALUES ({placeholders})",
+        rows,
+    )
+
+
+def replace_table(
+    cnx: sqlite3.Connection, database_name: str, columns: list, rows: list
+) -> None:
+    """
+    Replaces the whole table with the given rows.
+    """
+    cnx.execute(f"DROP TABLE IF EXISTS {quote_identifier(database_name)}")
+    insert_rows(cnx, database_name, columns, rows)
+
+
+def delete_rows(
+    cnx: sqlite3.Connection, database_name: str, condition: str, params: tuple
+) -> None:
+    """
+    Deletes the rows that match the condition, if the table exists.
+    """
+    exists = cnx.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (database_name,)
+    ).fetchone()
+    if exists:
+        cnx.execute(
+            f"DELETE FROM {quote_identifier(database_name)} WHERE {condition}", params
+        )
+
+
+def upsert_rows(
+    cnx: sqlite3.Connection,
+    database_name: str,
+    columns: list,
+    rows: list,
+    key_columns: list,
+) -> None:
+    """
+    Deletes the stored rows with the same keys and inserts the new rows.
+    """
+    key_idx = [columns.index(column) for column in key_columns]
+    keys = list(dict.fromkeys(tuple(row[i] for i in key_idx) for row in rows))
+    condition = " AND ".join(
+        f"{quote_identifier(column)} = ?" for column in key_columns
+    )
+
+    create_table(cnx, database_name, columns)
+    cnx.executemany(
+        f"DELETE FROM {quote_identifier(database_name)} WHERE {condition}", keys
+    )
+    insert_rows(cnx, database_name, columns, rows)
+
+
+def save_tweet_id(
+    cnx: sqlite3.Connection, tweet_id: int, timestamp: str, keep: int
+) -> None:
+    """
+    Saves the id of a posted tweet and removes all but the newest ids, in the same transaction.
+    """
+    upsert_rows(cnx, "tweet_ids", ["id", "timestamp"], [(tweet_id, timestamp)], ["id"])
+    cnx.execute(
+        'DELETE FROM "tweet_ids" WHERE id NOT IN '
+        '(SELECT id FROM "tweet_ids" ORDER BY id DESC LIMIT ?)',
+        (keep,),
+    )
+
+
 def update_db(db: pd.DataFrame, database_name: str) -> None:
     """
-    Update the database saved under data/database_name.pkl using db as the new database.
+    Update the database saved under data/database_name.db using db as the new database.
 
     Parameters
     ----------
@@ -291,18 +908,102 @@ def update_db(db: pd.DataFrame, database_name: str) -> None:
     None
     """
 
-    db_loc = f"data/{database_name}.db"
+    columns, rows = to_records(db)
+    db_manager.submit(database_name, replace_table, database_name, columns, rows)
 
-    # Convert everything to string to prevent errors
-    # Using map on each column
-    for column in db.columns:
-        db[column] = db[column].map(str)
 
-    try:
-        db.to_sql(
-            database_name, sqlite3.connect(db_loc), if_exists="replace", index=False
-        )
-    except Exception as e:
-        logger.error(
-            f"Error updating {database_name}.db: {e}.\nTried to update database:\n{db.to_string()}"
-        )
+def append_rows(new_rows: pd.DataFrame, database_name: str) -> None:
+    """
+    Appends the given rows to the table of the database, without touching the
+    rows that are already stored. The table is created if it does not exist yet.
+
+    Parameters
+    ----------
+    new_rows : pd.DataFrame
+        The rows to add to the database.
+    database_name : str
+        Name of the database to append to.
+
+    Returns
+    -------
+    None
+    """
+
+    if new_rows.empty:
+        return
+
+    columns, rows = to_records(new_rows)
+    db_manager.submit(database_name, insert_rows, database_name, columns, rows)
+
+
+def delete_where(database_name: str, condition: str, params: tuple = ()) -> None:
+    """
+    Deletes the rows of the table that match the given SQL condition.
+
+    Parameters
+    ----------
+    database_name : str
+        Name of the database to delete from.
+    condition : str
+        The SQL WHERE clause, e.g. "timestamp < ?".
+    params : tuple, optional
+        The parameters used in the condition, by default ().
+
+    Returns
+    -------
+    None
+    """
+
+    db_manager.submit(database_name, delete_rows, database_name, condition, params)
+
+
+def delete_older_than(database_name: str, days: float) -> None:
+    """
+    Removes the rows of the table that have a timestamp older than the given number of days.
+    This is the SQL counterpart of remove_old_rows().
+
+    Parameters
+    ----------
+    database_name : str
+        Name of the database to clean.
+    days : float
+        The number of days to keep.
+
+    Returns
+    -------
+    None
+    """
+
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
+
+    # The timestamps are saved as ISO formatted strings, so they can be compared as text
+    delete_where(
+        database_name, "timestamp < ?", (cutoff.strftime("%Y-%m-%d %H:%M:%S"),)
+    )
+
+
+def upsert(new_rows: pd.DataFrame, database_name: str, key_columns: list) -> None:
+    """
+    Inserts the given rows, replacing the stored rows that have the same values for the key columns.
+
+    Parameters
+    ----------
+    new_rows : pd.DataFrame
+        The rows to insert or update.
+    database_name : str
+        Name of the database to update.
+    key_columns : list
+        The columns that identify a row, e.g. ["id", "asset"].
+
+    Returns
+    -------
+    None
+    """
+
+    if new_rows.empty:
+        return
+
+    columns, rows = to_records(new_rows)
+    db_manager.submit(
+        database_name, upsert_rows, database_name, columns, rows, key_columns
+    )
@@ -1,5 +1,6 @@
 import os
 import sys
+from collections import defaultdict
 from functools import wraps
 from typing import Optional
 
@@ -7,7 +8,9 @@ import discord
 from discord.ext import commands
 
 import util.vars
+from constants.config import config
 from constants.logger import logger
+from util.asset_index import asset_index
 
 
 def loop_error_catcher(func):
@@ -106,6 +109,109 @@ def get_guild(bot: commands.Bot) -> discord.Guild:
     )
 
 
+class ChannelRegistry:
+    """
+    Keeps the channels of the guild in dicts, so they can be found without looping over all channels.
+    It is filled on startup and kept up to date by the channel create, delete and update events.
+    """
+
+    def __init__(self) -> None:
+        self.populated = False
+        # Channel name -> channels with that name, in the order of the guild
+        self.by_name: defaultdict[str, list] = defaultdict(list)
+        # (channel name, category name) -> channel
+        self.by_name_category: dict[tuple[str, str], discord.abc.GuildChannel] = {}
+        # User name without the emoji and separator -> text channel
+        self.user_channels: dict[str, discord.TextChannel] = {}
+
+    def populate(self, bot: commands.Bot) -> None:
+        """
+        Adds all channels of the guild, replacing what was stored before.
+        """
+        self.by_name = defaultdict(list)
+        self.by_name_category = {}
+        self.user_channels = {}
+
+        for guild in bot.guilds:
+            if guild.name == guild_name:
+                for channel in guild.channels:
+                    self.add(channel)
+
+        self.populated = True
+
+    def user_name(self, channel_name: str) -> str:
+        # The symbol that separates the emoji and channel name
+        separator = config["CHANNEL_SEPARATOR"]
+        if separator in channel_name:
+            return channel_name.split(separator)[1]
+        return channel_name
+
+    def add(self, channel: discord.abc.GuildChannel) -> None:
+        if channel.guild.name != guild_name:
+            return
+
+        # The channel could already be added by get_channel()
+        if any(c.id == channel.id for c in self.by_name.get(channel.name, [])):
+            return
+
+        self.by_name[channel.name].append(channel)
+        if channel.category:
+            self.by_name_category.setdefault(
+                (channel.name, channel.category.name), channel
+            )
+        if isinstance(channel, discord.TextChannel):
+            self.user_channels.setdefault(self.user_name(channel.name), channel)
+
+    def remove(self, channel: discord.abc.GuildChannel) -> None:
+        channels = self.by_name.get(channel.name, [])
+        self.by_name[channel.name] = [c for c in channels if c.id != channel.id]
+        if not self.by_name[channel.name]:
+            del self.by_name[channel.name]
+
+        for key, stored in list(self.by_name_category.items()):
+            if stored.id == channel.id:
+                del self.by_name_category[key]
+
+        for name, stored in list(self.user_channels.items()):
+            if stored.id == channel.id:
+                del self.user_channels[name]
+
+    def update(
+        self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel
+    ) -> None:
+        self.remove(before)
+        self.add(after)
+
+        # The channels in a renamed category are stored under the old category name
+        if isinstance(after, discord.CategoryChannel) and before.name != after.name:
+            for channel in after.channels:
+                self.remove(channel)
+                self.add(channel)
+
+    def get(
+        self, bot: commands.Bot, channel_name: str, category_name: str = None
+    ) -> Optional[discord.abc.GuildChannel]:
+        """
+        Returns the channel with the given name (and category), or None if it does not exist.
+        """
+        if not self.populated:
+            self.populate(bot)
+
+        if category_name is None:
+            channels = self.by_name.get(channel_name)
+            return channels[0] if channels else None
+        return self.by_name_category.get((channel_name, category_name))
+
+    def get_user_channel(self, user_name: str) -> Optional[discord.TextChannel]:
+        """
+        Returns the text channel of the user, e.g. 👨┃elonmusk for elonmusk.
+        """
+        return self.user_channels.get(user_name)
+
+
+channel_registry = ChannelRegistry()
+
+
 async def get_channel(
     bot: commands.Bot, channel_name: str, category_name: str = None
 ) -> discord.TextChannel:
@@ -125,28 +231,25 @@ async def get_channel(
         The discord.TextChannel object of the channel with the given name.
     """
 
-    for guild in bot.guilds:
-        if guild.name == guild_name:
-            for channel in guild.channels:
-                if channel.name == channel_name:
-                    if category_name is None:
-                        return channel
-                    else:
-                        if channel.category:
-                            if channel.category.name == category_name:
-                                return channel
+    channel = channel_registry.get(bot, channel_name, category_name)
+    if channel is not None:
+        return channel
 
     logger.info(
         f"Channel named: {channel_name}, with category {category_name} not found in guild: {guild_name}.\nCreating it..."
     )
 
     # If the channel is not found, create it
+    guild = get_guild(bot)
     if category_name:
         category = discord.utils.get(guild.categories, name=category_name)
         channel = await guild.create_text_channel(channel_name, category=category)
+    else:
+        # Maybe read the category from the config file
+        channel = await guild.create_text_channel(channel_name)
 
-    # Maybe read the category from the config file
-    channel = await guild.create_text_channel(channel_name)
+    # Do not wait for the create event, so the next call finds it
+    channel_registry.add(channel)
     return channel
 
 
@@ -210,18 +313,12 @@ def get_tagged_users(tickers: list) -> Optional[str]:
         The message of the users that need to be tagged.
     """
 
-    # Get the stored db
-    if not util.vars.assets_db.empty:
-        matching_users = (
-            util.vars.assets_db[util.vars.assets_db["asset"].isin(tickers)]["id"]
-            .dropna()
-            .tolist()
-        )
-        unique_users = list(set(matching_users))
-
-        if unique_users:
-            # Make it one message for all the users
-            return " ".join([f"<@!{user}>" for user in unique_users])
+    # Look up the owners of the tickers in the asset index
+    unique_users = asset_index.users(tickers)
+
+    if unique_users:
+        # Make it one message for all the users
+        return " ".join([f"<@!{user}>" for user in unique_users])
 
 
 async def get_webhook(channel: discord.TextChannel) -> discord.Webhook:
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import datetime
+import heapq
+from collections import Counter, deque
+from typing import Optional
+
+import pandas as pd
+
+SENTIMENTS = ("bull", "neutral", "bear")
+
+
+class MentionStore:
+    """
+    Keeps the ticker mentions of the last 24 hours in memory.
+    The mentions are counted in per-minute buckets, keyed by (category, ticker, sentiment).
+    Adding a mention is O(1), expiring is O(buckets) and the totals of the whole window
+    are kept up to date, so the overview does not have to filter a dataframe per ticker.
+    """
+
+    def __init__(self, window_minutes: int = 24 * 60, bucket_seconds: int = 60) -> None:
+        self.window_minutes = window_minutes
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = window_minutes * 60 // bucket_seconds
+
+        # Each bucket is [bucket_index, Counter((category, ticker, sentiment))]
+        self.buckets: deque[list] = deque()
+
+        # The counts of all buckets in the window
+        self.totals: Counter = Counter()
+        self.ticker_totals: Counter = Counter()
+
+        # The latest change of each (category, ticker), in percent
+        self.latest_change: dict[tuple[str, str], Optional[float]] = {}
+
+    def bucket_index(self, timestamp: datetime.datetime) -> int:
+        return int(timestamp.timestamp() // self.bucket_seconds)
+
+    def add(
+        self,
+        ticker: str,
+        category: str,
+        sentiment: str,
+        change: Optional[float] = None,
+        timestamp: Optional[datetime.datetime] = None,
+    ) -> None:
+        """
+        Adds one mention of the ticker.
+
+        Parameters
+        ----------
+        ticker : str
+            The ticker that was mentioned, e.g. BTC.
+        category : str
+            Either "crypto" or "stocks".
+        sentiment : str
+            Either "bull", "bear" or "neutral".
+        change : Optional[float]
+            The change of the ticker at the time of the mention.
+        timestamp : Optional[datetime.datetime]
+            The time of the mention, by default now.
+        """
+        now = datetime.datetime.now()
+        if timestamp is None:
+            timestamp = now
+
+        index = self.bucket_index(timestamp)
+        self.expire(now)
+
+        # Mentions older than the window are not counted
+        if index <= self.bucket_index(now) - self.max_buckets:
+            return
+
+        key = (category, ticker, sentiment)
+
+        if not self.buckets or self.buckets[-1][0] < index:
+            self.buckets.append([index, Counter()])
+            bucket = self.buckets[-1]
+        elif self.buckets[-1][0] == index:
+            bucket = self.buckets[-1]
+        else:
+            # Only happens for mentions that are added out of order
+            bucket = next((b for b in self.buckets if b[0] == index), None)
+            if bucket is None:
+                bucket = [index, Counter()]
+                self.buckets.append(bucket)
+                self.buckets = deque(sorted(self.buckets, key=lambda b: b[0]))
+
+        bucket[1][key] += 1
+        self.totals[key] += 1
+        self.ticker_totals[(category, ticker)] += 1
+
+        if change is not None and not pd.isna(change):
+            self.latest_change[(category, ticker)] = change
+        else:
+            self.latest_change.setdefault((category, ticker), None)
+
+    def expire(self, now: Optional[datetime.datetime] = None) -> None:
+        """
+        Removes the buckets that are older than the window.
+        """
+        if now is None:
+            now = datetime.datetime.now()
+
+        oldest = self.bucket_index(now) - self.max_buckets
+
+        while self.buckets and self.buckets[0][0] <= oldest:
+            _, counts = self.buckets.popleft()
+            self.totals.subtract(counts)
+
+            for key, count in counts.items():
+                category, ticker, _ = key
+                self.ticker_totals[(category, ticker)] -= count
+
+                if self.totals[key] <= 0:
+                    del self.totals[key]
+                if self.ticker_totals[(category, ticker)] <= 0:
+                    del self.ticker_totals[(category, ticker)]
+                    self.latest_change.pop((category, ticker), None)
+
+    def window_counts(self, minutes: Optional[int] = None) -> Counter:
+        """
+        Returns the counts of the last minutes, by default of the whole window.
+        """
+        self.expire()
+
+        if minutes is None or minutes >= self.window_minutes:
+            return self.totals
+
+        oldest = self.bucket_index(datetime.datetime.now()) - (
+            minutes * 60 // self.bucket_seconds
+        )
+        counts = Counter()
+        for index, bucket in reversed(self.buckets):
+            if index <= oldest:
+                break
+            counts.update(bucket)
+        return counts
+
+    def top(
+        self, category: str, k: int = 50, minutes: Optional[int] = None
+    ) -> list[tuple[str, int]]:
+        """
+        Returns the k most mentioned tickers of the category.
+
+        Parameters
+        ----------
+        category : str
+            Either "crypto" or "stocks".
+        k : int
+            The number of tickers to return, by default 50.
+        minutes : Optional[int]
+            The number of minutes to look back, by default the whole window.
+
+        Returns
+        -------
+        list[tuple[str, int]]
+            The tickers and their number of mentions, sorted from high to low.
+        """
+        if minutes is None or minutes >= self.window_minutes:
+            self.expire()
+            per_ticker = {
+                ticker: count
+                for (cat, ticker), count in self.ticker_totals.items()
+                if cat == category
+            }
+        else:
+            per_ticker = Counter()
+            for (cat, ticker, _), count in self.window_counts(minutes).items():
+                if cat == category:
+                    per_ticker[ticker] += count
+
+        return heapq.nlargest(k, per_ticker.items(), key=lambda item: item[1])
+
+    def sentiment(
+        self, category: str, ticker: str, minutes: Optional[int] = None
+    ) -> Counter:
+        """
+        Returns the number of mentions per sentiment of the ticker.
+        """
+        counts = self.window_counts(minutes)
+        return Counter(
+            {
+                sentiment: counts[(category, ticker, sentiment)]
+                for sentiment in SENTIMENTS
+                if counts[(category, ticker, sentiment)] > 0
+            }
+        )
+
+    def change(self, category: str, ticker: str) -> Optional[float]:
+        """
+        Returns the latest known change of the ticker.
+        """
+        return self.latest_change.get((category, ticker))
+
+    def is_empty(self) -> bool:
+        self.expire()
+        return not self.ticker_totals
+
+    def load(self, db: pd.DataFrame) -> None:
+        """
+        Fills the store with the rows of the tweets table.
+        """
+        if db.empty:
+            return
+
+        db = db.dropna(subset=["timestamp"]).sort_values("timestamp")
+        for row in db.itertuples(index=False):
+            self.add(
+                row.ticker,
+                row.category,
+                row.sentiment,
+                row.change,
+                row.timestamp.to_pydatetime(),
+            )
+
+
+mentions = MentionStore()
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import traceback
+from typing import Any, Awaitable, Callable, Optional
+
+from constants.logger import logger
+
+
+class Stage:
+    """
+    One step of a pipeline, with its own bounded queue and number of workers.
+    The function of the stage returns the item for the next stage, or None to drop the item.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Any], Awaitable[Optional[Any]]],
+        workers: int = 1,
+        maxsize: int = 20,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+        # Metrics
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.service_time = 0.0
+        self.max_service_time = 0.0
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "workers": self.workers,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "avg_service_time": (
+                self.service_time / self.processed if self.processed else 0.0
+            ),
+            "max_service_time": self.max_service_time,
+        }
+
+
+class Pipeline:
+    """
+    Runs items through a list of stages, the workers of a stage take items from its queue.
+    When the queue of a stage is full the stage before it waits (backpressure),
+    so putting items in a full pipeline waits until there is room.
+    The last stage gets the items in the order they were put in the pipeline,
+    items that finish early wait until the items before them are done or dropped.
+    """
+
+    def __init__(self, name: str, stages: list[Stage]) -> None:
+        self.name = name
+        self.stages = stages
+        self.tasks: list[asyncio.Task] = []
+
+        # The sequence number of the next item that is put in the pipeline
+        self.next_put = 0
+        # The sequence number of the next item for the last stage
+        self.next_out = 0
+        # Items that finished before the items in front of them, None if dropped
+        self.finished: dict[int, Any] = {}
+        self.order_lock = asyncio.Lock()
+
+    @property
+    def started(self) -> bool:
+        return bool(self.tasks)
+
+    def start(self) -> None:
+        for index, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                self.tasks.append(asyncio.create_task(self.work(index)))
+        running_pipelines.add(self)
+
+    async def put(self, item: Any) -> None:
+        """
+        Adds an item to the first stage, waits if its queue is full.
+        """
+        seq = self.next_put
+        self.next_put += 1
+        await self.stages[0].queue.put((seq, item))
+
+    async def join(self) -> None:
+        """
+        Waits until all items that were put in the pipeline are processed.
+        """
+        # Items are passed on before they are marked as done, so the stages can be joined in order
+        for stage in self.stages:
+            await stage.queue.join()
+
+    async def work(self, index: int) -> None:
+        stage = self.stages[index]
+        while True:
+            seq, item = await stage.queue.get()
+            start = time.perf_counter()
+            try:
+                result = await stage.func(item)
+            except Exception as e:
+                stage.errors += 1
+                result = None
+                logger.error(f"Error in the {self.name} {stage.name} stage: {e}")
+                logger.error(traceback.format_exc())
+            else:
+                if result is None:
+                    stage.dropped += 1
+
+            service_time = time.perf_counter() - start
+            stage.processed += 1
+            stage.service_time += service_time
+            stage.max_service_time = max(stage.max_service_time, service_time)
+
+            try:
+                await self.forward(index, seq, result)
+            finally:
+                stage.queue.task_done()
+
+    async def forward(self, index: int, seq: int, item: Optional[Any]) -> None:
+        last = len(self.stages) - 1
+        if index == last:
+            return
+
+        if item is not None and index + 1 < last:
+            await self.stages[index + 1].queue.put((seq, item))
+            return
+
+        # The item goes to the last stage or is dropped, either way it has its turn in the order
+        async with self.order_lock:
+            self.finished[seq] = item
+            while self.next_out in self.finished:
+                ready = self.finished.pop(self.next_out)
+                if ready is not None:
+                    await self.stages[last].queue.put((self.next_out, ready))
+                self.next_out += 1
+
+    async def close(self) -> None:
+        """
+        Stops the workers, the items that are still in the pipeline are dropped.
+        """
+        running_pipelines.discard(self)
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+        # Start again with empty queues, the dropped items would hold up the order
+        for stage in self.stages:
+            stage.queue = asyncio.Queue(stage.queue.maxsize)
+        self.next_put = 0
+        self.next_out = 0
+        self.finished = {}
+
+    def metrics(self) -> dict:
+        """
+        Returns the queue depth, number of processed items and service times per stage.
+        """
+        return {
+            "stages": {stage.name: stage.metrics() for stage in self.stages},
+            "waiting_for_order": len(self.finished),
+        }
+
+
+# The pipelines that have workers running, so they can be stopped on shutdown
+running_pipelines: set[Pipeline] = set()
+
+
+async def close_pipelines() -> None:
+    """
+    Stops the workers of all running pipelines, used on shutdown.
+    """
+    await asyncio.gather(*[pipeline.close() for pipeline in list(running_pipelines)])
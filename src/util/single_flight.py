@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import functools
+import inspect
+from collections import Counter
+from typing import Any, Callable, Hashable, Optional
+
+
+def normalize(value: Any) -> Hashable:
+    """
+    Converts the arguments of a call to a hashable value, so dicts and lists can be part of the key.
+    The values themselves are not changed, only calls with equal arguments share a key.
+    """
+    if isinstance(value, dict):
+        items = [(k, normalize(v)) for k, v in value.items()]
+        return tuple(sorted(items, key=lambda item: repr(item[0])))
+    if isinstance(value, (list, tuple, set)):
+        items = [normalize(v) for v in value]
+        return tuple(sorted(items, key=repr) if isinstance(value, set) else items)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls, keyed by (function, normalized arguments).
+    The first caller starts the call and the callers that arrive while it is running
+    await the same task instead of making the same request again.
+    """
+
+    def __init__(self) -> None:
+        self.in_flight: dict[tuple, asyncio.Task] = {}
+
+        # Metrics per function
+        self.calls: Counter = Counter()
+        self.coalesced: Counter = Counter()
+
+    async def do(
+        self,
+        key: tuple,
+        func: Callable,
+        *args,
+        copy_result: bool = False,
+        **kwargs,
+    ) -> Any:
+        """
+        Runs func(*args, **kwargs), or joins the running call with the same key.
+
+        Parameters
+        ----------
+        key : tuple
+            The key of the call, the first item should be the name of the function.
+        func : Callable
+            The coroutine function to call.
+        copy_result : bool
+            Whether the callers that joined the call get a copy of the result,
+            use this if the result is mutable and may be changed by the callers.
+
+        Returns
+        -------
+        Any
+            The result of the call.
+        """
+        self.calls[key[0]] += 1
+
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.coalesced[key[0]] += 1
+            # Shielded, so a cancelled caller does not cancel the call of the others
+            result = await asyncio.shield(task)
+            return copy.deepcopy(result) if copy_result else result
+
+        task = asyncio.create_task(func(*args, **kwargs))
+        self.in_flight[key] = task
+        task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def metrics(self) -> dict[str, dict]:
+        """
+        Returns the number of calls and coalesced calls per function.
+        """
+        return {
+            name: {
+                "calls": self.calls[name],
+                "coalesced": self.coalesced[name],
+                "outbound": self.calls[name] - self.coalesced[name],
+            }
+            for name in self.calls
+        }
+
+
+single_flight_group = SingleFlight()
+
+
+def single_flight(
+    func: Optional[Callable] = None,
+    *,
+    copy_result: bool = False,
+    group: SingleFlight = single_flight_group,
+) -> Callable:
+    """
+    Decorator that coalesces concurrent calls of a coroutine function with the same arguments.
+    The arguments are bound to the signature first, so f("BTC") and f(ticker="BTC") share one call.
+
+    Parameters
+    ----------
+    func : Optional[Callable]
+        The coroutine function to decorate.
+    copy_result : bool
+        Whether the callers that joined a call get a copy of the result, by default False.
+    group : SingleFlight
+        The group that keeps track of the running calls, by default the shared group.
+
+    Returns
+    -------
+    Callable
+        The decorated coroutine function.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (name, normalize(bound.arguments))
+            return await group.do(key, func, *args, copy_result=copy_result, **kwargs)
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_single_flight_metrics() -> dict[str, dict]:
+    """
+    Returns the number of calls, coalesced calls and outbound calls per function.
+    """
+    return single_flight_group.metrics()
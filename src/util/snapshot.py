@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import shutil
+import time
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+from constants.logger import logger
+
+snapshot_dir = os.path.join(os.path.dirname(__file__), "..", "..", "data", "snapshots")
+
+
+def get_snapshot_info(name: str) -> Optional[dict]:
+    """
+    Returns the version info of the current snapshot, or None if there is no snapshot.
+
+    Parameters
+    ----------
+    name : str
+        The name of the snapshot, e.g. "tv_stocks".
+
+    Returns
+    -------
+    Optional[dict]
+        The version, creation time, number of rows and columns of the snapshot.
+    """
+
+    try:
+        with open(os.path.join(snapshot_dir, f"{name}.json"), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def snapshot_age(name: str) -> Optional[datetime.timedelta]:
+    """
+    Returns how long ago the current snapshot was made, or None if there is no snapshot.
+    """
+
+    info = get_snapshot_info(name)
+    if info is None:
+        return None
+    return datetime.datetime.now() - datetime.datetime.fromisoformat(info["created"])
+
+
+def save_snapshot(df: pd.DataFrame, name: str) -> None:
+    """
+    Saves the dataframe as a snapshot, in an uncompressed Arrow (Feather) file.
+    The new version is written next to the old one and then activated by
+    replacing the version file, so readers never see a half written snapshot.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The table to save, numeric columns are kept and other columns are saved as text.
+        Missing values are kept as missing values.
+    name : str
+        The name of the snapshot, e.g. "tv_stocks".
+
+    Returns
+    -------
+    None
+    """
+
+    version = time.time_ns()
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    table = df.copy()
+    table.columns = [str(column) for column in table.columns]
+    for column in table.columns:
+        values = table[column]
+        if values.dtype.kind not in "biufM":
+            # Arrow needs one type per column, e.g. lists are saved as their text
+            table[column] = values.where(values.isna(), values.astype(str))
+
+    # Uncompressed, so the file can be memory-mapped when it is loaded
+    feather.write_feather(
+        table.reset_index(drop=True),
+        os.path.join(snapshot_dir, f"{name}-{version}.feather"),
+        compression="uncompressed",
+    )
+
+    info = {
+        "version": version,
+        "created": datetime.datetime.now().isoformat(),
+        "rows": len(table),
+        "columns": list(table.columns),
+    }
+
+    # Atomically activate the new version
+    tmp_file = os.path.join(snapshot_dir, f"{name}.json.tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(info, f)
+    os.replace(tmp_file, os.path.join(snapshot_dir, f"{name}.json"))
+
+    # Remove the older versions, including the folders of the old .npy format
+    for entry in os.listdir(snapshot_dir):
+        if entry.startswith(f"{name}-") and entry != f"{name}-{version}.feather":
+            path = os.path.join(snapshot_dir, entry)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+
+def load_snapshot(name: str) -> Optional[pd.DataFrame]:
+    """
+    Loads the current snapshot. The file is memory-mapped, so the columns are
+    read without parsing or copying them into a buffer first. The returned
+    dataframe owns its data and can be changed like any other dataframe.
+
+    Parameters
+    ----------
+    name : str
+        The name of the snapshot, e.g. "tv_stocks".
+
+    Returns
+    -------
+    Optional[pd.DataFrame]
+        The snapshot as a dataframe or None if there is no (valid) snapshot.
+    """
+
+    info = get_snapshot_info(name)
+    if info is None:
+        return None
+
+    try:
+        with pa.memory_map(
+            os.path.join(snapshot_dir, f"{name}-{info['version']}.feather"), "r"
+        ) as source:
+            table = feather.read_table(source, memory_map=True)
+            return table.to_pandas()
+    except (FileNotFoundError, pa.ArrowInvalid) as e:
+        logger.error(f"Could not load the {name} snapshot: {e}")
+        return None
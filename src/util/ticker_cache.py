@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import datetime
+from typing import NamedTuple, Optional
+
+import pandas as pd
+
+
+class ClassifiedTicker(NamedTuple):
+    website: str
+    exchanges: list[str]
+    base_symbol: str
+    timestamp: datetime.datetime
+
+
+class TickerCache:
+    """
+    Keeps the classified tickers in memory for a limited time, keyed by ticker.
+    Expired tickers are removed when they are looked up, so every lookup is O(1).
+    """
+
+    def __init__(self, ttl: datetime.timedelta = datetime.timedelta(days=3)) -> None:
+        self.ttl = ttl
+        self.tickers: dict[str, ClassifiedTicker] = {}
+
+    def get(self, ticker: str) -> Optional[ClassifiedTicker]:
+        """
+        Returns the classification of the ticker, or None if it is unknown or expired.
+        """
+        record = self.tickers.get(ticker)
+        if record is None:
+            return None
+
+        if datetime.datetime.now() - record.timestamp > self.ttl:
+            del self.tickers[ticker]
+            return None
+
+        return record
+
+    def add(
+        self,
+        ticker: str,
+        website: str,
+        exchanges: list[str],
+        base_symbol: str,
+        timestamp: Optional[datetime.datetime] = None,
+    ) -> ClassifiedTicker:
+        """
+        Adds the classification of the ticker and returns the record.
+        """
+        record = ClassifiedTicker(
+            website,
+            exchanges,
+            base_symbol,
+            timestamp or datetime.datetime.now().replace(microsecond=0),
+        )
+        self.tickers[ticker] = record
+        return record
+
+    def load(self, db: pd.DataFrame) -> None:
+        """
+        Fills the cache with the rows of the classified_tickers table.
+        """
+        if db.empty:
+            return
+
+        db = db.dropna(subset=["timestamp"]).sort_values("timestamp")
+        for row in db.itertuples(index=False):
+            exchanges = row.exchanges if isinstance(row.exchanges, str) else ""
+            self.add(
+                row.ticker,
+                row.website,
+                [exchange for exchange in exchanges.split(";") if exchange],
+                row.base_symbol,
+                row.timestamp.to_pydatetime(),
+            )
+
+
+ticker_cache = TickerCache()
@@ -10,6 +10,7 @@ from api.coingecko import get_coin_info
 from api.tradingview import tv
 from api.yahoo import get_stock_info
 from constants.logger import logger
+from util.single_flight import single_flight
 
 
 async def get_financials(ticker: str, website: str):
@@ -47,7 +48,7 @@ async def get_financials(ticker: str, website: str):
         _, _, _, price, change, _ = await get_stock_info(ticker, asset_type)
 
     # Get technical analysis (TA) data
-    four_h_ta, one_d_ta = tv.get_tv_TA(ticker, asset_type)
+    four_h_ta, one_d_ta = await tv.get_tv_TA(ticker, asset_type)
 
     return price, change, four_h_ta, one_d_ta
 
@@ -72,7 +73,7 @@ async def perform_ta(ticker: str, base_sym: str, asset_type: str, get_TA: bool):
         if base_sym is None:
             logger.warning(f"No base symbol found for {ticker}")
             base_sym = ticker
-        return tv.get_tv_TA(base_sym, asset_type)
+        return await tv.get_tv_TA(base_sym, asset_type)
     return None, None
 
 
@@ -121,6 +122,7 @@ async def get_best_guess(ticker: str, asset_type: str) -> Tuple:
     )
 
 
+@single_flight
 async def classify_ticker(
     ticker: str, majority: str
 ) -> Optional[Tuple[float, str, List[str], float, str, str]]:
@@ -160,12 +162,12 @@ async def classify_ticker(
     if c_volume > s_volume and c_volume > 50000:
         if not crypto_data[5]:  # No TA data yet
             crypto_data = list(crypto_data)
-            crypto_data[5], crypto_data[6] = tv.get_tv_TA(ticker, "crypto")
+            crypto_data[5], crypto_data[6] = await tv.get_tv_TA(ticker, "crypto")
             crypto_data = tuple(crypto_data)
         return crypto_data[:-1]
     else:
         if not stock_data[5]:  # No TA data yet
             stock_data = list(stock_data)
-            stock_data[5], stock_data[6] = tv.get_tv_TA(ticker, "stock")
+            stock_data[5], stock_data[6] = await tv.get_tv_TA(ticker, "stock")
             stock_data = tuple(stock_data)
         return stock_data[:-1]
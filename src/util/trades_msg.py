@@ -12,7 +12,8 @@ import util.trades_msg
 # Local dependencies
 import util.vars
 from constants.stable_coins import stables
-from util.db import get_db, update_db
+from util.asset_index import asset_index
+from util.db import update_db
 from util.exchange_data import get_buying_price, get_data, get_usd_price
 from util.formatting import format_change
 
@@ -72,18 +73,20 @@ async def on_msg(
     )
 
     # Assets db: asset, owned (quantity), exchange, id, user
-    assets_db = get_db("assets")
+    # The in-memory db is used, the table might still have queued writes
+    assets_db = util.vars.assets_db
 
     # Drop all rows for this user and exchange
-    updated_assets_db = assets_db.drop(
-        assets_db[
-            (assets_db["id"] == row["id"]) & (assets_db["exchange"] == exchange.id)
-        ].index
-    )
+    old_rows = assets_db[
+        (assets_db["id"] == row["id"]) & (assets_db["exchange"] == exchange.id)
+    ]
+    updated_assets_db = assets_db.drop(old_rows.index)
 
-    assets_db = pd.concat([updated_assets_db, await get_data(row)]).reset_index(
-        drop=True
-    )
+    new_rows = await get_data(row)
+    assets_db = pd.concat([updated_assets_db, new_rows]).reset_index(drop=True)
+
+    asset_index.remove_rows(old_rows)
+    asset_index.add_rows(new_rows)
 
     update_db(assets_db, "assets")
     util.vars.assets_db = assets_db
@@ -2,28 +2,23 @@
 # > Standard libaries
 from __future__ import annotations
 
+import asyncio
 import datetime
-from typing import List
+from typing import List, NamedTuple, Optional
 
 # Discord imports
 import discord
 import numpy as np
 
-# 3rd party imports
-import pandas as pd
-from discord.ext import commands
-
 import util.vars
 
 # Local dependencies
 from constants.logger import logger
 from constants.sources import data_sources
-from models.sentiment import add_sentiment
-from util.db import merge_and_update, remove_old_rows, update_tweet_db
+from util.db import update_classified_tickers
+from util.ticker_cache import ticker_cache
 from util.ticker_classifier import classify_ticker, get_financials
 
-tweet_overview = None
-
 # Replace key by value
 filter_dict = {
     "BITCOIN": "BTC",
@@ -40,79 +35,138 @@ filter_dict = {
 }
 
 
-async def make_tweet_embed(
-    text: str,
-    user_name: str,
-    profile_pic: str,
-    url: str,
-    images: List[str],
-    tickers: List[str],
-    hashtags: List[str],
-    e_title: str,
-    media_types: List[str],
-    bot: commands.Bot,
-) -> tuple[discord.Embed, str, str, list, list]:
+class SymbolInfo(NamedTuple):
+    symbol: str
+    website: Optional[str] = None
+    exchanges: Optional[list] = None
+    base_symbol: Optional[str] = None
+    # The price, change, 4h TA and 1d TA, None if they still have to be fetched
+    financials: Optional[tuple] = None
+    # The majority asset type so far, only set if the symbol could not be classified
+    majority: Optional[str] = None
+
+
+def get_symbols(tickers: List[str], hashtags: List[str]) -> tuple[List[str], List[str]]:
     """
-    Pre-processing the tweet data before uploading it to the Discord channels.
-    This function creates the embed object and tags the user after it is correctly uploaded.
+    Returns the unique symbols (tickers + hashtags) and the tickers, both at most 24 (max 25 fields).
+    """
+    # Ensure the tickers are unique
+    symbols = get_clean_symbols(tickers, hashtags)[:24]
+
+    # Check for difference
+    if symbols != tickers + hashtags:
+        logger.debug(
+            f"Removed following symbols: {set(tickers + hashtags) - set(symbols)}"
+        )
+
+    return symbols, tickers[:24]
+
+
+async def resolve_symbols(symbols: List[str], user: str) -> List[SymbolInfo]:
+    """
+    Finds the asset of every symbol, using the ticker cache or by classifying the symbol.
+    Symbols are classified in order, so the majority asset type of the symbols before it can be used.
 
     Parameters
     ----------
-        text : str
-            The text of the tweet.
-        user : str
-            The user that posted this tweet.
-        profile_pic : str
-            The url to the profile pic of the user.
-        url : str
-            The url to the tweet.
-        images : list
-            The images contained in this tweet.
-        tickers : list
-            The tickers contained in this tweet (i.e. $BTC).
-        hashtags : list
-            The hashtags contained in this tweet.
-        retweeted_user : str
-            The user that was retweeted by this tweet.
-        bot : commands.Bot
-            Discord bot object.
+    symbols : List[str]
+        The symbols (tickers + hashtags) in the tweet.
+    user : str
+        The user that tweeted.
 
     Returns
     -------
-    None
+    List[SymbolInfo]
+        The info of every symbol, symbols with the same base symbol are left out.
     """
+    # In case multiple tickers get send
+    crypto = stocks = 0
 
-    category = None
     base_symbols = []
+    infos = []
 
-    # Ensure the tickers are unique
-    symbols = get_clean_symbols(tickers, hashtags)[:24]
-    tickers = tickers[:24]
+    for symbol in symbols:
+        logger.debug(f"Symbol: {symbol}")
+        if crypto > stocks:
+            majority = "crypto"
+        elif stocks > crypto:
+            majority = "stocks"
+        else:
+            majority = "Unknown"
 
-    # Check for difference
-    if symbols != tickers + hashtags:
-        logger.debug(
-            f"Removed following symbols: {set(tickers + hashtags) - set(symbols)}"
-        )
+        # Get the information about the ticker, tickers expire after 3 days
+        ticker_info = ticker_cache.get(symbol)
+        if ticker_info is None:
+            logger.debug(f"Classifying ticker: {symbol} with majority: {majority}")
+            if symbol == "BTC":
+                majority = "crypto"
+            ticker_info = await classify_ticker(symbol, majority)
 
-    e = make_embed(
-        symbols=symbols,
-        url=url,
-        text=text,
-        profile_pic=profile_pic,
-        images=images,
-        e_title=e_title,
-        media_types=media_types,
-    )
+            if not ticker_info:
+                infos.append(SymbolInfo(symbol, majority=majority))
+                logger.debug(
+                    f"No crypto or stock match found for ${symbol} in {user}'s tweet at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}"
+                )
+                continue
+
+            (
+                _,
+                website,
+                exchanges,
+                price,
+                change,
+                four_h_ta,
+                one_d_ta,
+                base_symbol,
+            ) = ticker_info
+            logger.debug(
+                f"Classified ticker: {symbol} as {base_symbol}. Website: {website}"
+            )
+
+            # Skip if this ticker has been done before, for instance in tweets containing Solana and SOL
+            if base_symbol in base_symbols:
+                continue
 
-    # Max 25 fields
-    if symbols:
-        logger.debug(f"Adding financials for symbols: {symbols}")
-        e, category, base_symbols = await add_financials(
-            e=e, symbols=symbols, tickers=tickers, text=text, user=user_name, bot=bot
+            if exchanges is None:
+                exchanges = []
+                logger.warn(f"No exchanges found for ticker: {symbol}")
+
+            # Save the ticker info in the cache and database
+            update_classified_tickers(symbol, website, exchanges, base_symbol)
+            financials = (price, change, four_h_ta, one_d_ta)
+        else:
+            logger.debug(f"Found ticker {symbol} in previously classified tickers.")
+            website, exchanges, base_symbol, _ = ticker_info
+
+            # Still need the price, change, TA info
+            financials = None
+
+        # Add to base symbol list to prevent duplicates
+        base_symbols.append(base_symbol)
+        infos.append(
+            SymbolInfo(symbol, website, exchanges, base_symbol, financials=financials)
         )
 
-    return e, category, base_symbols
+        if website:
+            if "coingecko" in website or "BTC" in base_symbol:
+                crypto += 1
+            if "yahoo" in website:
+                stocks += 1
+
+    return infos
+
+
+async def enrich_symbols(infos: List[SymbolInfo]) -> List[SymbolInfo]:
+    """
+    Gets the price, change and TA of the symbols that were found in the ticker cache, concurrently.
+    """
+
+    async def enrich(info: SymbolInfo) -> SymbolInfo:
+        if info.majority is not None or info.financials is not None:
+            return info
+        return info._replace(financials=await get_financials(info.symbol, info.website))
+
+    return list(await asyncio.gather(*[enrich(info) for info in infos]))
 
 
 def make_embed(
@@ -162,14 +216,9 @@ def embed_title(e_title: str, tickers: list) -> str:
     return title
 
 
-async def add_financials(
-    e: discord.Embed,
-    symbols: List[str],
-    tickers: List[str],
-    text: str,
-    user: str,
-    bot: commands.Bot,
-) -> tuple[discord.Embed, str, List[str]]:
+def add_financials(
+    e: discord.Embed, infos: List[SymbolInfo], tickers: List[str]
+) -> tuple[discord.Embed, Optional[str], List[str], List[str], list]:
     """
     Adds the financial data to the embed and returns the corresponding category.
 
@@ -177,133 +226,47 @@ async def add_financials(
     ----------
     e : discord.Embed
         The embed to add the data to.
-    symbols : List[str]
-        The symbols (tickers + hashtags) in the tweet.
+    infos : List[SymbolInfo]
+        The resolved and enriched symbols in the tweet.
     tickers : List[str]
         The tickers in the tweet.
-    text : str
-        The text of the tweet.
-    user : str
-        The user that tweeted.
-    bot : commands.Bot
-        The bot object, used for getting the custom emojis.
 
     Returns
     -------
-    tuple[discord.Embed, str, str]
+    tuple[discord.Embed, Optional[str], List[str], List[str], list]
         discord.Embed
             The embed with the data added.
-        str
+        Optional[str]
             The category of the tweet.
         List[str]
             The base symbols of the tickers.
+        List[str]
+            The category of every base symbol.
+        list
+            The change of every base symbol.
     """
-    global tweet_overview
     logger.debug(
-        f"Adding financials to the embed. For symbols: {symbols}, tickers: {tickers}"
+        f"Adding financials to the embed. For symbols: {[info.symbol for info in infos]}, tickers: {tickers}"
     )
 
-    # In case multiple tickers get send
     crypto = stocks = 0
 
     base_symbols = []
     categories = []
     do_last = []
-    classified_tickers = []
     changes = []
 
-    if not util.vars.classified_tickers.empty:
-        # Drop tickers older than 3 days
-        util.vars.classified_tickers = remove_old_rows(util.vars.classified_tickers, 3)
-        classified_tickers = util.vars.classified_tickers["ticker"].tolist()
-
-    for symbol in symbols:
-        logger.debug(f"Symbol: {symbol}")
-        if crypto > stocks:
-            majority = "crypto"
-        elif stocks > crypto:
-            majority = "stocks"
-        else:
-            majority = "Unknown"
-
-        # Get the information about the ticker
-        if symbol not in classified_tickers:
-            logger.debug(f"Classifying ticker: {symbol} with majority: {majority}")
-            if symbol == "BTC":
-                majority = "crypto"
-            ticker_info = await classify_ticker(symbol, majority)
-
-            if ticker_info:
-                (
-                    _,
-                    website,
-                    exchanges,
-                    price,
-                    change,
-                    four_h_ta,
-                    one_d_ta,
-                    base_symbol,
-                ) = ticker_info
-                logger.debug(
-                    f"Classified ticker: {symbol} as {base_symbol}. Website: {website}"
-                )
-
-                # Skip if this ticker has been done before, for instance in tweets containing Solana and SOL
-                if base_symbol in base_symbols:
-                    continue
-
-                if exchanges is None:
-                    exchanges = []
-                    logger.warn(f"No exchanges found for ticker: {symbol}")
-
-                # Convert info to a dataframe
-                df = pd.DataFrame(
-                    [
-                        {
-                            "ticker": symbol,
-                            "website": website,
-                            # Db cannot handle lists, so we convert them to strings
-                            "exchanges": (
-                                ";".join(exchanges) if len(exchanges) > 0 else ""
-                            ),
-                            "base_symbol": base_symbol,
-                            "timestamp": datetime.datetime.now(),
-                        }
-                    ]
-                )
-
-                # Save the ticker info in a database
-                util.vars.classified_tickers = merge_and_update(
-                    util.vars.classified_tickers, df, "classified_tickers"
-                )
-
-            else:
-                if symbol in tickers:
-                    e.add_field(name=f"${symbol}", value=majority)
-                logger.debug(
-                    f"No crypto or stock match found for ${symbol} in {user}'s tweet at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}"
-                )
-
-                # Go to next in symbols
-                continue
-        else:
-            logger.debug(f"Found ticker {symbol} in previously classified tickers.")
-            ticker_info = util.vars.classified_tickers[
-                util.vars.classified_tickers["ticker"] == symbol
-            ]
-            website = ticker_info["website"].values[0]
-            exchanges = ticker_info["exchanges"].values[0]
-            # Convert string to list
-            exchanges = exchanges.split(";")
-            base_symbol = ticker_info["base_symbol"].values[0]
-
-            # Still need the price, change, TA info
-            price, change, four_h_ta, one_d_ta = await get_financials(symbol, website)
+    for info in infos:
+        if info.majority is not None:
+            if info.symbol in tickers:
+                e.add_field(name=f"${info.symbol}", value=info.majority)
+            continue
 
-        title = f"${symbol}"
+        price, change, four_h_ta, one_d_ta = info.financials
+        website = info.website
+        title = f"${info.symbol}"
 
-        # Add to base symbol list to prevent duplicates
-        base_symbols.append(base_symbol)
+        base_symbols.append(info.base_symbol)
 
         if isinstance(change, list) and len(change) == 1:
             changes.append(change[-1])
@@ -312,10 +275,10 @@ async def add_financials(
 
         # Determine if this is a crypto or stock
         if website:
-            if "coingecko" in website or "BTC" in base_symbol:
+            if "coingecko" in website or "BTC" in info.base_symbol:
                 crypto += 1
                 categories.append("crypto")
-                for x in exchanges:
+                for x in info.exchanges:
                     if x in util.vars.custom_emojis.keys():
                         title = f"{title} {util.vars.custom_emojis[x]}"
 
@@ -346,25 +309,13 @@ async def add_financials(
             name=title, value=get_description(change, price, website), inline=True
         )
 
-    # Finally add the sentiment to the embed
-    if base_symbols:  # or if categories:
-        e, prediction = add_sentiment(e, text)
-    else:
-        prediction = None
-
     # Decide the category of this tweet
     if crypto == 0 and stocks == 0:
         category = None
     else:
         category = ("crypto", "stocks")[np.argmax([crypto, stocks])]
 
-    # If there are base symbols, add them to the database
-    # Also post the overview of mentioned tickers
-    if base_symbols:
-        update_tweet_db(base_symbols, user, prediction, categories, changes)
-
-    # Return just the prediction without emoji
-    return e, category, base_symbols
+    return e, category, base_symbols, categories, changes
 
 
 def get_clean_symbols(tickers, hashtags):
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import bisect
+
+import pandas as pd
+
+
+class TweetIdStore:
+    """
+    Remembers which tweets were posted, so they are not posted again, also after a restart.
+    Tweets newer than the newest posted tweet (the high-water mark) are always new.
+    Older tweets can still show up, e.g. when the timeline is not sorted or a tweet failed,
+    so the ids of the last max_size posted tweets are kept as well.
+    Tweets older than all of the kept ids are considered posted.
+    """
+
+    def __init__(self, max_size: int = 1000) -> None:
+        self.max_size = max_size
+        self.high_water = 0
+
+        # The posted ids, sorted from old to new
+        self.ids: list[int] = []
+        self.id_set: set[int] = set()
+
+        # The tweets that are being processed, so they are not processed twice at the same time
+        self.claimed: set[int] = set()
+
+    def is_new(self, tweet_id: int) -> bool:
+        """
+        Returns whether the tweet has not been posted and is not being processed.
+        """
+        if tweet_id in self.id_set or tweet_id in self.claimed:
+            return False
+
+        if tweet_id > self.high_water:
+            return True
+
+        # The tweet is older than the newest posted tweet, but not older than all posted tweets
+        return not self.ids or tweet_id > self.ids[0]
+
+    def claim(self, tweet_id: int) -> bool:
+        """
+        Claims the tweet for processing, returns False if it was already posted or claimed.
+        """
+        if not self.is_new(tweet_id):
+            return False
+        self.claimed.add(tweet_id)
+        return True
+
+    def release_claims(self) -> None:
+        """
+        Forgets the claims of tweets that were not posted, so they are tried again.
+        """
+        self.claimed.clear()
+
+    def add(self, tweet_id: int) -> None:
+        """
+        Marks the tweet as posted, only the newest max_size ids are kept.
+        """
+        self.claimed.discard(tweet_id)
+        if tweet_id in self.id_set:
+            return
+
+        bisect.insort(self.ids, tweet_id)
+        self.id_set.add(tweet_id)
+        self.high_water = max(self.high_water, tweet_id)
+
+        if len(self.ids) > self.max_size:
+            removed = self.ids[: len(self.ids) - self.max_size]
+            del self.ids[: len(removed)]
+            self.id_set.difference_update(removed)
+
+    def load(self, db: pd.DataFrame) -> None:
+        """
+        Fills the store with the rows of the tweet_ids table.
+        """
+        if db.empty:
+            return
+
+        for tweet_id in db["id"].dropna():
+            self.add(int(tweet_id))
+
+
+tweet_ids = TweetIdStore()
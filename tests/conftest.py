@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+import pytest
+
+
+def pytest_sessionstart(session):
+    # The bot is started from the root of the repository and writes its logs, temporary
+    # files and data there, so the tests run in an empty folder with the same layout
+    workdir = tempfile.mkdtemp(prefix="fintwit-tests-")
+    for folder in ["logs", "temp", "data"]:
+        os.makedirs(os.path.join(workdir, folder), exist_ok=True)
+    os.chdir(workdir)
+
+
+@pytest.fixture
+def db_manager(tmp_path, monkeypatch):
+    """
+    A DBManager that saves the tables in a temporary folder instead of data/.
+    """
+    import util.db
+
+    monkeypatch.setattr(
+        util.db,
+        "get_db_location",
+        lambda database_name: str(tmp_path / f"{database_name}.db"),
+    )
+    manager = util.db.DBManager()
+    monkeypatch.setattr(util.db, "db_manager", manager)
+    yield manager
+
+    # A batch can still be committing if the test did not flush
+    manager.executor.shutdown()
+    for cnx in [*manager.connections.values(), *manager.read_connections.values()]:
+        cnx.close()
@@ -0,0 +1,190 @@
+import asyncio
+import time
+from io import BytesIO
+
+import timm
+from PIL import Image
+from timm.data import create_transform, resolve_data_config
+
+from models.chart import ChartClassifier, CustomImagePipeline
+
+# The image files behind the URLs, the retweet has the same image as the first tweet
+IMAGES = {
+    f"https://pbs.twimg.com/media/{i}.jpg": f"chart {i}".encode() for i in range(10)
+}
+IMAGES["https://pbs.twimg.com/media/retweet.jpg"] = b"chart 0"
+IMAGES["https://pbs.twimg.com/media/meme.jpg"] = b"meme"
+IMAGES["https://pbs.twimg.com/media/broken.jpg"] = b"broken"
+
+
+class StubPipeline:
+    """
+    Labels an image "chart" if its file starts with b"chart", else "non-chart".
+    """
+
+    def __init__(self) -> None:
+        self.preprocessed: list[bytes] = []
+        self.batches: list[list[bytes]] = []
+
+    def preprocess(self, image: bytes) -> bytes:
+        if image == b"broken":
+            raise ValueError("cannot identify image file")
+        self.preprocessed.append(image)
+        return image
+
+    def predict(self, inputs: list[bytes]) -> list[dict]:
+        self.batches.append(inputs)
+        return [
+            (
+                {"chart": 0.9, "non-chart": 0.1}
+                if image.startswith(b"chart")
+                else {"chart": 0.2, "non-chart": 0.8}
+            )
+            for image in inputs
+        ]
+
+
+def make_classifier() -> tuple[ChartClassifier, StubPipeline, list[str]]:
+    pipeline = StubPipeline()
+    classifier = ChartClassifier(max_batch_size=16, pipeline=pipeline)
+    downloads = []
+
+    async def download(url: str) -> bytes:
+        downloads.append(url)
+        await asyncio.sleep(0.001)
+        return IMAGES[url]
+
+    classifier.download = download
+    return classifier, pipeline, downloads
+
+
+def test_the_images_of_a_tweet_are_one_batch():
+    classifier, pipeline, downloads = make_classifier()
+    urls = [f"https://pbs.twimg.com/media/{i}.jpg" for i in range(10)]
+
+    labels = asyncio.run(classifier.classify_many(urls))
+
+    assert labels == ["chart"] * 10
+    assert len(downloads) == 10
+    assert [len(batch) for batch in pipeline.batches] == [10]
+    assert classifier.metrics()["batches"] == 1
+
+
+def test_labels_are_cached_by_url_and_hash():
+    classifier, pipeline, downloads = make_classifier()
+
+    async def main():
+        first = await classifier.classify_many(
+            [
+                "https://pbs.twimg.com/media/0.jpg",
+                "https://pbs.twimg.com/media/meme.jpg",
+            ]
+        )
+        # The same tweet again is served from the URL cache
+        again = await classifier.classify_many(
+            [
+                "https://pbs.twimg.com/media/0.jpg",
+                "https://pbs.twimg.com/media/meme.jpg",
+            ]
+        )
+        # The same image under another URL is served from the SHA-1 cache
+        retweet = await classifier.classify("https://pbs.twimg.com/media/retweet.jpg")
+        return first, again, retweet
+
+    first, again, retweet = asyncio.run(main())
+
+    assert first == again == ["chart", "non-chart"]
+    assert retweet == "chart"
+    assert downloads == [
+        "https://pbs.twimg.com/media/0.jpg",
+        "https://pbs.twimg.com/media/meme.jpg",
+        "https://pbs.twimg.com/media/retweet.jpg",
+    ]
+    # Only the first two images were classified
+    assert pipeline.preprocessed == [b"chart 0", b"meme"]
+    metrics = classifier.metrics()
+    assert (metrics["url_hits"], metrics["hash_hits"], metrics["items"]) == (2, 1, 2)
+
+    # The retweet URL is now in the URL cache as well
+    assert asyncio.run(classifier.classify("https://pbs.twimg.com/media/retweet.jpg"))
+    assert len(downloads) == 3
+
+
+def test_a_broken_image_does_not_fail_the_others():
+    classifier, pipeline, _ = make_classifier()
+    urls = [
+        "https://pbs.twimg.com/media/1.jpg",
+        "https://pbs.twimg.com/media/broken.jpg",
+        "https://pbs.twimg.com/media/meme.jpg",
+    ]
+
+    labels = asyncio.run(classifier.classify_many(urls))
+
+    assert labels == ["chart", "", "non-chart"]
+    assert [len(batch) for batch in pipeline.batches] == [2]
+
+
+def make_pipeline() -> CustomImagePipeline:
+    """
+    An untrained timm model, the weights do not change how long it takes to classify an image.
+    """
+    model = timm.create_model("efficientnet_b0", pretrained=False, num_classes=2)
+    model.eval()
+    transform = create_transform(**resolve_data_config({}, model=model))
+    return CustomImagePipeline(model, transform, ["chart", "non-chart"])
+
+
+def tweet_images() -> list[bytes]:
+    """
+    The 10 images of a tweet, as PNG files of 1200x675 like most screenshots of charts.
+    """
+    images = []
+    for i in range(10):
+        file = BytesIO()
+        Image.effect_noise((1200, 675), 20 + i).convert("RGB").save(file, "PNG")
+        images.append(file.getvalue())
+    return images
+
+
+def test_batched_tweet_throughput():
+    pipeline = make_pipeline()
+    images = tweet_images()
+    urls = [f"https://pbs.twimg.com/media/{i}.jpg" for i in range(10)]
+    pipeline(images[0])
+
+    def per_image(download_time: float) -> tuple[float, list[str]]:
+        # The old path, every image is downloaded and classified on its own
+        start = time.perf_counter()
+        labels = []
+        for image in images:
+            time.sleep(download_time)
+            probabilities = pipeline(image)
+            labels.append(max(probabilities, key=probabilities.get))
+        return time.perf_counter() - start, labels
+
+    def batched(download_time: float) -> tuple[float, list[str]]:
+        classifier = ChartClassifier(pipeline=pipeline)
+
+        async def download(url: str) -> bytes:
+            await asyncio.sleep(download_time)
+            return images[urls.index(url)]
+
+        classifier.download = download
+
+        async def main():
+            start = time.perf_counter()
+            labels = await classifier.classify_many(urls)
+            return time.perf_counter() - start, labels
+
+        return asyncio.run(main())
+
+    old, old_labels = per_image(0)
+    new, new_labels = batched(0)
+    assert new_labels == old_labels
+    # On a single CPU a batch does not classify faster than the same images one by one
+    assert new < old * 1.5
+
+    # With the downloads, which are done at the same time
+    old, _ = per_image(0.05)
+    new, _ = batched(0.05)
+    assert new < old - 0.2
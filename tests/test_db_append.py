@@ -0,0 +1,141 @@
+import asyncio
+import datetime
+import time
+
+import pandas as pd
+import pytest
+
+import util.db
+from util.db import (
+    append_rows,
+    insert_rows,
+    update_classified_tickers,
+    update_db,
+    update_tweet_db,
+    upsert_rows,
+)
+
+
+def fill_table(db_manager, database_name: str, rows: int) -> None:
+    """
+    Stores the given number of recent rows in the table.
+    """
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    columns = list(util.db.SCHEMAS[database_name])
+    values = []
+    for i in range(rows):
+        row = {column: f"{column}{i}" for column in columns}
+        row["timestamp"] = timestamp
+        values.append(tuple(row[column] for column in columns))
+    db_manager.run_batch(
+        [(database_name, insert_rows, (database_name, columns, values))]
+    )
+
+
+def changes(db_manager, database_name: str, func) -> tuple[int, float]:
+    """
+    Returns the number of rows that func inserted, updated or deleted and how long it took.
+    """
+    cnx = db_manager.connection(database_name)
+    before = cnx.total_changes
+    start = time.perf_counter()
+    func()
+    return cnx.total_changes - before, time.perf_counter() - start
+
+
+def add_tweet() -> None:
+    update_tweet_db(["BTC"], "user", "🐂", ["crypto"], ["+1.00% 📈"])
+
+
+def add_classified_ticker() -> None:
+    update_classified_tickers("ETH", "https://www.coingecko.com", ["binance"], "ETH")
+
+
+def add_reddit_id() -> None:
+    append_rows(
+        pd.DataFrame([{"id": "new", "timestamp": datetime.datetime.now()}]),
+        "reddit_ids",
+    )
+
+
+@pytest.mark.parametrize(
+    "database_name, add",
+    [
+        ("tweets", add_tweet),
+        ("classified_tickers", add_classified_ticker),
+        ("reddit_ids", add_reddit_id),
+    ],
+)
+def test_write_cost_does_not_grow_with_table_size(db_manager, database_name, add):
+    # Without a running event loop the writes are done immediately
+    written = {}
+    for size in [100, 20_000]:
+        fill_table(db_manager, database_name, size)
+        written[size] = changes(db_manager, database_name, add)
+        db_manager.connection(database_name).execute(f"DELETE FROM {database_name}")
+
+    # Only the new row is written, no matter how many rows are stored
+    assert written[100][0] == written[20_000][0] == 1
+    # Generous bound for slow machines, rewriting 20,000 rows is far slower than this
+    assert written[20_000][1] < max(10 * written[100][1], 0.05)
+
+
+def test_replacing_the_table_writes_every_row(db_manager):
+    fill_table(db_manager, "tweets", 1_000)
+    db = util.db.get_db("tweets")
+
+    written, _ = changes(db_manager, "tweets", lambda: update_db(db, "tweets"))
+
+    # The old way, dropping the table and inserting all rows again
+    assert written == 1_000
+
+
+def test_adding_a_tweet_does_not_delete_rows(db_manager, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(
+        db_manager, "submit", lambda name, func, *args: submitted.append(func)
+    )
+
+    for _ in range(10):
+        add_tweet()
+        add_classified_ticker()
+
+    # No deletes of old rows, the retention is done by the loop of the DB cog
+    assert submitted == [insert_rows, upsert_rows] * 10
+
+
+def test_a_ticker_classified_twice_is_stored_once(db_manager):
+    update_classified_tickers("ETH", "https://www.coingecko.com", ["binance"], "ETH")
+    update_classified_tickers("BTC", "https://www.coingecko.com", ["binance"], "BTC")
+    update_classified_tickers(
+        "ETH", "https://www.coingecko.com", ["binance", "kucoin"], "ETH"
+    )
+
+    stored = util.db.get_db("classified_tickers").set_index("ticker")
+    assert sorted(stored.index) == ["BTC", "ETH"]
+    assert stored.loc["ETH", "exchanges"] == "binance;kucoin"
+
+
+def test_expired_rows_are_removed_by_the_db_loop(db_manager):
+    now = datetime.datetime.now()
+    for database_name, days in [("tweets", 1), ("classified_tickers", 3)]:
+        columns = list(util.db.SCHEMAS[database_name])
+        rows = []
+        for age in [days + 1, days - 0.5]:
+            row = {column: None for column in columns}
+            row["timestamp"] = (now - datetime.timedelta(days=age)).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+            rows.append(tuple(row[column] for column in columns))
+        db_manager.run_batch(
+            [(database_name, insert_rows, (database_name, columns, rows))]
+        )
+
+    async def run_loop():
+        await util.db.DB.remove_expired_rows.coro(None)
+        await db_manager.flush()
+
+    asyncio.run(run_loop())
+
+    for database_name in ["tweets", "classified_tickers"]:
+        assert len(util.db.get_db(database_name)) == 1
@@ -0,0 +1,203 @@
+import asyncio
+import gc
+import importlib
+import json
+import math
+import sys
+import threading
+import time
+from typing import Any
+
+import orjson
+import pytest
+
+import api.json_decoder
+from api.json_decoder import OFFLOAD_SIZE, assemble, decode_json
+from api.json_split import split_json
+
+# Shaped like the CoinGecko coins list, one of the largest responses (several MB)
+COINS = json.dumps(
+    [
+        {
+            "id": f"coin-{i}",
+            "symbol": f"c{i}",
+            "name": f"Coin {i}",
+            "platforms": {"ethereum": f"0x{i:040x}"},
+        }
+        for i in range(40_000)
+    ]
+)
+
+
+def round_trip(body: str, piece_size: int = 1_000):
+    strict, pieces = split_json(body, piece_size)
+    return asyncio.run(assemble(strict, pieces)), pieces
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        # A large list inside a dict, like {"data": [...]}
+        {"status": "ok", "data": [{"id": i, "name": "é" * 10} for i in range(500)]},
+        # A large item between small items, at every level
+        [1, {"big": ["x" * 50] * 100, "small": 2}, [[3] * 400], "end"],
+        {"a": {"b": {"c": list(range(1_000))}}, "d": 2**70},
+        "just a string",
+        [],
+    ],
+)
+def test_the_pieces_are_put_back_together(value):
+    decoded, pieces = round_trip(json.dumps(value))
+
+    assert decoded == value
+    # No piece is much larger than the piece size, except for single items
+    assert all(len(data) < 2_000 for kind, _, data in pieces if kind != "new"), pieces
+
+
+def test_nan_is_put_back_together_with_json():
+    body = json.dumps({"prices": [float("nan")] + list(range(500))})
+    strict, _ = split_json(body, 1_000)
+    decoded, _ = round_trip(body)
+
+    assert not strict
+    assert math.isnan(decoded["prices"][0])
+    assert decoded["prices"][1:] == list(range(500))
+
+
+def test_large_bodies_are_decoded_in_another_process(monkeypatch):
+    threads = []
+
+    def record(body):
+        threads.append(threading.current_thread())
+        return json.loads(body)
+
+    monkeypatch.setattr(api.json_decoder, "loads", record)
+
+    small = json.dumps({"symbol": "BTC"})
+    large = json.dumps({"data": ["x" * 100] * (OFFLOAD_SIZE // 100)})
+
+    async def main():
+        return await decode_json(small), await decode_json(large)
+
+    decoded_small, decoded_large = asyncio.run(main())
+
+    assert decoded_small == {"symbol": "BTC"}
+    assert decoded_large == json.loads(large)
+    # Only the small body was decoded in this process
+    assert threads == [threading.main_thread()]
+
+
+def test_invalid_large_bodies_raise():
+    with pytest.raises(json.JSONDecodeError):
+        asyncio.run(decode_json('{"data": ' + "x" * OFFLOAD_SIZE))
+
+
+class CollectionTimer:
+    """
+    Adds up the time spent in garbage collections. Full collections stall the event loop
+    whatever decodes the body, as they scale with the number of objects it has.
+    """
+
+    def __init__(self) -> None:
+        self.total = 0.0
+        self.start = 0.0
+
+    def __call__(self, phase: str, info: dict) -> None:
+        if phase == "start":
+            self.start = time.perf_counter()
+        else:
+            self.total += time.perf_counter() - self.start
+
+    def __enter__(self) -> "CollectionTimer":
+        gc.callbacks.append(self)
+        return self
+
+    def __exit__(self, *args) -> None:
+        gc.callbacks.remove(self)
+
+
+async def loop_lag(decode, body: str) -> tuple[float, float, Any]:
+    """
+    Returns the longest stall of the event loop while the body is decoded,
+    with and without the time spent in garbage collections.
+    """
+    lag = 0.0
+    lag_without_gc = 0.0
+    done = False
+
+    async def tick():
+        nonlocal lag, lag_without_gc
+        while not done:
+            start = time.perf_counter()
+            collections = timer.total
+            await asyncio.sleep(0.005)
+            stall = time.perf_counter() - start - 0.005
+            lag = max(lag, stall)
+            lag_without_gc = max(lag_without_gc, stall - (timer.total - collections))
+
+    with CollectionTimer() as timer:
+        ticker = asyncio.create_task(tick())
+        await asyncio.sleep(0.01)
+        try:
+            decoded = await decode(body)
+        finally:
+            done = True
+            await ticker
+    return lag, lag_without_gc, decoded
+
+
+def test_large_bodies_do_not_block_the_event_loop():
+    async def orjson_in_thread(body):
+        return await asyncio.to_thread(orjson.loads, body)
+
+    # Large enough that the stall of orjson stands out from the scheduling noise
+    body = "[" + ",".join([COINS] * 3) + "]"
+
+    async def main():
+        # The process is started before measuring, like it would be after the first decode
+        await decode_json(body)
+        return await loop_lag(orjson_in_thread, body), await loop_lag(decode_json, body)
+
+    (_, old_without_gc, old), (_, new_without_gc, new) = asyncio.run(main())
+
+    assert new == old
+    # orjson keeps the GIL for the whole body, even in a thread,
+    # the pieces are small and what is left is mostly waiting for the CPU of the other process
+    assert new_without_gc < 0.1
+    assert new_without_gc < old_without_gc * 2
+
+
+@pytest.fixture
+def without_orjson(monkeypatch):
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    importlib.reload(api.json_split)
+    importlib.reload(api.json_decoder)
+    yield api.json_decoder
+    monkeypatch.undo()
+    importlib.reload(api.json_split)
+    importlib.reload(api.json_decoder)
+
+
+def test_json_is_used_without_orjson(without_orjson):
+    assert without_orjson.orjson is None
+    assert without_orjson.loads is json.loads
+
+    body = '{"price": NaN, "symbol": "BTC"}'
+    decoded = asyncio.run(without_orjson.decode_json(body))
+    assert decoded["symbol"] == "BTC"
+
+    large = json.dumps({"data": list(range(OFFLOAD_SIZE // 5))})
+    strict, pieces = api.json_split.split_json(large)
+    assert not strict
+    assert asyncio.run(without_orjson.assemble(strict, pieces)) == json.loads(large)
+
+    with pytest.raises(json.JSONDecodeError):
+        asyncio.run(without_orjson.decode_json("{"))
+
+
+def test_orjson_falls_back_to_json_for_nan():
+    # orjson does not accept NaN, which some APIs return
+    assert api.json_decoder.orjson_loads('{"price": NaN}')["price"] != 0
+
+    with pytest.raises(json.JSONDecodeError):
+        api.json_decoder.orjson_loads("{")
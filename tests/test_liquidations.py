@@ -0,0 +1,105 @@
+import asyncio
+import datetime
+import os
+import time
+import zipfile
+from io import BytesIO
+
+import api.binance
+from api.binance import get_new_data
+
+DAYS = 30
+
+
+# A liquidation snapshot with the size of a busy day
+ROWS = "\n".join(
+    ["time,side,original_quantity,average_price"]
+    + [f"{1700000000000 + i},BUY,0.5,{40000 + i % 100}" for i in range(20_000)]
+)
+
+
+def make_zip(date: str) -> bytes:
+    content = BytesIO()
+    with zipfile.ZipFile(content, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr(f"BTCUSDT-liquidationSnapshot-{date}.csv", ROWS)
+    return content.getvalue()
+
+
+class StubResponse:
+    def __init__(self, content: bytes) -> None:
+        self.content = content
+
+    async def __aenter__(self) -> "StubResponse":
+        # The download itself
+        await asyncio.sleep(0.02)
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    def raise_for_status(self) -> None:
+        pass
+
+    async def read(self) -> bytes:
+        return self.content
+
+
+class StubSession:
+    def __init__(self, dates: list[str]) -> None:
+        self.urls = []
+        # Made up front, so only the work of the bot runs on the event loop
+        self.files = {date: make_zip(date) for date in dates}
+
+    def get(self, url: str) -> StubResponse:
+        self.urls.append(url)
+        date = url.split("liquidationSnapshot-")[-1].split(".")[0]
+        return StubResponse(self.files[date])
+
+
+def test_backfill_keeps_the_event_loop_responsive(tmp_path, monkeypatch):
+    dates = [
+        (datetime.date(2024, 1, 1) + datetime.timedelta(days=i)).isoformat()
+        for i in range(DAYS)
+    ]
+    session = StubSession(dates)
+
+    async def get_existing_files() -> list[str]:
+        prefix = "data/futures/um/daily/liquidationSnapshot/BTCUSDT/"
+        return [f"{prefix}BTCUSDT-liquidationSnapshot-{date}.zip" for date in dates]
+
+    async def get_session() -> StubSession:
+        return session
+
+    monkeypatch.setattr(api.binance, "get_existing_files", get_existing_files)
+    monkeypatch.setattr(api.binance, "get_session", get_session)
+
+    async def main():
+        lag = 0.0
+        done = False
+
+        async def tick():
+            nonlocal lag
+            while not done:
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lag = max(lag, time.perf_counter() - start - 0.01)
+
+        ticker = asyncio.create_task(tick())
+        try:
+            new_data = await get_new_data("BTCUSDT", "um", str(tmp_path))
+        finally:
+            done = True
+            await ticker
+        return new_data, lag
+
+    new_data, lag = asyncio.run(main())
+
+    assert new_data == set(dates)
+    assert len(session.urls) == DAYS
+    assert len(os.listdir(tmp_path / "BTCUSDT" / "um")) == DAYS
+    assert lag < 0.1
+
+    # The downloaded days are not downloaded again
+    session.urls.clear()
+    assert asyncio.run(get_new_data("BTCUSDT", "um", str(tmp_path))) == set()
+    assert session.urls == []
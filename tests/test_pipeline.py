@@ -0,0 +1,105 @@
+import asyncio
+
+from util.pipeline import Pipeline, Stage, close_pipelines, running_pipelines
+
+
+def make_pipeline(delays: dict, posted: list, drop: set = frozenset()) -> Pipeline:
+    async def slow(item: int):
+        # Items finish in a different order than they were put in the pipeline
+        await asyncio.sleep(delays.get(item, 0))
+        return None if item in drop else item
+
+    async def fail_on_three(item: int):
+        if item == 3:
+            raise ValueError("broken tweet")
+        return item
+
+    async def post(item: int) -> None:
+        posted.append(item)
+
+    return Pipeline(
+        "test",
+        [
+            Stage("slow", slow, workers=8),
+            Stage("check", fail_on_three, workers=2),
+            Stage("post", post, workers=1),
+        ],
+    )
+
+
+def test_output_keeps_the_input_order():
+    posted = []
+    # The first items take the longest
+    delays = {item: 0.01 * (8 - item) for item in range(8)}
+    pipeline = make_pipeline(delays, posted, drop={5})
+
+    async def main():
+        pipeline.start()
+        for item in range(8):
+            await pipeline.put(item)
+        await pipeline.join()
+        await pipeline.close()
+
+    asyncio.run(main())
+
+    # 3 failed and 5 was dropped, they do not hold up the items behind them
+    assert posted == [0, 1, 2, 4, 6, 7]
+    stages = pipeline.metrics()["stages"]
+    assert stages["slow"]["dropped"] == 1
+    assert stages["check"]["errors"] == 1
+    assert stages["post"]["processed"] == 6
+    assert pipeline.metrics()["waiting_for_order"] == 0
+
+
+def test_backpressure_limits_the_queue():
+    posted = []
+    pipeline = Pipeline(
+        "test",
+        [
+            Stage("slow", lambda item: asyncio.sleep(0.01, item), 1, maxsize=2),
+            Stage("post", lambda item: asyncio.sleep(0, posted.append(item)), 1),
+        ],
+    )
+    depths = []
+
+    async def main():
+        pipeline.start()
+        for item in range(10):
+            await pipeline.put(item)
+            depths.append(pipeline.stages[0].queue.qsize())
+        await pipeline.join()
+        await pipeline.close()
+
+    asyncio.run(main())
+
+    assert posted == list(range(10))
+    assert max(depths) <= 2
+
+
+def test_close_stops_the_workers():
+    posted = []
+    pipeline = make_pipeline({item: 10 for item in range(4)}, posted)
+
+    async def main():
+        pipeline.start()
+        tasks = list(pipeline.tasks)
+        for item in range(4):
+            await pipeline.put(item)
+        await asyncio.sleep(0.01)
+
+        assert pipeline in running_pipelines
+        await close_pipelines()
+        assert all(task.done() for task in tasks)
+        assert pipeline not in running_pipelines
+        assert not pipeline.started
+
+        # The pipeline starts again with empty queues
+        pipeline.start()
+        pipeline.stages[0].func = lambda item: asyncio.sleep(0, item)
+        await pipeline.put(10)
+        await pipeline.join()
+        await pipeline.close()
+
+    asyncio.run(main())
+
+    assert posted == [10]
@@ -0,0 +1,163 @@
+import asyncio
+import os
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import api.http_client
+import api.response_cache
+from api.http_client import SessionManager, request
+from api.response_cache import CachedResponse, ResponseCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """
+    A response cache that keeps its files in a temporary folder.
+    """
+    monkeypatch.setattr(api.response_cache, "cache_dir", str(tmp_path / "http_cache"))
+    cache = ResponseCache()
+    monkeypatch.setattr(api.http_client, "response_cache", cache)
+    return cache
+
+
+class Server:
+    """
+    Serves a JSON body with an ETag, answers 304 if the client has the same version.
+    """
+
+    def __init__(self) -> None:
+        self.version = 1
+        self.requests: list[dict] = []
+
+        app = web.Application()
+        app.router.add_get("/coins", self.handle)
+        self.server = TestServer(app)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests.append(dict(request.headers))
+        etag = f'"v{self.version}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.json_response({"version": self.version}, headers={"ETag": etag})
+
+
+def run(test, monkeypatch):
+    async def main():
+        server = Server()
+        await server.server.start_server()
+        manager = SessionManager()
+        monkeypatch.setattr(api.http_client, "session_manager", manager)
+        try:
+            await test(server, str(server.server.make_url("/coins")))
+        finally:
+            await manager.close()
+            await server.server.close()
+
+    asyncio.run(main())
+
+
+def test_fresh_responses_are_hits(cache, monkeypatch):
+    async def test(server, url):
+        assert await request("GET", url, cache_ttl=60) == {"version": 1}
+        server.version = 2
+        # Served from the cache, the new version is not requested
+        assert await request("GET", url, cache_ttl=60) == {"version": 1}
+        assert len(server.requests) == 1
+
+    run(test, monkeypatch)
+
+    assert cache.metrics() == {"127.0.0.1": {"hits": 1, "misses": 1, "revalidated": 0}}
+
+
+def test_expired_responses_are_revalidated(cache, monkeypatch):
+    async def test(server, url):
+        assert await request("GET", url, cache_ttl=0) == {"version": 1}
+
+        # Not modified, the cached body is used
+        assert await request("GET", url, cache_ttl=0) == {"version": 1}
+        assert server.requests[1]["If-None-Match"] == '"v1"'
+
+        # Modified, the new body is downloaded and cached
+        server.version = 2
+        assert await request("GET", url, cache_ttl=0) == {"version": 2}
+        assert server.requests[2]["If-None-Match"] == '"v1"'
+        assert await request("GET", url, cache_ttl=0) == {"version": 2}
+        assert server.requests[3]["If-None-Match"] == '"v2"'
+
+    run(test, monkeypatch)
+
+    assert cache.metrics() == {"127.0.0.1": {"hits": 0, "misses": 2, "revalidated": 2}}
+
+
+def test_responses_survive_a_restart(cache, monkeypatch):
+    async def test(server, url):
+        await request("GET", url, cache_ttl=60)
+
+        # The memory tier is empty after a restart
+        restarted = ResponseCache()
+        monkeypatch.setattr(api.http_client, "response_cache", restarted)
+        assert await request("GET", url, cache_ttl=60) == {"version": 1}
+        assert restarted.metrics()["127.0.0.1"]["hits"] == 1
+
+    run(test, monkeypatch)
+
+
+def put(cache: ResponseCache, key: str, size: int) -> None:
+    entry = CachedResponse(f"https://example.com/{key}", "x" * size, time.time())
+    asyncio.run(cache.put(key, entry))
+
+
+def test_least_recently_used_files_are_evicted(cache):
+    # Every file is a bit more than 1,000 bytes
+    cache.max_disk_bytes = 3_500
+    for key in ["a", "b", "c"]:
+        put(cache, key, 1_000)
+
+    # "a" is used, so "b" is the least recently used file
+    cache.memory.clear()
+    assert asyncio.run(cache.get("a")) is not None
+    put(cache, "d", 1_000)
+
+    assert sorted(os.listdir(api.response_cache.cache_dir)) == [
+        "a.json",
+        "c.json",
+        "d.json",
+    ]
+    assert list(cache.disk) == ["c", "a", "d"]
+    assert cache.disk_size <= cache.max_disk_bytes
+
+    # The same order after a restart
+    restarted = ResponseCache()
+    restarted.max_disk_bytes = 2_500
+    put(restarted, "e", 1_000)
+    assert sorted(os.listdir(api.response_cache.cache_dir)) == ["d.json", "e.json"]
+
+
+def test_unused_files_are_removed(cache):
+    put(cache, "old", 10)
+    put(cache, "recent", 10)
+
+    # "old" was last used 8 days ago
+    week_ago = time.time() - 8 * 24 * 60 * 60
+    os.utime(cache.get_path("old"), (week_ago, week_ago))
+
+    restarted = ResponseCache()
+    put(restarted, "new", 10)
+
+    assert sorted(os.listdir(api.response_cache.cache_dir)) == [
+        "new.json",
+        "recent.json",
+    ]
+    assert asyncio.run(restarted.get("old")) is None
+
+
+def test_memory_tier_is_capped(cache):
+    cache.max_bytes = 2_500
+    for key in ["a", "b", "c"]:
+        put(cache, key, 1_000)
+
+    assert list(cache.memory) == ["b", "c"]
+    assert cache.size == 2_000
@@ -0,0 +1,174 @@
+import asyncio
+import random
+import threading
+import time
+
+import pandas as pd
+from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+import models.sentiment
+from models.sentiment import SentimentResult, SentimentService
+
+
+class StubModel:
+    """
+    Labels a text BULLISH if it contains "moon", BEARISH if it contains "dump", else NEUTRAL.
+    """
+
+    def __init__(self, fail_on: str = None) -> None:
+        self.fail_on = fail_on
+        self.batches: list[list[str]] = []
+        self.threads = set()
+
+    def predict(self, texts: list[str]) -> list[SentimentResult]:
+        self.batches.append(texts)
+        self.threads.add(threading.current_thread().name)
+        if self.fail_on is not None and self.fail_on in texts:
+            raise RuntimeError("out of memory")
+
+        results = []
+        for text in texts:
+            label = "BULLISH" if "moon" in text else "NEUTRAL"
+            label = "BEARISH" if "dump" in text else label
+            probabilities = {"NEUTRAL": 0.0, "BULLISH": 0.0, "BEARISH": 0.0}
+            probabilities[label] = 1.0
+            results.append(SentimentResult(label, probabilities))
+        return results
+
+
+def test_concurrent_texts_are_classified_in_batches():
+    stub = StubModel()
+    texts = [f"$BTC to the moon {i}" if i % 3 else f"dump it {i}" for i in range(30)]
+
+    async def main():
+        service = SentimentService(max_batch_size=8, predict=stub.predict)
+        # Texts from different callers at the same time
+        results = await asyncio.gather(*[service.classify(text) for text in texts])
+        return results, service.metrics()
+
+    results, metrics = asyncio.run(main())
+
+    assert [len(batch) for batch in stub.batches] == [8, 8, 8, 6]
+    # Every caller gets the result of its own text
+    assert [text for batch in stub.batches for text in batch] == texts
+    assert [result.label for result in results] == [
+        "BULLISH" if i % 3 else "BEARISH" for i in range(30)
+    ]
+    assert results[1].emoji == "🐂" and results[1].score == 1.0
+    assert stub.threads == {"sentiment_0"}
+    assert metrics == {
+        "batches": 4,
+        "items": 30,
+        "avg_batch_size": 7.5,
+        "waiting": 0,
+    }
+
+
+def test_texts_are_preprocessed_and_waited_for():
+    stub = StubModel()
+
+    async def main():
+        service = SentimentService(max_wait_ms=50, predict=stub.predict)
+        first = asyncio.create_task(service.classify("@trader https://x.com/a moon"))
+        await asyncio.sleep(0.01)
+        # Arrives before the batch is full or the wait is over
+        second = await service.classify("hold")
+        return await first, second
+
+    first, second = asyncio.run(main())
+
+    assert stub.batches == [["@USER [URL] moon", "hold"]]
+    assert (first.label, second.label) == ("BULLISH", "NEUTRAL")
+
+
+def test_a_failed_batch_fails_only_its_callers():
+    stub = StubModel(fail_on="crash")
+
+    async def main():
+        service = SentimentService(max_batch_size=2, predict=stub.predict)
+        return await asyncio.gather(
+            *[service.classify(text) for text in ["crash", "moon", "dump"]],
+            return_exceptions=True,
+        )
+
+    first, second, third = asyncio.run(main())
+
+    assert isinstance(first, RuntimeError) and isinstance(second, RuntimeError)
+    assert third.label == "BEARISH"
+
+
+def test_headlines_are_scored_by_the_service(monkeypatch):
+    import cogs.commands.sentiment
+
+    stub = StubModel()
+    service = SentimentService(predict=stub.predict)
+    monkeypatch.setattr(cogs.commands.sentiment, "sentiment_service", service)
+
+    async def get_finviz_data(ticker: str) -> pd.DataFrame:
+        return pd.DataFrame(
+            {"Date": ["Today 09:30AM"] * 3, "Headline": ["moon", "dump", "flat"]}
+        )
+
+    cog = cogs.commands.sentiment.Sentiment(bot=None)
+    monkeypatch.setattr(cog, "get_finviz_data", get_finviz_data)
+
+    df = asyncio.run(cog.get_sentiment("AAPL"))
+
+    # All headlines in one batch, scored between -1 and 1
+    assert stub.batches == [["moon", "dump", "flat"]]
+    assert df["Sentiment"].tolist() == [1.0, -1.0, 0.0]
+
+
+def make_bert(tmp_path) -> tuple[BertForSequenceClassification, BertTokenizerFast]:
+    """
+    An untrained model of the same size as FinTwitBERT (BERT-base), with a small vocabulary.
+    The weights do not change how long it takes to classify a text.
+    """
+    vocab = tmp_path / "vocab.txt"
+    vocab.write_text(
+        "\n".join(
+            ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "[URL]", "@", "user", "$"]
+            + WORDS
+        )
+    )
+    config = BertConfig(
+        num_labels=3,
+        id2label={0: "NEUTRAL", 1: "BULLISH", 2: "BEARISH"},
+        label2id={"NEUTRAL": 0, "BULLISH": 1, "BEARISH": 2},
+    )
+    return BertForSequenceClassification(config).eval(), BertTokenizerFast(str(vocab))
+
+
+WORDS = (
+    "btc eth to the moon dump it now buy sell breakout support resistance "
+    "long short bullish bearish chart looks good bad hold price target week"
+).split()
+
+
+def test_batching_increases_throughput(tmp_path, monkeypatch):
+    model, tokenizer = make_bert(tmp_path)
+    monkeypatch.setattr(models.sentiment, "model", model)
+    monkeypatch.setattr(models.sentiment, "tokenizer", tokenizer)
+
+    # Tweets of about 35 tokens
+    rng = random.Random(0)
+    texts = [
+        f"@trader $BTC {' '.join(rng.choices(WORDS, k=rng.randint(10, 40)))} https://x.com/a"
+        for _ in range(32)
+    ]
+    models.sentiment.predict(texts[:2])
+
+    async def throughput(batch_size: int) -> float:
+        service = SentimentService(max_batch_size=batch_size)
+        start = time.perf_counter()
+        await service.classify_many(texts)
+        assert service.metrics()["avg_batch_size"] == batch_size
+        return len(texts) / (time.perf_counter() - start)
+
+    tweets_per_second = {
+        batch_size: asyncio.run(throughput(batch_size)) for batch_size in [1, 8, 32]
+    }
+
+    # The padding to the longest text costs part of the gain of the larger batches
+    assert tweets_per_second[8] > tweets_per_second[1]
+    assert tweets_per_second[32] > tweets_per_second[1]
@@ -0,0 +1,100 @@
+import asyncio
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from api.http_client import SessionManager
+
+
+class Server:
+    """
+    Test server that counts the connections and the concurrent requests.
+    """
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.connections = set()
+        self.active = 0
+        self.max_active = 0
+
+        app = web.Application()
+        app.router.add_get("/", self.handle)
+        self.server = TestServer(app)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.connections.add(request.transport.get_extra_info("peername"))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return web.json_response({"ok": True})
+
+    async def __aenter__(self) -> "Server":
+        await self.server.start_server()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.server.close()
+
+    def url(self, path: str = "/") -> str:
+        return str(self.server.make_url(path))
+
+
+async def get(manager: SessionManager, url: str) -> dict:
+    session = await manager.get_session()
+    async with manager.host_slot(url):
+        async with session.get(url) as response:
+            return await response.json()
+
+
+def test_connections_are_reused():
+    async def main():
+        async with Server() as server:
+            manager = SessionManager()
+            for _ in range(10):
+                assert await get(manager, server.url()) == {"ok": True}
+            reused = len(server.connections)
+            await manager.close()
+
+            # Before, every request opened its own session and connection
+            for _ in range(10):
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(server.url()) as response:
+                        await response.json()
+            return reused, len(server.connections) - reused
+
+    reused, separate = asyncio.run(main())
+
+    assert reused == 1
+    assert separate == 10
+
+
+def test_limit_per_host():
+    async def main():
+        async with Server(delay=0.05) as server:
+            manager = SessionManager()
+            manager.limit_per_host = 3
+            await asyncio.gather(*[get(manager, server.url()) for _ in range(12)])
+            await manager.close()
+            return server.max_active, len(server.connections)
+
+    max_active, connections = asyncio.run(main())
+
+    assert max_active == 3
+    # The 3 connections are kept open and reused by the waiting requests
+    assert connections == 3
+
+
+def test_host_limits():
+    async def main():
+        async with Server(delay=0.05) as server:
+            manager = SessionManager()
+            manager.host_limits = {"127.0.0.1": 2}
+            await asyncio.gather(*[get(manager, server.url()) for _ in range(8)])
+            await manager.close()
+            return server.max_active
+
+    assert asyncio.run(main()) == 2
@@ -0,0 +1,115 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+from util.single_flight import SingleFlight, single_flight
+
+# The tickers of a burst of tweets that arrive in the same poll of the timeline,
+# popular tickers are mentioned by many tweets at the same time
+BURST = [
+    ["BTC", "ETH"],
+    ["BTC"],
+    ["NVDA", "AMD"],
+    ["BTC", "SOL"],
+    ["ETH"],
+    ["TSLA"],
+    ["BTC", "ETH", "SOL"],
+    ["NVDA"],
+    ["SPY"],
+    ["BTC"],
+    ["TSLA", "NVDA"],
+    ["ETH", "BTC"],
+    ["AAPL"],
+    ["SPY", "QQQ"],
+    ["BTC"],
+    ["SOL"],
+    ["NVDA", "AAPL"],
+    ["ETH"],
+    ["BTC", "TSLA"],
+    ["QQQ"],
+]
+
+
+def make_fetch(group: SingleFlight, requests: Counter):
+    @single_flight(group=group)
+    async def fetch(ticker: str, asset: str = "crypto") -> dict:
+        requests[ticker] += 1
+        await asyncio.sleep(0.01)
+        return {"ticker": ticker}
+
+    return fetch
+
+
+def test_identical_calls_are_coalesced():
+    requests = Counter()
+    fetch = make_fetch(SingleFlight(), requests)
+
+    async def main():
+        return await asyncio.gather(
+            fetch("BTC"), fetch(ticker="BTC"), fetch("BTC", "crypto"), fetch("ETH")
+        )
+
+    results = asyncio.run(main())
+
+    assert [r["ticker"] for r in results] == ["BTC", "BTC", "BTC", "ETH"]
+    assert requests == {"BTC": 1, "ETH": 1}
+
+
+def test_arguments_are_not_normalized():
+    requests = Counter()
+    fetch = make_fetch(SingleFlight(), requests)
+
+    async def main():
+        await asyncio.gather(fetch("BTC"), fetch("BTC "), fetch("btc"))
+
+    asyncio.run(main())
+
+    # The callee might treat these differently, so they are separate calls
+    assert requests == {"BTC": 1, "BTC ": 1, "btc": 1}
+
+
+def test_errors_are_shared_and_not_cached():
+    calls = 0
+
+    @single_flight(group=SingleFlight())
+    async def fail() -> None:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("down")
+
+    async def main():
+        results = await asyncio.gather(fail(), fail(), return_exceptions=True)
+        with pytest.raises(ValueError):
+            await fail()
+        return results
+
+    results = asyncio.run(main())
+
+    assert all(isinstance(r, ValueError) for r in results)
+    assert calls == 2
+
+
+def test_replayed_burst_sends_fewer_requests():
+    group = SingleFlight()
+    requests = Counter()
+    fetch = make_fetch(group, requests)
+
+    async def process(tickers: list[str]) -> list[dict]:
+        return await asyncio.gather(*[fetch(ticker) for ticker in tickers])
+
+    async def main():
+        return await asyncio.gather(*[process(tickers) for tickers in BURST])
+
+    results = asyncio.run(main())
+
+    calls = sum(len(tickers) for tickers in BURST)
+    outbound = sum(requests.values())
+    metrics = group.metrics()["make_fetch.<locals>.fetch"]
+
+    assert [[r["ticker"] for r in result] for result in results] == BURST
+    # One request per distinct ticker instead of one per mention
+    assert outbound == len({ticker for tickers in BURST for ticker in tickers}) == 9
+    assert calls == 30
+    assert metrics == {"calls": 30, "coalesced": 21, "outbound": 9}
@@ -0,0 +1,92 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import util.snapshot
+from util.db import get_db, update_db
+from util.snapshot import load_snapshot, save_snapshot, snapshot_age
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(util.snapshot, "snapshot_dir", str(tmp_path / "snapshots"))
+    return tmp_path / "snapshots"
+
+
+def reference_table(rows: int) -> pd.DataFrame:
+    """
+    A table with the shape of tv_stocks and cg_coins.
+    """
+    return pd.DataFrame(
+        {
+            "id": [f"coin-{i}" for i in range(rows)],
+            "symbol": [f"C{i}" for i in range(rows)],
+            "name": [f"Coin {i}" if i % 10 else None for i in range(rows)],
+            "price": [float(i) if i % 7 else np.nan for i in range(rows)],
+        }
+    )
+
+
+def test_round_trip_keeps_types_and_missing_values():
+    df = reference_table(100)
+
+    save_snapshot(df, "cg_coins")
+    loaded = load_snapshot("cg_coins")
+
+    pd.testing.assert_frame_equal(loaded, df)
+    assert loaded["name"].isna().sum() == 10
+    assert loaded["price"].dtype == np.float64
+    assert snapshot_age("cg_coins") is not None
+
+
+def test_loaded_snapshot_is_writable():
+    save_snapshot(reference_table(10), "tv_stocks")
+    loaded = load_snapshot("tv_stocks")
+
+    loaded.loc[1, "price"] = -1.0
+    loaded["symbol"] = loaded["symbol"].str.lower()
+
+    assert loaded.loc[1, "price"] == -1.0
+    assert load_snapshot("tv_stocks").loc[1, "price"] == 1.0
+
+
+def test_new_version_replaces_the_old_one(snapshot_dir):
+    save_snapshot(reference_table(10), "tv_crypto")
+    save_snapshot(reference_table(20), "tv_crypto")
+
+    assert len(load_snapshot("tv_crypto")) == 20
+    assert [f for f in os.listdir(snapshot_dir) if f.endswith(".feather")] == [
+        f"tv_crypto-{util.snapshot.get_snapshot_info('tv_crypto')['version']}.feather"
+    ]
+
+
+def test_missing_snapshot_returns_none(snapshot_dir):
+    assert load_snapshot("tv_forex") is None
+
+    # A snapshot of the old .npy format, which was a folder per version
+    save_snapshot(reference_table(10), "tv_forex")
+    version = util.snapshot.get_snapshot_info("tv_forex")["version"]
+    os.remove(snapshot_dir / f"tv_forex-{version}.feather")
+    os.makedirs(snapshot_dir / f"tv_forex-{version}")
+
+    assert load_snapshot("tv_forex") is None
+
+
+def test_cold_start_is_faster_than_sqlite(db_manager):
+    df = reference_table(50_000)
+    save_snapshot(df, "cg_coins")
+    update_db(df, "cg_coins")
+
+    start = time.perf_counter()
+    from_sql = get_db("cg_coins")
+    sql_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from_snapshot = load_snapshot("cg_coins")
+    snapshot_time = time.perf_counter() - start
+
+    assert len(from_snapshot) == len(from_sql) == len(df)
+    assert snapshot_time < sql_time
@@ -0,0 +1,123 @@
+import time
+
+import pandas as pd
+import pytest
+
+import util.vars
+from api.tradingview import SymbolIndex, TV_data
+
+
+def make_table(symbols: list[str]) -> pd.DataFrame:
+    tv_data = pd.DataFrame({"s": symbols})
+    tv_data[["exchange", "stock"]] = tv_data["s"].str.split(":", n=1, expand=True)
+    return tv_data
+
+
+stocks = make_table(["NASDAQ:AAPL", "NYSE:AAPL", "NYSE:IBM", "AMEX:SPY"])
+crypto = make_table(
+    [
+        "BINANCE:BTCUSDT",
+        "COINBASE:BTCUSD",
+        "BINANCE:ETHUSDT",
+        "BINANCE:ETHUSDTPERP",
+        "BYBIT:SOLUSDTPERP",
+        "BINANCE:USDTUSD",
+        "BINANCE:DOGE",
+    ]
+)
+forex = make_table(["FX_IDC:EURUSD", "FX:USDJPY"])
+
+
+def baseline_lookup(symbol: str, asset: str, crypto: pd.DataFrame = crypto):
+    """
+    The table scans that get_symbol_data did before the index.
+    """
+    if asset == "stock":
+        stock = stocks.loc[stocks["stock"] == symbol]
+        if not stock.empty:
+            return stock["exchange"].values[0], "america", symbol
+
+        fx = forex.loc[forex["stock"] == symbol]
+        if not fx.empty:
+            return fx["exchange"].values[0], "forex", symbol
+
+    elif asset == "crypto":
+        coin = crypto.loc[crypto["stock"] == symbol]
+        if not coin.empty:
+            return coin["exchange"].values[0], "crypto", symbol
+
+        for suffix in ["USD", "USDT", "USDTPERP"]:
+            if not symbol.endswith(suffix):
+                coin = crypto.loc[crypto["stock"] == symbol + suffix]
+                if not coin.empty:
+                    return coin["exchange"].values[0], "crypto", coin["stock"].values[0]
+
+    return None
+
+
+@pytest.fixture
+def tv(monkeypatch):
+    monkeypatch.setattr(util.vars, "stocks", stocks)
+    monkeypatch.setattr(util.vars, "crypto", crypto)
+    monkeypatch.setattr(util.vars, "forex", forex)
+    return TV_data()
+
+
+@pytest.mark.parametrize(
+    "symbol, asset",
+    [
+        # The first exchange of a symbol is used
+        ("AAPL", "stock"),
+        ("IBM", "stock"),
+        ("EURUSD", "stock"),
+        ("UNKNOWN", "stock"),
+        ("BTCUSDT", "crypto"),
+        # USD is tried before USDT
+        ("BTC", "crypto"),
+        ("ETH", "crypto"),
+        # A symbol that already ends with USD is not looked up as ...USDUSD
+        ("ETHUSD", "crypto"),
+        # ETHUSDT exists, so ETHUSDT is not extended with a suffix
+        ("ETHUSDT", "crypto"),
+        ("SOL", "crypto"),
+        ("USDT", "crypto"),
+        ("DOGE", "crypto"),
+        ("AAPL", "crypto"),
+        ("BTC", "forex"),
+    ],
+)
+def test_lookup_matches_the_table_scans(tv, symbol, asset):
+    assert tv.get_symbol_data(symbol, asset) == baseline_lookup(symbol, asset)
+
+
+def test_get_market(tv):
+    assert tv.get_market("NASDAQ:AAPL") == "america"
+    assert tv.get_market("NYSE:AAPL") == "america"
+    assert tv.get_market("BINANCE:BTCUSDT") == "crypto"
+    assert tv.get_market("FX_IDC:EURUSD") == "forex"
+    # The indices are known without the tables
+    assert SymbolIndex(None, None, None).markets["CRYPTOCAP:TOTAL"] == "crypto"
+    # Unknown tickers are assumed to be American stocks
+    assert tv.get_market("OTC:UNKNOWN") == "america"
+
+
+def test_index_is_faster_than_the_table_scans(monkeypatch):
+    big_crypto = make_table([f"BINANCE:C{i}USDT" for i in range(20_000)])
+    monkeypatch.setattr(util.vars, "stocks", stocks)
+    monkeypatch.setattr(util.vars, "crypto", big_crypto)
+    monkeypatch.setattr(util.vars, "forex", forex)
+
+    tv = TV_data()
+    tv.build_symbol_index()
+    symbols = [f"C{i}" for i in range(0, 20_000, 100)]
+
+    start = time.perf_counter()
+    indexed = [tv.get_symbol_data(symbol, "crypto") for symbol in symbols]
+    index_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scanned = [baseline_lookup(symbol, "crypto", big_crypto) for symbol in symbols]
+    scan_time = time.perf_counter() - start
+
+    assert indexed == scanned
+    assert index_time * 10 < scan_time
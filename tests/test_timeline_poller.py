@@ -0,0 +1,129 @@
+import asyncio
+import random
+import statistics
+
+import api.timeline
+from api.timeline import TimelinePoller
+
+HOURS = 12
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def time(self) -> float:
+        return self.now
+
+
+def make_arrivals() -> list[float]:
+    """
+    A timeline that is quiet (1 tweet per 8 minutes), with a burst of 1 tweet per 15 seconds
+    for 30 minutes every 3 hours.
+    """
+    rng = random.Random(1)
+    arrivals = []
+    now = 0.0
+    while now < HOURS * 60 * 60:
+        burst = now % (3 * 60 * 60) < 30 * 60
+        now += rng.expovariate(1 / (15 if burst else 8 * 60))
+        arrivals.append(now)
+    return arrivals
+
+
+def entry(tweet_time: float) -> dict:
+    return {"content": {"entryType": "TimelineTimelineItem", "time": tweet_time}}
+
+
+def cursor(value: str) -> dict:
+    return {
+        "content": {
+            "entryType": "TimelineTimelineCursor",
+            "cursorType": "Top",
+            "value": value,
+        }
+    }
+
+
+def simulate(monkeypatch, adaptive: bool) -> tuple[float, int]:
+    """
+    Returns the median time between a tweet and its request, and the number of requests.
+    """
+    clock = Clock()
+    monkeypatch.setattr(api.timeline, "time", clock)
+    arrivals = make_arrivals()
+    requests = []
+
+    async def get_tweet(top_cursor=None) -> list:
+        requests.append(top_cursor)
+        new = [t for t in arrivals if t <= clock.now]
+        del arrivals[: len(new)]
+        return [entry(t) for t in reversed(new)] + [cursor(str(clock.now))]
+
+    monkeypatch.setattr(api.timeline, "get_tweet", get_tweet)
+
+    poller = TimelinePoller()
+    latencies = []
+
+    async def run():
+        while clock.now < HOURS * 60 * 60:
+            entries = await poller.poll()
+            latencies.extend(
+                clock.now - e["content"]["time"]
+                for e in entries
+                if "time" in e["content"]
+            )
+            clock.now += poller.next_delay() if adaptive else 5 * 60
+
+    asyncio.run(run())
+
+    # Every request after the first one only asks for the newer entries
+    assert requests[0] is None
+    assert None not in requests[1:]
+    return statistics.median(latencies), len(requests)
+
+
+def test_adaptive_polling_lowers_the_latency(monkeypatch):
+    fixed_latency, _ = simulate(monkeypatch, adaptive=False)
+    latency, requests = simulate(monkeypatch, adaptive=True)
+
+    assert latency < fixed_latency / 2
+    # Not more than the hourly budget
+    assert requests <= HOURS * 30
+
+
+def test_missing_cursor_gets_the_full_page(monkeypatch):
+    pages = [[entry(1), cursor("a")], [entry(2)], [entry(3), cursor("b")]]
+    requests = []
+
+    async def get_tweet(top_cursor=None) -> list:
+        requests.append(top_cursor)
+        return pages.pop(0)
+
+    monkeypatch.setattr(api.timeline, "get_tweet", get_tweet)
+    poller = TimelinePoller()
+
+    async def run():
+        for _ in range(3):
+            await poller.poll()
+
+    asyncio.run(run())
+
+    assert requests == [None, "a", None]
+    assert poller.cursor == "b"
+
+
+def test_hourly_budget(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(api.timeline, "time", clock)
+    poller = TimelinePoller()
+    poller.interval = poller.min_interval
+
+    # The budget is used in the first 10 minutes
+    poller.requests.extend(i * 20.0 for i in range(poller.requests_per_hour))
+    clock.now = 600
+    assert poller.next_delay() == 60 * 60 - clock.now
+
+    # Requests older than an hour do not count
+    clock.now = 60 * 60 + 600
+    assert poller.next_delay() == poller.min_interval
@@ -0,0 +1,178 @@
+import asyncio
+import types
+
+import discord
+import pytest
+
+import util.db
+from util.db import get_db
+from util.pipeline import Pipeline, Stage
+from util.tweet_ids import TweetIdStore
+
+
+@pytest.fixture
+def timeline():
+    import cogs.loops.timeline
+
+    return cogs.loops.timeline
+
+
+class Message:
+    async def add_reaction(self, emoji: str) -> None:
+        pass
+
+
+class Channel:
+    def __init__(self, fail_on: set = frozenset()) -> None:
+        self.fail_on = fail_on
+        self.sent = []
+
+    async def send(self, content=None, embed=None) -> Message:
+        if embed.url in self.fail_on:
+            raise discord.HTTPException(
+                types.SimpleNamespace(status=500, reason="Server Error"), "down"
+            )
+        self.sent.append(embed.url)
+        return Message()
+
+
+def make_job(tweet_id: int, channel: Channel) -> types.SimpleNamespace:
+    return types.SimpleNamespace(
+        tweet_id=tweet_id,
+        channel=channel,
+        embed=discord.Embed(url=f"https://x.com/user/status/{tweet_id}"),
+        media=[],
+        base_symbols=["BTC"],
+        user_channel=None,
+        category="crypto",
+        user_name="user",
+        user_screen_name="user",
+        sentiment=None,
+        categories=["crypto"],
+        changes=["+1.00% 📈"],
+    )
+
+
+def test_post_tweet_reports_delivery(timeline):
+    cog = timeline.Timeline.__new__(timeline.Timeline)
+    channel = Channel(fail_on={"https://x.com/user/status/2"})
+
+    async def post(tweet_id: int) -> bool:
+        job = make_job(tweet_id, channel)
+        return await cog.post_tweet(channel, job.embed, [], [], None, "crypto")
+
+    assert asyncio.run(post(1)) is True
+    assert asyncio.run(post(2)) is False
+
+
+def test_failed_tweets_are_posted_after_a_restart(timeline, db_manager, monkeypatch):
+    store = TweetIdStore()
+    monkeypatch.setattr(util.db, "tweet_ids", store)
+
+    cog = timeline.Timeline.__new__(timeline.Timeline)
+    cog.channel_locks = {}
+    cog.unfinished = {}
+    channel = Channel(fail_on={"https://x.com/user/status/3"})
+
+    async def run():
+        for tweet_id in range(1, 6):
+            assert store.claim(tweet_id)
+            await cog.post(make_job(tweet_id, channel))
+        await db_manager.flush()
+
+    asyncio.run(run())
+    assert channel.sent == [f"https://x.com/user/status/{i}" for i in [1, 2, 4, 5]]
+
+    # Only the posted tweets were saved, also their mentions
+    assert sorted(get_db("tweet_ids")["id"]) == [1, 2, 4, 5]
+    assert len(get_db("tweets")) == 4
+
+    # After a restart the ids are loaded from the database, the timeline is replayed
+    restarted = TweetIdStore()
+    restarted.load(get_db("tweet_ids"))
+    assert [i for i in range(1, 6) if restarted.claim(i)] == [3]
+
+
+class Poller:
+    """
+    Returns the pages of the timeline, every page only has the entries that are new.
+    """
+
+    def __init__(self, pages: list[list[int]]) -> None:
+        self.pages = pages
+
+    async def poll(self) -> list:
+        tweet_ids = self.pages.pop(0) if self.pages else []
+        # The newest tweet is first
+        return [
+            {"content": {"entryType": "TimelineTimelineItem", "id": tweet_id}}
+            for tweet_id in reversed(tweet_ids)
+        ]
+
+    def next_delay(self) -> float:
+        return 60
+
+
+def test_unfinished_tweets_are_put_in_the_next_poll(timeline, db_manager, monkeypatch):
+    store = TweetIdStore()
+    monkeypatch.setattr(util.db, "tweet_ids", store)
+    monkeypatch.setattr(timeline, "tweet_ids", store)
+    monkeypatch.setattr(timeline, "timeline_poller", Poller([[1, 2, 3], [4], []]))
+
+    def parse_tweet(tweet: dict, update_tweet_id: bool = False):
+        tweet_id = tweet["id"]
+        if not store.claim(tweet_id):
+            return None
+        url = f"https://x.com/user/status/{tweet_id}"
+        return ("text", "user", "user", "", url, [], [], [], None, [], tweet_id)
+
+    monkeypatch.setattr(timeline, "parse_tweet", parse_tweet)
+
+    cog = timeline.Timeline.__new__(timeline.Timeline)
+    cog.channels_set = True
+    cog.channel_locks = {}
+    cog.unfinished = {}
+    cog.retries = {}
+    cog.max_attempts = 3
+
+    posted = []
+    # 2 fails the first time and 3 fails every time
+    failures = {2: 1, 3: 99}
+
+    async def render(job):
+        job.embed = discord.Embed(url=job.tweet_url)
+        return job
+
+    async def post_tweet(channel, embed, *args) -> bool:
+        tweet_id = int(embed.url.split("/")[-1])
+        if failures.get(tweet_id, 0) > 0:
+            failures[tweet_id] -= 1
+            return False
+        posted.append(tweet_id)
+        return True
+
+    cog.post_tweet = post_tweet
+
+    async def run():
+        cog.pipeline = Pipeline(
+            "test",
+            [
+                Stage("parse", cog.parse, 1),
+                Stage("render", render, 1),
+                Stage("post", cog.post, 1),
+            ],
+        )
+        cog.pipeline.start()
+        for _ in range(3):
+            await timeline.Timeline.get_latest_tweet.coro(cog)
+        await cog.pipeline.close()
+        await db_manager.flush()
+
+    asyncio.run(run())
+
+    # 2 is posted in the second poll, before the newer tweet 4
+    assert posted == [1, 2, 4]
+    # 3 is skipped after 3 attempts
+    assert cog.retries == {}
+    assert failures[3] == 96
+    assert not store.claimed
@@ -0,0 +1,103 @@
+import asyncio
+import http.server
+import threading
+import time
+
+import pytest
+import tls_client
+
+from api.http_client import TokenBucket, get_tls_text, rate_limiter, tls_pool
+
+DELAY = 0.3
+
+
+class SlowHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        # A slow page download, e.g. the CoinGecko categories page
+        time.sleep(DELAY)
+        body = b"<html><table><tr><td>BTC</td></tr></table></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture(scope="module")
+def url():
+    # The server runs in its own threads, so a blocked event loop cannot delay it
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+
+
+async def loop_lag(request) -> tuple[float, list]:
+    """
+    Returns the longest gap between the ticks of the event loop while the request runs.
+    """
+    lag = 0.0
+    done = False
+
+    async def tick():
+        nonlocal lag
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lag = max(lag, time.perf_counter() - start - 0.01)
+
+    ticker = asyncio.create_task(tick())
+    await asyncio.sleep(0.02)
+    try:
+        result = await request()
+    finally:
+        done = True
+        await ticker
+    return lag, result
+
+
+def test_tls_requests_do_not_block_the_event_loop(url):
+    async def blocking():
+        # Before, the tls_client session was used directly in the coroutines
+        session = tls_client.Session(client_identifier="chrome112")
+        return [session.get(url).text]
+
+    async def offloaded():
+        return await asyncio.gather(*[get_tls_text(url) for _ in range(tls_pool.size)])
+
+    async def main():
+        old_lag, old = await loop_lag(blocking)
+        start = time.perf_counter()
+        new_lag, new = await loop_lag(offloaded)
+        return old_lag, old, new_lag, new, time.perf_counter() - start
+
+    old_lag, old, new_lag, new, duration = asyncio.run(main())
+
+    assert old_lag > DELAY * 0.8
+    assert new_lag < 0.1
+    assert old[0] in new
+    # The pool sends the requests at the same time
+    assert duration < DELAY * 2
+
+
+def test_rate_limited_requests_wait_without_blocking(url, monkeypatch):
+    # 1 request at once and then 10 per second
+    monkeypatch.setitem(rate_limiter.buckets, "127.0.0.1", TokenBucket(600, 1, 600))
+
+    async def limited():
+        return await asyncio.gather(*[get_tls_text(url) for _ in range(4)])
+
+    async def main():
+        start = time.perf_counter()
+        lag, pages = await loop_lag(limited)
+        return lag, pages, time.perf_counter() - start
+
+    lag, pages, duration = asyncio.run(main())
+
+    assert len(pages) == 4
+    assert lag < 0.1
+    # The requests are spread over at least 0.3 seconds by the bucket
+    assert duration > DELAY + 0.3
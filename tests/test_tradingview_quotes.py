@@ -0,0 +1,182 @@
+import asyncio
+import json
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import api.tradingview_quotes
+from api.tradingview_quotes import QuoteClient, format_frame, parse_frames
+
+PRICES = {"BINANCE:BTCUSDT": 60000.0, "NASDAQ:AAPL": 200.0}
+
+
+class StubTradingView:
+    """
+    Websocket server that speaks the TradingView quote protocol.
+    """
+
+    def __init__(self) -> None:
+        self.connections = 0
+        self.messages: list[dict] = []
+        self.heartbeats: list[str] = []
+        self.sockets: list[web.WebSocketResponse] = []
+
+        app = web.Application()
+        app.router.add_get("/socket.io/websocket", self.handle)
+        self.server = TestServer(app)
+
+    async def send(self, ws: web.WebSocketResponse, func: str, args: list) -> None:
+        await ws.send_str(format_frame(json.dumps({"m": func, "p": args})))
+
+    async def handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        self.sockets.append(ws)
+
+        await ws.send_str(format_frame("~h~1"))
+        async for msg in ws:
+            for frame in parse_frames(msg.data):
+                if frame.startswith("~h~"):
+                    self.heartbeats.append(frame)
+                    continue
+
+                message = json.loads(frame)
+                self.messages.append(message)
+                if message["m"] == "quote_add_symbols":
+                    session_id, *symbols = message["p"]
+                    for symbol in symbols:
+                        await self.quote(ws, session_id, symbol)
+        return ws
+
+    async def quote(self, ws, session_id: str, symbol: str) -> None:
+        if symbol not in PRICES:
+            await self.send(ws, "qsd", [session_id, {"n": symbol, "s": "error"}])
+            return
+
+        values = {"lp": PRICES[symbol], "ch": 10.0, "volume": 5.0}
+        await self.send(ws, "qsd", [session_id, {"n": symbol, "s": "ok", "v": values}])
+        await self.send(ws, "quote_completed", [session_id, symbol])
+
+    async def push(self, symbol: str, values: dict) -> None:
+        session_id = self.added()[-1][0]
+        data = {"n": symbol, "s": "ok", "v": values}
+        await self.send(self.sockets[-1], "qsd", [session_id, data])
+
+    def added(self) -> list[list]:
+        return [m["p"] for m in self.messages if m["m"] == "quote_add_symbols"]
+
+
+@pytest.fixture
+def run(monkeypatch):
+    """
+    Runs the test coroutine with a quote client that is connected to the stub.
+    """
+
+    def run(test):
+        async def main():
+            stub = StubTradingView()
+            await stub.server.start_server()
+            session = aiohttp.ClientSession()
+
+            async def get_session():
+                return session
+
+            url = stub.server.make_url("/socket.io/websocket")
+            monkeypatch.setattr(api.tradingview_quotes, "WS_URL", str(url))
+            monkeypatch.setattr(api.tradingview_quotes, "get_session", get_session)
+
+            client = QuoteClient(timeout=2)
+            try:
+                await test(stub, client)
+            finally:
+                await client.close()
+                await session.close()
+                await stub.server.close()
+
+        asyncio.run(main())
+
+    return run
+
+
+def test_subscribe_and_get_quote(run):
+    async def test(stub, client):
+        quote = await client.get_quote("BINANCE:BTCUSDT")
+        assert (quote.price, quote.change, quote.volume) == (60000.0, 10.0, 5.0)
+
+        # The second request is served from the cache
+        assert await client.get_quote("BINANCE:BTCUSDT") is quote
+        assert await client.get_quote("NASDAQ:AAPL") is not None
+        assert await client.get_quote("NASDAQ:UNKNOWN") is None
+
+        assert stub.connections == 1
+        assert [m["m"] for m in stub.messages[:2]] == [
+            "quote_create_session",
+            "quote_set_fields",
+        ]
+        assert [symbols for _, *symbols in stub.added()] == [
+            ["BINANCE:BTCUSDT"],
+            ["NASDAQ:AAPL"],
+            ["NASDAQ:UNKNOWN"],
+        ]
+        # The heartbeat is sent back
+        assert stub.heartbeats == ["~h~1"]
+
+    run(test)
+
+
+def test_pushed_updates_are_merged(run):
+    async def test(stub, client):
+        await client.get_quote("BINANCE:BTCUSDT")
+
+        # Only the changed values are pushed
+        await stub.push("BINANCE:BTCUSDT", {"lp": 61000.0})
+        await asyncio.sleep(0.05)
+
+        quote = await client.get_quote("BINANCE:BTCUSDT")
+        assert (quote.price, quote.change, quote.volume) == (61000.0, 10.0, 5.0)
+
+    run(test)
+
+
+def test_reconnect_adds_the_symbols_again(run):
+    async def test(stub, client):
+        await client.get_quote("BINANCE:BTCUSDT")
+        await client.get_quote("NASDAQ:AAPL")
+
+        await stub.sockets[-1].close()
+        # The client waits a second before reconnecting
+        for _ in range(40):
+            await asyncio.sleep(0.1)
+            if stub.connections == 2 and len(stub.added()) == 3:
+                break
+
+        assert stub.connections == 2
+        _, *symbols = stub.added()[-1]
+        assert sorted(symbols) == ["BINANCE:BTCUSDT", "NASDAQ:AAPL"]
+        # The new session is used after the reconnect
+        assert stub.added()[-1][0] == client.session_id
+
+        await stub.push("NASDAQ:AAPL", {"lp": 210.0})
+        await asyncio.sleep(0.05)
+        assert (await client.get_quote("NASDAQ:AAPL")).price == 210.0
+
+    run(test)
+
+
+def test_idle_symbols_are_removed(run):
+    async def test(stub, client):
+        client.idle_timeout = 0
+        await client.get_quote("BINANCE:BTCUSDT")
+        client.last_used["BINANCE:BTCUSDT"] = 0
+
+        await client.get_quote("NASDAQ:AAPL")
+        await asyncio.sleep(0.05)
+
+        removed = [m["p"] for m in stub.messages if m["m"] == "quote_remove_symbols"]
+        assert removed == [[client.session_id, "BINANCE:BTCUSDT"]]
+        assert client.symbols == {"NASDAQ:AAPL"}
+
+    run(test)